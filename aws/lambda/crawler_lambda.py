@@ -1,13 +1,12 @@
 import os
 import json
 import logging
+import time
 import etcd3
-import chromadb
-from sentence_transformers import SentenceTransformer
 from urllib.parse import urlparse
 import importlib.util
 import pathlib
-import time
+from contextlib import contextmanager
 
 # Configuration from environment
 TOP_SITES = [
@@ -17,15 +16,42 @@ TOP_SITES = [
     "https://www.nme.com/"
 ]
 THREAD_LIMIT = 5
+CRAWL_WORKERS = 4
+PER_HOST_LIMIT = 1
+# Requests per second per domain shared with every crawler on this etcd, and burst size
+CRAWL_RATE = float(os.environ.get("CRAWL_RATE", 1.0))
+CRAWL_BURST = int(os.environ.get("CRAWL_BURST", 5))
+RATE_LIMIT_BATCH = int(os.environ.get("RATE_LIMIT_BATCH", 5))
 ETCD_HOST = os.environ.get("ETCD_HOST", "localhost")
 ETCD_PORT = int(os.environ.get("ETCD_PORT", 2379))
-CRAWL_OUTPUT_DIR = "/tmp/crawled_json"  # Use /tmp for Lambda
+CRAWL_CORPUS_PATH = os.environ.get("CRAWL_CORPUS_PATH", "/tmp/crawl_corpus.jsonl.gz")  # Use /tmp for Lambda
+CRAWL_CACHE_PATH = os.environ.get("CRAWL_CACHE_PATH", "/tmp/crawl_cache.json")  # Survives between warm invocations
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "onnx" or "onnx-int8" embed with ONNX Runtime from an export_onnx() directory
+# bundled in the package, so PyTorch can be left out of it
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "")
 CHROMA_COLLECTION = "music_freshness"
+# Persist under /tmp so warm invocations reuse the index; empty for in-memory
+CHROMA_PERSIST_DIR = os.environ.get("CHROMA_PERSIST_DIR", "/tmp/chroma_db")
+# "numpy" uses the in-process NumPy index, so chromadb can be left out of the package
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+# Object store (s3://bucket/prefix or a directory) to publish versioned index snapshots
+# to after every sync; when set, the index is the NumPy index seeded from the latest one
+SNAPSHOT_STORE = os.environ.get("SNAPSHOT_STORE", "")
+SNAPSHOT_CACHE_DIR = "/tmp/snapshots"
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", 3))
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", 40))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+# Stop starting crawls when less than this much of the invocation is left, keeping
+# time for in-flight crawls (bounded by the read timeout) and for embedding
+DEADLINE_MARGIN_MS = int(os.environ.get("DEADLINE_MARGIN_MS", 45000))
+# Crawls still in flight (waiting for a slot or fetching) when less than this is left
+# are abandoned and returned as pending, keeping time to embed what was crawled
+EMBED_MARGIN_MS = int(os.environ.get("EMBED_MARGIN_MS", 15000))
 
 # Lambda: initialize heavy resources outside handler for cold start efficiency
-os.makedirs(CRAWL_OUTPUT_DIR, exist_ok=True)
-
 def safe_etcd_client(host, port):
     try:
         client = etcd3.client(host=host, port=port)
@@ -42,92 +68,204 @@ def safe_etcd_client(host, port):
         raise
 
 etcd = safe_etcd_client(ETCD_HOST, ETCD_PORT)
-embedder = SentenceTransformer(EMBEDDING_MODEL)
-chroma_client = chromadb.Client()
-collection = chroma_client.get_or_create_collection(CHROMA_COLLECTION)
-
-utils_path = pathlib.Path(__file__).parent.parent.parent / 'utils' / 'page_crawler.py'
-spec = importlib.util.spec_from_file_location('page_crawler', str(utils_path))
-page_crawler = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(page_crawler)
+
+def load_util(name):
+    utils_path = pathlib.Path(__file__).parent.parent.parent / 'utils' / f'{name}.py'
+    spec = importlib.util.spec_from_file_location(name, str(utils_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+embedder = load_util('embedders').load_embedder(EMBEDDING_BACKEND, EMBEDDING_MODEL, ONNX_MODEL_DIR)
+page_crawler = load_util('page_crawler')
 PageCrawler = page_crawler.PageCrawler
-crawler = PageCrawler()
+ingest = load_util('ingest')
+vector_store = load_util('vector_store')
+corpus = load_util('crawl_corpus').CrawlCorpus(CRAWL_CORPUS_PATH)
+# Fetch time of the newest snapshot synced into the collection (both live in /tmp)
+synced_watermark = None
+etcd_semaphore = load_util('etcd_semaphore')
+# Race-free per-domain crawl slots shared with every other crawler on this etcd
+semaphore = etcd_semaphore.EtcdSemaphore(etcd, THREAD_LIMIT)
+rate_limiter = load_util('rate_limiter').EtcdRateLimiter(etcd, CRAWL_RATE, CRAWL_BURST, RATE_LIMIT_BATCH)
+numpy_index = load_util('numpy_index')
+snapshot_store = load_util('snapshot_store')
+object_store = snapshot_store.open_object_store(SNAPSHOT_STORE) if SNAPSHOT_STORE else None
+# Version of the published snapshot the open collection was loaded from
+snapshot_version = None
+
+def open_snapshot_index(name, persist_dir):
+    """Open the newest published snapshot (memory-mapped), or an empty index if there is none."""
+    global snapshot_version
+    latest = snapshot_store.download_latest(object_store, name, SNAPSHOT_CACHE_DIR)
+    if latest is None:
+        snapshot_version = None
+        return numpy_index.NumpyIndex()
+    index = numpy_index.NumpyIndex.load(latest['path'])
+    # Changes are published as new snapshots, never written back to the cached version
+    index.path = None
+    snapshot_version = latest['version']
+    return index
+
+if object_store is not None:
+    opener = open_snapshot_index
+elif VECTOR_BACKEND == "numpy":
+    opener = numpy_index.open_index
+else:
+    opener = vector_store.open_collection
+collection = vector_store.LazyCollection(CHROMA_COLLECTION, CHROMA_PERSIST_DIR, opener=opener)
+crawler = PageCrawler(max_workers=CRAWL_WORKERS, per_host_limit=PER_HOST_LIMIT,
+                      cache_path=CRAWL_CACHE_PATH)
 
 def get_domain(url):
     return urlparse(url).netloc.replace('www.', '')
 
-def acquire_thread_slot(domain):
-    prefix = f"/crawler/semaphores/{domain}/"
-    keys = list(etcd.get_prefix(prefix, keys_only=True))
-    if len(keys) < THREAD_LIMIT:
-        lease = etcd.lease(300)
-        thread_id = str(os.urandom(8).hex())
-        key = f"{prefix}thread-{thread_id}"
-        etcd.put(key, "", lease=lease)
-        return key, lease
-    return None, None
-
-def release_thread_slot(key, lease):
-    if key:
-        etcd.delete(key)
-        if lease:
-            lease.revoke()
-
-def crawl_and_store(url):
+class SlotUnavailable(Exception):
+    """No crawl slot or rate-limit token for the URL's domain before the deadline."""
+
+def seconds_until(deadline):
+    """Return the seconds left until the ``time.monotonic()`` value ``deadline`` (None for no deadline)."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+@contextmanager
+def thread_slot(url, deadline=None):
+    """
+    Hold a crawl slot of the URL's domain and spend one of its rate-limit tokens.
+
+    Raises:
+        SlotUnavailable: If the slot or the token is not available by ``deadline``.
+    """
     domain = get_domain(url)
-    key, lease = None, None
+    key = semaphore.acquire(domain, timeout=seconds_until(deadline))
+    if key is None:
+        raise SlotUnavailable(url)
     try:
-        # Acquire thread slot
-        while True:
-            key, lease = acquire_thread_slot(domain)
-            if key:
-                break
-            time.sleep(2)
-        # Crawl and save
-        output_file = os.path.join(CRAWL_OUTPUT_DIR, f"{domain}.json")
-        crawler.crawl_and_save(url, output_file)
-        return output_file, None
-    except Exception as e:
-        return None, str(e)
+        if not rate_limiter.acquire(domain, timeout=seconds_until(deadline)):
+            raise SlotUnavailable(url)
+        yield
     finally:
-        release_thread_slot(key, lease)
+        semaphore.release(key)
 
-def extract_and_store_embeddings():
-    results = []
-    for fname in os.listdir(CRAWL_OUTPUT_DIR):
-        if fname.endswith('.json'):
+def crawl_all(urls, stop_when=None, start_by=None, finish_by=None):
+    """
+    Crawl ``urls`` concurrently, appending a snapshot of each changed page to the corpus.
+
+    Once ``stop_when()`` is true, or at ``start_by``, no more URLs are started, and URLs
+    still waiting for their domain's slot or rate-limit token give up. At ``finish_by``
+    crawls still fetching are abandoned. Such URLs are missing from the results.
+    Both deadlines are ``time.monotonic()`` values.
+    """
+    gave_up = set()
+
+    @contextmanager
+    def guard(url):
+        try:
+            with thread_slot(url, start_by):
+                yield
+        except SlotUnavailable:
+            gave_up.add(url)
+            raise
+
+    crawl_results = []
+    for result in crawler.crawl_many(urls, guard=guard, stop_when=stop_when, deadline=finish_by):
+        if result['url'] in gave_up:
+            continue
+        snapshot, error = None, result['error']
+        if not error and not result['not_modified']:
+            data = result['data']
             try:
-                with open(os.path.join(CRAWL_OUTPUT_DIR, fname), 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                doc_id = fname.replace('.json', '')
-                text = data.get('text', '')
-                if not text:
-                    continue
-                embedding = embedder.encode([text])[0].tolist()
-                collection.add(
-                    documents=[text],
-                    embeddings=[embedding],
-                    ids=[doc_id]
-                )
-                results.append((doc_id, None))
+                entry = corpus.append(result['url'], data.get('text', ''), data.get('title', ''))
+                snapshot = (entry or {}).get('hash')
             except Exception as e:
-                results.append((fname, str(e)))
-    return results
+                error = str(e)
+        crawl_results.append({"url": result['url'], "snapshot": snapshot, "error": error,
+                              "not_modified": result['not_modified']})
+    return crawl_results
+
+def publish_snapshot():
+    """Publish the collection as a new snapshot version and remember it as the loaded one."""
+    global snapshot_version
+    pointer = snapshot_store.publish_snapshot(object_store, CHROMA_COLLECTION, collection.save,
+                                              keep=SNAPSHOT_KEEP, count=collection.count(),
+                                              model=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND)
+    snapshot_version = pointer['version']
+    logging.info(f"Published snapshot {pointer['key']} ({pointer['count']} vectors)")
+
+def extract_and_store_embeddings():
+    """Sync the corpus snapshots newer than the last sync into the collection, embedding only changed chunks."""
+    global synced_watermark
+    try:
+        snapshots = corpus.latest(synced_watermark)
+    except Exception as e:
+        return [(CRAWL_CORPUS_PATH, str(e))]
+    documents = {get_domain(url): record['text'] for url, record in snapshots.items() if record['text']}
+    if not documents:
+        return []
+    try:
+        if object_store is not None and collection.is_open:
+            latest = snapshot_store.latest_snapshot(object_store, CHROMA_COLLECTION)
+            if latest and latest['version'] != snapshot_version:
+                # Another container published since this one loaded: start from its snapshot
+                collection.reopen()
+        stats = ingest.sync_documents(collection, embedder, documents, CHUNK_TOKENS, CHUNK_OVERLAP,
+                                      tokenizer=getattr(embedder, 'tokenizer', None),
+                                      batch_size=EMBED_BATCH_SIZE)
+        logging.info(f"Synced {len(documents)} documents: {stats['upserted']} chunks embedded, "
+                     f"{stats['unchanged']} unchanged, {stats['deleted']} deleted")
+        flush = getattr(collection, 'flush', None)
+        if flush:
+            flush()
+        if object_store is not None and (stats['upserted'] or stats['deleted'] or snapshot_version is None):
+            publish_snapshot()
+        synced_watermark = max(record['fetched_at'] for record in snapshots.values())
+        return [(doc_id, None) for doc_id in documents]
+    except Exception as e:
+        return [(doc_id, str(e)) for doc_id in documents]
+
+def near_deadline(context):
+    """Return a ``stop_when`` callable for ``crawl_all`` that trips ``DEADLINE_MARGIN_MS`` before the timeout."""
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return lambda: context.get_remaining_time_in_millis() < DEADLINE_MARGIN_MS
+
+def deadline_before_timeout(context, margin_ms):
+    """Return the ``time.monotonic()`` value ``margin_ms`` before the invocation times out, or None."""
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return time.monotonic() + (context.get_remaining_time_in_millis() - margin_ms) / 1000
 
 def lambda_handler(event, context):
+    """
+    Crawl the pending URLs (``event["pending"]``, or ``TOP_SITES``) in parallel and embed the changes.
+
+    Near the invocation deadline no further URLs are started, URLs still waiting for a
+    crawl slot give up, and shortly after crawls still fetching are abandoned. The
+    snapshots crawled so far are still embedded, and every URL without a result is
+    returned as ``pending``.
+    Invoking the handler again with the response (or ``{"pending": [...]}``) as the
+    event resumes the crawl where it stopped.
+    """
     logging.basicConfig(level=logging.INFO)
-    crawl_results = []
-    for url in TOP_SITES:
-        output_file, error = crawl_and_store(url)
-        crawl_results.append({"url": url, "output_file": output_file, "error": error})
+    urls = list((event or {}).get("pending") or TOP_SITES)
+    crawl_results = crawl_all(urls, stop_when=near_deadline(context),
+                              start_by=deadline_before_timeout(context, DEADLINE_MARGIN_MS),
+                              finish_by=deadline_before_timeout(context, EMBED_MARGIN_MS))
+    crawled = {r["url"] for r in crawl_results}
+    pending = [url for url in urls if url not in crawled]
+    if pending:
+        logging.info(f"Deadline near: {len(pending)} of {len(urls)} URLs left for the next invocation")
     embed_results = extract_and_store_embeddings()
     errors = [r for r in crawl_results if r["error"]] + [r for r in embed_results if r[1]]
     return {
         "statusCode": 200 if not errors else 500,
+        # Continuation marker: pass the response back as the next event to resume
+        "pending": pending,
         "body": json.dumps({
             "crawled": crawl_results,
             "embeddings": embed_results,
             "errors": errors,
-            "message": "Crawler Lambda completed" if not errors else "Crawler Lambda completed with errors"
+            "pending": pending,
+            "message": ("Crawler Lambda completed" if not pending else "Crawler Lambda stopped at the deadline")
+                       + ("" if not errors else " with errors")
         })
-    } 
\ No newline at end of file
+    }
@@ -1,12 +1,101 @@
 import os
 import json
+import threading
+import time
 import urllib3
 import re
+from collections import OrderedDict
+from functools import lru_cache
+from urllib3.util.retry import Retry
 
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_API_PATH = "/api/chat"
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:4b")
-http = urllib3.PoolManager()
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 3))
+# Below the function's 30s timeout (aws/main.tf), and further cut to the time the
+# invocation has left, so a slow answer ends in an error response, not a timeout
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", 25))
+# Kept free at the end of the invocation to build and return the response
+RESPONSE_MARGIN_S = float(os.environ.get("RESPONSE_MARGIN_S", 1.0))
+# A Lambda container handles one request at a time, so a couple of kept-alive
+# connections to the single Ollama host are enough
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 2))
+# Successful answers are reused by the warm container for repeated questions
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+
+# Only failed connections and 503 (Ollama refusing work) are retried: after a 502/504
+# or a read timeout the POST may have reached Ollama and is not resent
+RETRY = Retry(total=2, connect=2, read=0, status=1, other=0, backoff_factor=0.2,
+              status_forcelist=(503,), allowed_methods=frozenset({"POST"}),
+              respect_retry_after_header=False, raise_on_status=False)
+
+# Created once per container, so warm invocations reuse its kept-alive connections
+http = urllib3.PoolManager(
+    num_pools=2,
+    maxsize=HTTP_POOL_SIZE,
+    block=False,
+    timeout=urllib3.Timeout(connect=OLLAMA_CONNECT_TIMEOUT, read=OLLAMA_READ_TIMEOUT),
+    retries=RETRY,
+)
+
+
+class ResponseCache:
+    """Bounded least-recently-used cache whose entries expire ``ttl`` seconds after they are stored."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under ``key``, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
+
+
+def cache_key(enhanced_query, model):
+    """Key of a cached response: the lowercased, whitespace-collapsed query and the model."""
+    return " ".join(enhanced_query.lower().split()), model
+
+
+def request_timeout(context):
+    """Return the Ollama request timeouts, cut to the time the invocation has left."""
+    connect, read = OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        left = max(0.1, context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN_S)
+        connect, read = min(connect, left), min(read, left)
+    return urllib3.Timeout(connect=connect, read=read)
+
+
+def json_response(status, body, cache=None):
+    headers = {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"}
+    if cache:
+        headers["X-Cache"] = cache
+    return {"statusCode": status, "headers": headers, "body": body}
 
 # Music lover persona system prompt
 MUSIC_LOVER_PERSONA = (
@@ -22,6 +111,7 @@ MUSIC_LOVER_PERSONA = (
     "and personal perspective while being informative and engaging."
 )
 
+@lru_cache(maxsize=1024)
 def enhance_music_query(query):
     """
     Simple music-focused query enhancement for Lambda.
@@ -65,11 +155,7 @@ def enhance_music_query(query):
 def lambda_handler(event, context):
     # Only allow POST
     if event.get("requestContext", {}).get("http", {}).get("method") != "POST":
-        return {
-            "statusCode": 405,
-            "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
-            "body": json.dumps({"error": "Method Not Allowed. Only POST is supported."})
-        }
+        return json_response(405, json.dumps({"error": "Method Not Allowed. Only POST is supported."}))
     try:
         body = event.get("body")
         if event.get("isBase64Encoded"):
@@ -78,12 +164,12 @@ def lambda_handler(event, context):
         data = json.loads(body)
         user_query = data.get("query") or data.get("message") or data.get("prompt")
         if not user_query:
-            return {
-                "statusCode": 400,
-                "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
-                "body": json.dumps({"error": "Missing 'query', 'message', or 'prompt' in request body."})
-            }
+            return json_response(400, json.dumps({"error": "Missing 'query', 'message', or 'prompt' in request body."}))
         enhanced_query = enhance_music_query(user_query)
+        key = cache_key(enhanced_query, OLLAMA_MODEL)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return json_response(200, cached, cache="HIT")
         # Prepare messages for Ollama chat API
         messages = [
             {"role": "system", "content": MUSIC_LOVER_PERSONA},
@@ -100,16 +186,11 @@ def lambda_handler(event, context):
             ollama_url,
             body=json.dumps(payload),
             headers={"Content-Type": "application/json"},
-            timeout=30.0
+            timeout=request_timeout(context),
         )
-        return {
-            "statusCode": ollama_resp.status,
-            "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
-            "body": ollama_resp.data.decode()
-        }
+        answer = ollama_resp.data.decode()
+        if ollama_resp.status == 200:
+            response_cache.put(key, answer)
+        return json_response(ollama_resp.status, answer, cache="MISS")
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
-            "body": json.dumps({"error": str(e)})
-        } 
\ No newline at end of file
+        return json_response(500, json.dumps({"error": str(e)}))
@@ -0,0 +1,200 @@
+"""
+bench_embedders.py
+
+Benchmark the embedding backends (PyTorch, ONNX Runtime, ONNX int8) on our chunk sizes.
+
+Chunks are cut from the saved HTML fixtures with ``ingest.chunk_text`` at the
+configured ``CHUNK_TOKENS``/``CHUNK_OVERLAP`` and topped up with synthetic text
+drawn from the fixtures' vocabulary. Each backend runs in its own subprocess, so
+its load time includes its imports (what a cold start pays) and its peak RSS is
+measured in isolation. For every backend the script reports:
+
+- load time and peak RSS
+- chunks per second for ``encode`` at ``--batch-size``
+- median single-query latency
+- cosine similarity of its chunk vectors to the reference backend's (mean and min)
+- top-k agreement of query results with the reference backend
+
+The reference is ``torch`` when sentence-transformers is installed, otherwise ``onnx``.
+Backends whose packages or exported model are missing are skipped.
+
+Usage:
+    # Export the model (needs torch and transformers) and benchmark every backend
+    python benchmarks/bench_embedders.py --export
+
+    python benchmarks/bench_embedders.py [--onnx-dir DIR] [--chunks 512] [--batch-size 64] [--k 4]
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import ingest
+from utils.embedders import BACKENDS, TOKENIZER_FILE, FastTokenizer, export_onnx, load_embedder
+from utils.page_crawler import PARSER_BACKENDS
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'html')
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'all-MiniLM-L6-v2-onnx')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+CHUNK_TOKENS = int(os.environ.get('CHUNK_TOKENS', 200))
+CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', 40))
+QUERY_WORDS = 8
+
+
+def load_tokenizer(onnx_dir):
+    """Return the exported model's tokenizer for chunking, or None to chunk on words."""
+    try:
+        from tokenizers import Tokenizer
+        return FastTokenizer(Tokenizer.from_file(os.path.join(onnx_dir, TOKENIZER_FILE)))
+    except Exception:
+        # tokenizers not installed or nothing exported yet
+        return None
+
+
+def build_chunks(fixtures, count, tokenizer, seed=0):
+    """Return ``count`` chunks: fixture text windows first, then synthetic ones."""
+    parse = PARSER_BACKENDS['html.parser']
+    chunks = []
+    words = []
+    for fname in sorted(os.listdir(fixtures)):
+        if fname.endswith('.html'):
+            with open(os.path.join(fixtures, fname), 'r', encoding='utf-8', errors='replace') as f:
+                text = parse(f.read())['text']
+            chunks.extend(ingest.chunk_text(text, CHUNK_TOKENS, CHUNK_OVERLAP, tokenizer))
+            words.extend(text.split())
+    rng = np.random.default_rng(seed)
+    vocabulary = words or ['music', 'album', 'tour', 'release', 'single', 'chart', 'review', 'band']
+    while len(chunks) < count:
+        # Word pieces run about 4/3 per word, so this lands near CHUNK_TOKENS
+        length = int(CHUNK_TOKENS * 0.75 * rng.uniform(0.5, 1.0))
+        chunks.append(' '.join(rng.choice(vocabulary, size=length)))
+    return chunks[:count]
+
+
+def build_queries(chunks, count, seed=1):
+    """Return short queries made of the first words of random chunks."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(chunks), size=min(count, len(chunks)), replace=False)
+    return [' '.join(chunks[i].split()[:QUERY_WORDS]) for i in picks]
+
+
+def run_backend(backend, onnx_dir, data_path, output_path, batch_size):
+    """Load and time one backend in this process, saving its vectors to ``output_path``."""
+    with open(data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    start = time.perf_counter()
+    embedder = load_embedder(backend, MODEL_NAME, onnx_dir)
+    load_s = time.perf_counter() - start
+    embedder.encode(data['chunks'][:batch_size], batch_size=batch_size)  # warm up
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embedder.encode(data['chunks'], batch_size=batch_size), dtype=np.float32)
+    encode_s = time.perf_counter() - start
+    latencies = []
+    query_vectors = []
+    for query in data['queries']:
+        start = time.perf_counter()
+        query_vectors.append(embedder.encode([query], batch_size=1)[0])
+        latencies.append(time.perf_counter() - start)
+    np.savez(output_path, chunks=chunk_vectors, queries=np.asarray(query_vectors, dtype=np.float32))
+    return {
+        'backend': backend,
+        'load_s': load_s,
+        'chunks_per_s': len(data['chunks']) / encode_s if encode_s else float('inf'),
+        'query_ms': 1000 * statistics.median(latencies),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def top_k(chunk_vectors, query_vectors, k):
+    return np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+
+
+def agreement(found, expected):
+    k = found.shape[1]
+    return sum(len(set(f.tolist()) & set(e.tolist())) for f, e in zip(found, expected)) / (len(found) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PyTorch and ONNX Runtime embedders.')
+    parser.add_argument('--onnx-dir', default=DEFAULT_ONNX_DIR, help='Directory of the exported ONNX model')
+    parser.add_argument('--export', action='store_true', help='Export the model to --onnx-dir first')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='Directory of saved .html pages')
+    parser.add_argument('--chunks', type=int, default=512, help='Chunks embedded per backend')
+    parser.add_argument('--queries', type=int, default=100, help='Queries timed and compared per backend')
+    parser.add_argument('--batch-size', type=int, default=64, help='Chunks per encode batch')
+    parser.add_argument('--k', type=int, default=4, help='Results per query for top-k agreement')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), help=f"Any of {', '.join(BACKENDS)}")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.onnx_dir, args.data, args.output, args.batch_size)))
+        return 0
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+    if args.export:
+        paths = export_onnx(MODEL_NAME, args.onnx_dir)
+        print(f"Exported {MODEL_NAME} to {', '.join(paths.values())}")
+
+    chunks = build_chunks(args.fixtures, args.chunks, load_tokenizer(args.onnx_dir))
+    queries = build_queries(chunks, args.queries)
+    results = {}
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, 'data.json')
+        with open(data_path, 'w', encoding='utf-8') as f:
+            json.dump({'chunks': chunks, 'queries': queries}, f)
+        for backend in args.backends:
+            output_path = os.path.join(tmp, f"{backend}.npz")
+            proc = subprocess.run(
+                [sys.executable, __file__, '--worker', backend, '--onnx-dir', args.onnx_dir,
+                 '--data', data_path, '--output', output_path, '--batch-size', str(args.batch_size)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                reason = (proc.stderr.strip().splitlines() or ['failed'])[-1]
+                print(f"{backend:<10} skipped ({reason})")
+                continue
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            with np.load(output_path) as saved:
+                vectors[backend] = {'chunks': saved['chunks'], 'queries': saved['queries']}
+
+    if not results:
+        return 1
+    reference = 'torch' if 'torch' in vectors else next(iter(vectors))
+    expected = top_k(vectors[reference]['chunks'], vectors[reference]['queries'], args.k)
+    print(f"{len(chunks)} chunks of <= {CHUNK_TOKENS} tokens, {len(queries)} queries, "
+          f"batch {args.batch_size}, reference {reference}")
+    print(f"{'backend':<10} {'load s':>7} {'RSS MiB':>8} {'chunks/s':>9} {'query ms':>9} "
+          f"{'cos mean':>9} {'cos min':>8} {f'top{args.k} agree':>11}")
+    for backend, r in results.items():
+        cosines = cosine_rows(vectors[backend]['chunks'], vectors[reference]['chunks'])
+        found = top_k(vectors[backend]['chunks'], vectors[backend]['queries'], args.k)
+        print(f"{backend:<10} {r['load_s']:7.2f} {r['peak_rss_mb']:8.0f} {r['chunks_per_s']:9.1f} "
+              f"{r['query_ms']:9.2f} {cosines.mean():9.4f} {cosines.min():8.4f} "
+              f"{agreement(found, expected):11.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
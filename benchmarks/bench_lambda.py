@@ -0,0 +1,413 @@
+"""
+bench_lambda.py
+
+Emulate the Lambda handlers locally and measure their cold-start and warm latency.
+
+Each measurement starts a fresh Python subprocess, the way a new Lambda container
+starts, which then:
+
+- imports the handler module (``aws/lambda/lambda_function.py`` or
+  ``aws/lambda/crawler_lambda.py``), timing all module-level initialization:
+  the etcd client, the SentenceTransformer model, the vector store and the pools
+- invokes ``lambda_handler`` once (the cold invocation), then ``--invocations``
+  more times (warm invocations) with synthetic events: API Gateway HTTP API
+  (v2) POSTs for the API handler, EventBridge scheduled events for the crawler
+
+External services are replaced by local stand-ins:
+
+- network: one local HTTP server per crawled site, each serving a page whose
+  headline changes on every request, so each warm crawl re-embeds a little
+- Ollama: a local HTTP server answering ``/api/chat`` after ``--ollama-delay``
+- etcd: an in-memory ``etcd3`` module; the crawl semaphore and rate limiter
+  are swapped for in-process versions so the rate limit does not dominate
+- sentence-transformers and chromadb are used when installed; otherwise a
+  hashing embedder and the NumPy vector backend stand in (or force the
+  embedder stand-in with ``--stub-embedder`` to skip the model download)
+
+The stand-ins used are listed in the report. Every run is appended to a JSON
+report (``--report``) with the git commit, so results can be compared over time;
+the change against the previous run of the same handler is printed.
+
+Usage:
+    python benchmarks/bench_lambda.py [api] [crawler] [--cold-runs 3] [--invocations 20]
+"""
+
+import argparse
+import datetime
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+HANDLERS = {
+    'api': os.path.join(REPO_ROOT, 'aws', 'lambda', 'lambda_function.py'),
+    'crawler': os.path.join(REPO_ROOT, 'aws', 'lambda', 'crawler_lambda.py'),
+}
+DEFAULT_REPORT = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'lambda_latency.json')
+QUERIES = [
+    "Who are the most influential jazz pianists?",
+    "What makes a great live album?",
+    "Recommend some new indie bands",
+    "How did hip hop change pop production?",
+    "What is the best way to listen to vinyl?",
+]
+EMBEDDING_DIMENSION = 384
+
+
+# -- stand-ins ---------------------------------------------------------------
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves a changing news page on GET and an Ollama chat answer on POST /api/chat."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits += 1
+            hit = self.server.hits
+        paragraphs = ''.join(f"<p>Story {i} on {self.server.name}: the band announced a tour, "
+                             f"a new album and a festival headline slot.</p>" for i in range(20))
+        html = (f"<html><head><title>{self.server.name}</title></head><body>"
+                f"<h1>Headline update {hit}</h1>{paragraphs}</body></html>")
+        self._send(200, 'text/html; charset=utf-8', html.encode('utf-8'))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.server.delay)
+        answer = {'model': payload.get('model'), 'done': True,
+                  'message': {'role': 'assistant', 'content': 'A stand-in answer about music.'}}
+        self._send(200, 'application/json', json.dumps(answer).encode('utf-8'))
+
+
+def start_stub_server(name, delay=0.0):
+    """Start a stand-in server on a free local port and return its base URL."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.name, server.delay, server.hits, server.lock = name, delay, 0, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class FakeEtcd:
+    """The key-value calls ``safe_etcd_client`` makes, in memory."""
+
+    def __init__(self):
+        self.values = {}
+
+    def put(self, key, value, lease=None):
+        self.values[key] = value.encode('utf-8') if isinstance(value, str) else value
+
+    def get(self, key):
+        return self.values.get(key), None
+
+    def delete(self, key):
+        return self.values.pop(key, None) is not None
+
+
+class StubEmbedder:
+    """Hashes each text into a unit vector, with SentenceTransformer's ``encode`` signature."""
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.md5(word.encode('utf-8')).digest()
+                vectors[row, int.from_bytes(digest[:4], 'little') % EMBEDDING_DIMENSION] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class LocalSlots:
+    """In-process stand-in for ``EtcdSemaphore``: ``limit`` concurrent crawls per domain."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, timeout=None):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(name, threading.BoundedSemaphore(self.limit))
+        return name if semaphore.acquire(timeout=timeout) else None
+
+    def release(self, key):
+        if key:
+            self._semaphores[key].release()
+
+
+class FakeContext:
+    """The parts of the Lambda context object the handlers use."""
+
+    def __init__(self, timeout_s):
+        self.deadline = time.monotonic() + timeout_s
+        self.function_name = 'local-bench'
+        self.aws_request_id = str(uuid.uuid4())
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def is_installed(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def install_module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+
+
+# -- synthetic events ----------------------------------------------------------
+
+def api_gateway_event(query):
+    """An API Gateway HTTP API (payload format 2.0) POST with ``query`` in the JSON body."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        'version': '2.0',
+        'routeKey': 'POST /query',
+        'rawPath': '/query',
+        'rawQueryString': '',
+        'headers': {'content-type': 'application/json', 'user-agent': 'bench_lambda'},
+        'requestContext': {
+            'http': {'method': 'POST', 'path': '/query', 'protocol': 'HTTP/1.1',
+                     'sourceIp': '127.0.0.1', 'userAgent': 'bench_lambda'},
+            'requestId': str(uuid.uuid4()),
+            'routeKey': 'POST /query',
+            'stage': '$default',
+            'timeEpoch': int(now.timestamp() * 1000),
+        },
+        'body': json.dumps({'query': query}),
+        'isBase64Encoded': False,
+    }
+
+
+def scheduled_event():
+    """An EventBridge scheduled event, as sent by the crawler's cron rule."""
+    return {
+        'version': '0',
+        'id': str(uuid.uuid4()),
+        'detail-type': 'Scheduled Event',
+        'source': 'aws.events',
+        'time': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'region': 'us-west-2',
+        'resources': [],
+        'detail': {},
+    }
+
+
+# -- worker: one emulated container ------------------------------------------
+
+def emulate_container(args):
+    """Import one handler in this (fresh) process, invoke it repeatedly and return the timings."""
+    stand_ins = ['network', 'ollama']
+    os.environ['OLLAMA_HOST'] = start_stub_server('ollama', args.ollama_delay)
+    if args.handler == 'crawler':
+        workdir = tempfile.mkdtemp(prefix='bench_lambda_')
+        os.environ['CRAWL_CORPUS_PATH'] = os.path.join(workdir, 'crawl_corpus.jsonl.gz')
+        os.environ['CRAWL_CACHE_PATH'] = os.path.join(workdir, 'crawl_cache.json')
+        os.environ['CHROMA_PERSIST_DIR'] = os.path.join(workdir, 'chroma_db')
+        install_module('etcd3', client=lambda host=None, port=None: FakeEtcd())
+        stand_ins.append('etcd')
+        if args.stub_embedder or not is_installed('sentence_transformers'):
+            install_module('sentence_transformers', SentenceTransformer=StubEmbedder)
+            stand_ins.append('sentence-transformers')
+        if not is_installed('chromadb'):
+            os.environ['VECTOR_BACKEND'] = 'numpy'
+            stand_ins.append('chromadb (NumPy backend)')
+
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(f"{args.handler}_handler", HANDLERS[args.handler])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    import_s = time.perf_counter() - start
+
+    if args.handler == 'crawler':
+        from utils.rate_limiter import LocalRateLimiter
+
+        module.TOP_SITES = [f"{start_stub_server(f'site{i}')}/" for i in range(args.sites)]
+        module.semaphore = LocalSlots(module.THREAD_LIMIT)
+        module.rate_limiter = LocalRateLimiter(rate=1e6, burst=1000)
+
+    invocations, statuses, cache = [], {}, {}
+    for n in range(args.invocations + 1):
+        if args.handler == 'api':
+            event = api_gateway_event(QUERIES[n % args.distinct_queries])
+        else:
+            event = scheduled_event()
+        start = time.perf_counter()
+        response = module.lambda_handler(event, FakeContext(args.timeout))
+        invocations.append(time.perf_counter() - start)
+        status = str(response.get('statusCode'))
+        statuses[status] = statuses.get(status, 0) + 1
+        header = (response.get('headers') or {}).get('X-Cache')
+        if header:
+            cache[header] = cache.get(header, 0) + 1
+    return {
+        'import_s': import_s,
+        'first_invoke_s': invocations[0],
+        'warm_s': invocations[1:],
+        'statuses': statuses,
+        'cache': cache,
+        'stand_ins': stand_ins,
+    }
+
+
+# -- driver ------------------------------------------------------------------
+
+def summarize(values):
+    """Median, p95, min and max of ``values`` (seconds) in milliseconds."""
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'median_ms': 1000 * statistics.median(values),
+        'p95_ms': 1000 * values[math.ceil(0.95 * len(values)) - 1],
+        'min_ms': 1000 * values[0],
+        'max_ms': 1000 * values[-1],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_worker(handler, args):
+    command = [sys.executable, __file__, '--worker', handler,
+               '--invocations', str(args.invocations), '--sites', str(args.sites),
+               '--distinct-queries', str(args.distinct_queries),
+               '--ollama-delay', str(args.ollama_delay), '--timeout', str(args.timeout)]
+    if args.stub_embedder:
+        command.append('--stub-embedder')
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{handler} worker failed:\n{process.stderr[-2000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def benchmark(handler, args):
+    """Emulate ``args.cold_runs`` containers of ``handler`` and return the report entry."""
+    runs = [run_worker(handler, args) for _ in range(args.cold_runs)]
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'handler': handler,
+        'params': {'cold_runs': args.cold_runs, 'invocations': args.invocations, 'sites': args.sites,
+                   'distinct_queries': args.distinct_queries, 'ollama_delay': args.ollama_delay},
+        'stand_ins': runs[0]['stand_ins'],
+        'import': summarize([r['import_s'] for r in runs]),
+        'cold_start': summarize([r['import_s'] + r['first_invoke_s'] for r in runs]),
+        'warm': summarize([s for r in runs for s in r['warm_s']]),
+        'statuses': {k: sum(r['statuses'].get(k, 0) for r in runs) for k in runs[0]['statuses']},
+        'cache': {k: sum(r['cache'].get(k, 0) for r in runs) for k in {k for r in runs for k in r['cache']}},
+    }
+
+
+def load_report(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_report(path, entries):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_entry(entry, previous):
+    print(f"\n{entry['handler']} handler ({entry['commit'] or 'no commit'}), "
+          f"stand-ins: {', '.join(entry['stand_ins'])}")
+    print(f"  {'':<12} {'median ms':>10} {'p95 ms':>10} {'min ms':>10} {'max ms':>10} {'vs last':>9}")
+    for key in ('import', 'cold_start', 'warm'):
+        stats = entry[key]
+        if stats is None:
+            continue
+        change = ''
+        if previous and previous.get(key):
+            before = previous[key]['median_ms']
+            change = f"{100 * (stats['median_ms'] - before) / before:+8.1f}%" if before else ''
+        print(f"  {key:<12} {stats['median_ms']:10.1f} {stats['p95_ms']:10.1f} "
+              f"{stats['min_ms']:10.1f} {stats['max_ms']:10.1f} {change:>9}")
+    print(f"  statuses: {entry['statuses']}" + (f", X-Cache: {entry['cache']}" if entry['cache'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start and warm latency of the Lambda handlers.')
+    parser.add_argument('handlers', nargs='*', metavar='{api,crawler}',
+                        help='Handlers to benchmark (default: all)')
+    parser.add_argument('--cold-runs', type=int, default=3, help='Fresh containers (subprocesses) per handler')
+    parser.add_argument('--invocations', type=int, default=20, help='Warm invocations per container')
+    parser.add_argument('--sites', type=int, default=4, help='Stand-in sites the crawler crawls')
+    parser.add_argument('--distinct-queries', type=int, default=len(QUERIES),
+                        help='Distinct API queries, cycled through (repeats can hit the response cache)')
+    parser.add_argument('--ollama-delay', type=float, default=0.0, help='Seconds the Ollama stand-in takes to answer')
+    parser.add_argument('--timeout', type=float, default=900.0, help='Emulated function timeout in seconds')
+    parser.add_argument('--stub-embedder', action='store_true',
+                        help='Use the hashing embedder even if sentence-transformers is installed')
+    parser.add_argument('--report', default=DEFAULT_REPORT, help='JSON report the results are appended to')
+    parser.add_argument('--no-report', action='store_true', help='Print the results without saving them')
+    parser.add_argument('--worker', choices=sorted(HANDLERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.distinct_queries = max(1, min(args.distinct_queries, len(QUERIES)))
+    unknown = set(args.handlers) - set(HANDLERS)
+    if unknown:
+        parser.error(f"unknown handlers: {', '.join(sorted(unknown))}")
+
+    if args.worker:
+        args.handler = args.worker
+        print(json.dumps(emulate_container(args)))
+        return 0
+
+    entries = load_report(args.report)
+    for handler in args.handlers or sorted(HANDLERS):
+        entry = benchmark(handler, args)
+        previous = next((e for e in reversed(entries) if e.get('handler') == handler), None)
+        print_entry(entry, previous)
+        entries.append(entry)
+    if not args.no_report:
+        save_report(args.report, entries)
+        print(f"\nAppended to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+bench_parse_content.py
+
+Benchmark the PageCrawler parser backends over saved HTML fixtures.
+
+For every available backend, both whole-document (``parse_content``) and
+incremental (``STREAM_PARSERS``, fed 64 KiB at a time as during a crawl), it
+reports the median parse time per page and the peak memory used while parsing.
+Each backend runs in its own subprocess so peak RSS (which includes lxml's C
+allocations) is measured in isolation; the peak Python heap from tracemalloc is
+reported alongside it.
+
+Usage:
+    python benchmarks/bench_parse_content.py [--fixtures DIR] [--repeat N]
+
+    # Save live pages as fixtures first
+    python benchmarks/bench_parse_content.py --save https://www.billboard.com/ https://pitchfork.com/
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.page_crawler import PageCrawler, PARSER_BACKENDS, STREAM_PARSERS, DEFAULT_CHUNK_SIZE
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'html')
+
+
+def load_fixtures(directory):
+    """Return (name, html) pairs for every .html file in ``directory``."""
+    fixtures = []
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith('.html'):
+            with open(os.path.join(directory, fname), 'r', encoding='utf-8', errors='replace') as f:
+                fixtures.append((fname, f.read()))
+    return fixtures
+
+
+def save_fixtures(urls, directory):
+    """Download ``urls`` into ``directory`` as fixtures."""
+    os.makedirs(directory, exist_ok=True)
+    crawler = PageCrawler()
+    for url in urls:
+        name = url.split('//', 1)[-1].strip('/').replace('/', '_') or 'index'
+        path = os.path.join(directory, f"{name}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(crawler.fetch_page(url))
+        print(f"Saved {url} -> {path}")
+
+
+def stream_parse(factory, html):
+    """Feed ``html`` to an incremental parser the way ``PageCrawler.crawl`` does."""
+    parser = factory()
+    for i in range(0, len(html), DEFAULT_CHUNK_SIZE):
+        parser.feed(html[i:i + DEFAULT_CHUNK_SIZE])
+    return parser.close()
+
+
+def backend_names():
+    """Return every benchmarkable backend; incremental ones are suffixed ``:stream``."""
+    return sorted(PARSER_BACKENDS) + [f"{name}:stream" for name in sorted(STREAM_PARSERS)]
+
+
+def run_backend(backend, directory, repeat):
+    """Time one backend in this process and return its measurements."""
+    if backend.endswith(':stream'):
+        factory = STREAM_PARSERS[backend[:-len(':stream')]]
+        parse = lambda html: stream_parse(factory, html)
+    else:
+        parse = PARSER_BACKENDS[backend]
+    fixtures = load_fixtures(directory)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    pages = {}
+    for name, html in fixtures:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(html)
+            timings.append(time.perf_counter() - start)
+        pages[name] = {
+            'bytes': len(html.encode('utf-8')),
+            'median_ms': statistics.median(timings) * 1000,
+        }
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'backend': backend,
+        'pages': pages,
+        'total_median_ms': sum(p['median_ms'] for p in pages.values()),
+        'peak_python_heap_kb': peak_heap // 1024,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_growth_kb': rss_after - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PageCrawler parser backends.')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='Directory of saved .html pages')
+    parser.add_argument('--repeat', type=int, default=20, help='Parses per page per backend')
+    parser.add_argument('--save', nargs='+', metavar='URL', help='Download URLs into the fixture directory and exit')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, args.fixtures)
+        return 0
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.fixtures, args.repeat)))
+        return 0
+
+    results = []
+    for backend in backend_names():
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', backend,
+             '--fixtures', args.fixtures, '--repeat', str(args.repeat)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output))
+
+    print(f"{'backend':<20} {'total ms':>10} {'heap KiB':>10} {'rss KiB':>10}")
+    for r in results:
+        print(f"{r['backend']:<20} {r['total_median_ms']:>10.2f} "
+              f"{r['peak_python_heap_kb']:>10} {r['peak_rss_growth_kb']:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+bench_vector_index.py
+
+Benchmark the NumPy vector index against Chroma for recall and query latency.
+
+Vectors are drawn around random cluster centres (like embeddings of related
+pages) and exact float32 cosine top-k is the ground truth. Every backend is
+filled with the same vectors and answers the same queries:
+
+- numpy float16 / int8 (brute force)
+- numpy float16 with IVF (``--n-lists``, ``--n-probe``)
+- chromadb (HNSW), when it is installed
+
+For each backend the script reports build time, stored vector bytes, recall@k,
+median and p95 single-query latency, and batched queries per second.
+
+Usage:
+    python benchmarks/bench_vector_index.py [--vectors 5000] [--queries 200] [--k 4]
+"""
+
+import argparse
+import statistics
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.numpy_index import NumpyIndex
+
+DIMENSION = 384
+ADD_BATCH_SIZE = 5000
+
+
+def clustered_vectors(count, dimension, clusters, rng):
+    centres = rng.normal(size=(clusters, dimension))
+    vectors = centres[rng.integers(0, clusters, count)] + 0.5 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(found_ids, truth, k):
+    hits = sum(len({int(i) for i in found[:k]} & set(expected.tolist()))
+               for found, expected in zip(found_ids, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(query_one, query_batch, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        query_one(query)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    found = query_batch(queries)
+    batch_s = time.perf_counter() - start
+    latencies.sort()
+    return found, {
+        'median_ms': 1000 * statistics.median(latencies),
+        'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        'batch_qps': len(queries) / batch_s if batch_s else float('inf'),
+    }
+
+
+def bench_numpy(vectors, queries, k, dtype, n_lists=None, n_probe=None):
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    index = NumpyIndex(dtype=dtype)
+    index.add(ids=ids, embeddings=vectors)
+    if n_lists:
+        index.build_ivf(n_lists=n_lists, n_probe=n_probe)
+    build_s = time.perf_counter() - start
+    found, timings = time_queries(
+        lambda q: index.query(query_embeddings=[q], n_results=k, include=()),
+        lambda qs: index.query(query_embeddings=qs, n_results=k, include=())['ids'],
+        queries,
+    )
+    stored = index._matrix[:index.count()].nbytes
+    if index._scales is not None:
+        stored += index._scales[:index.count()].nbytes
+    return dict(timings, build_s=build_s, bytes=stored), found
+
+
+def bench_chroma(vectors, queries, k):
+    import chromadb
+
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    collection = chromadb.Client().get_or_create_collection(
+        f"bench_{int(time.time())}", metadata={'hnsw:space': 'cosine'})
+    for offset in range(0, len(vectors), ADD_BATCH_SIZE):
+        collection.add(ids=ids[offset:offset + ADD_BATCH_SIZE],
+                       embeddings=vectors[offset:offset + ADD_BATCH_SIZE].tolist())
+    build_s = time.perf_counter() - start
+    found, timings = time_queries(
+        lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k, include=[]),
+        lambda qs: collection.query(query_embeddings=qs.tolist(), n_results=k, include=[])['ids'],
+        queries,
+    )
+    return dict(timings, build_s=build_s, bytes=vectors.size * 4), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the NumPy vector index against Chroma.')
+    parser.add_argument('--vectors', type=int, default=5000, help='Number of indexed vectors')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+    parser.add_argument('--k', type=int, default=4, help='Results per query')
+    parser.add_argument('--dimension', type=int, default=DIMENSION)
+    parser.add_argument('--clusters', type=int, default=50, help='Cluster centres of the synthetic data')
+    parser.add_argument('--n-lists', type=int, default=None, help='IVF lists (default sqrt(vectors))')
+    parser.add_argument('--n-probe', type=int, default=None, help='IVF lists searched per query')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.vectors, args.dimension, args.clusters, rng)
+    queries = clustered_vectors(args.queries, args.dimension, args.clusters, np.random.default_rng(1))
+    truth = exact_top_k(vectors, queries, args.k)
+    n_lists = args.n_lists or max(1, int(np.sqrt(args.vectors)))
+
+    backends = {
+        'numpy float16': lambda: bench_numpy(vectors, queries, args.k, 'float16'),
+        'numpy int8': lambda: bench_numpy(vectors, queries, args.k, 'int8'),
+        f'numpy float16 ivf{n_lists}': lambda: bench_numpy(vectors, queries, args.k, 'float16',
+                                                           n_lists, args.n_probe),
+        'chromadb': lambda: bench_chroma(vectors, queries, args.k),
+    }
+    print(f"{args.vectors} vectors x {args.dimension}, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<24} {'build s':>8} {'MiB':>7} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'batch q/s':>10}")
+    for name, run in backends.items():
+        try:
+            stats, found = run()
+        except ImportError as e:
+            print(f"{name:<24} skipped ({e})")
+            continue
+        print(f"{name:<24} {stats['build_s']:8.2f} {stats['bytes'] / 2**20:7.1f} "
+              f"{recall(found, truth, args.k):7.3f} {stats['median_ms']:7.2f} {stats['p95_ms']:7.2f} "
+              f"{stats['batch_qps']:10.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+bench_vector_store_load.py
+
+Benchmark how quickly a persistent Chroma store becomes queryable after a restart.
+
+The script builds (or reuses) a persistent store with ``--chunks`` random vectors
+of MiniLM's dimension, then starts fresh subprocesses that open it through
+``LazyCollection`` and time each step of a warm restart:
+
+- importing chromadb
+- opening the client and the collection
+- the first query (which loads the HNSW index from disk)
+- a second query (steady state)
+
+Usage:
+    python benchmarks/bench_vector_store_load.py --chunks 100000 [--dir /tmp/bench_chroma] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+COLLECTION = 'bench_load'
+DIMENSION = 384
+ADD_BATCH_SIZE = 5000
+
+
+def random_vectors(count, dimension, rng):
+    return [[rng.uniform(-1.0, 1.0) for _ in range(dimension)] for _ in range(count)]
+
+
+def build_store(directory, chunks, dimension):
+    """Fill a persistent store with ``chunks`` random vectors, unless it already has them."""
+    from utils.vector_store import open_collection
+
+    collection = open_collection(COLLECTION, directory)
+    existing = collection.count()
+    if existing >= chunks:
+        print(f"Reusing store at {directory} with {existing} chunks")
+        return
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for offset in range(existing, chunks, ADD_BATCH_SIZE):
+        count = min(ADD_BATCH_SIZE, chunks - offset)
+        collection.add(
+            ids=[f"doc{i // 10}#{i % 10}" for i in range(offset, offset + count)],
+            documents=[f"chunk {i}" for i in range(offset, offset + count)],
+            metadatas=[{'doc_id': f"doc{i // 10}", 'chunk': i % 10} for i in range(offset, offset + count)],
+            embeddings=random_vectors(count, dimension, rng),
+        )
+    print(f"Built store with {chunks} chunks in {time.perf_counter() - start:.1f}s")
+
+
+def measure_restart(directory, dimension):
+    """Time a cold open of the store in this process and return the measurements."""
+    timings = {}
+    start = time.perf_counter()
+    import chromadb  # noqa: F401
+    timings['import_s'] = time.perf_counter() - start
+
+    from utils.vector_store import LazyCollection
+
+    collection = LazyCollection(COLLECTION, directory)
+    start = time.perf_counter()
+    collection.collection
+    timings['open_s'] = time.perf_counter() - start
+
+    rng = random.Random(1)
+    for label in ('first_query_s', 'second_query_s'):
+        start = time.perf_counter()
+        collection.query(query_embeddings=random_vectors(1, dimension, rng), n_results=4)
+        timings[label] = time.perf_counter() - start
+    timings['restart_to_answer_s'] = timings['open_s'] + timings['first_query_s']
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark persistent Chroma warm restarts.')
+    parser.add_argument('--chunks', type=int, default=100000, help='Number of chunks in the store')
+    parser.add_argument('--dir', default=os.path.join(tempfile.gettempdir(), 'bench_chroma'),
+                        help='Persistent store directory (reused between runs)')
+    parser.add_argument('--runs', type=int, default=3, help='Number of restarts to time')
+    parser.add_argument('--dimension', type=int, default=DIMENSION)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure_restart(args.dir, args.dimension)))
+        return 0
+
+    build_store(args.dir, args.chunks, args.dimension)
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--dir', args.dir, '--dimension', str(args.dimension)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Warm restart of {args.chunks} chunks (median of {args.runs} runs):")
+    for key in runs[0]:
+        print(f"  {key:<22} {statistics.median(r[key] for r in runs):8.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,23 +4,55 @@ music_freshness_cag.py
 A Content-Aware Gatherer (CAG) for music freshness, following the workflow in AiDocs/how_to_create_music_freshness_cag.txt.
 
 Features:
-- Crawl top music news sites with thread limiting using etcd
+- Crawl top music news sites concurrently with thread limiting using a race-free,
+  watch-based etcd semaphore (FIFO, kept-alive lease, no polling)
+- Limit the request rate per domain with token buckets shared through etcd, taken
+  in batches so etcd traffic scales with workers rather than requests
+- Follow links from each homepage breadth-first to reach the actual articles
 - Use the PageCrawler module to fetch and parse web pages
-- Extract embeddings from crawled content using sentence-transformers
-- Store embeddings in a local Chroma vector database
-- Provide a query interface to retrieve relevant context
+- Split crawled pages into overlapping token windows and embed all chunks in batches
+  using sentence-transformers
+- Append page snapshots (URL, fetch time, content hash) to a compressed JSONL corpus
+  with an offset index, and embed only the snapshots newer than the last sync
+- Incremental, content-hashed upserts: only new or changed chunks are re-embedded
+- Long-running scheduler mode (``--schedule``) that recrawls each page on an interval
+  adapted to how often its content hash changes, within global and per-domain budgets
+- Crawl, store, chunk, embed and index as a staged pipeline with bounded queues, so
+  embedding overlaps network I/O; per-stage throughput and queue depth are reported
+- Store embeddings in a persistent local Chroma vector database (or, with
+  VECTOR_BACKEND=numpy, a memory-mapped in-process NumPy index), opened lazily on
+  first use so a restarted process answers queries from the existing index
+- Serve the newest index snapshot published to an object store (VECTOR_BACKEND=snapshot)
+- Provide a query interface to retrieve relevant context, with an LRU cache of
+  query embeddings so repeated queries skip the transformer forward pass
+- Assemble retrieved chunks into a de-duplicated, token-budgeted context and a
+  prompt laid out as instructions, context, question for Ollama prompt-cache reuse
+- Heavy resources (etcd, embedding model, vector store, crawler) are injected into
+  ``FreshnessCAG`` or created lazily, so importing the module is free and a
+  query-only process never touches etcd or the crawler
+- Reuse answers to semantically similar questions until a sync changes the index
+  (answers are tagged with a corpus epoch stored next to the vector store)
+- Stream the Ollama answer token by token over a pooled session, reporting time to
+  first token; failures raise ``OllamaError`` instead of exiting
 - Designed for Docker compatibility
 
 Dependencies:
 - requests
 - beautifulsoup4
 - etcd3
-- sentence-transformers
+- sentence-transformers (or onnxruntime and tokenizers with ``EMBEDDING_BACKEND=onnx``)
 - chromadb
 
 Usage:
     python fresh/music_freshness_cag.py
 
+    # Keep recrawling and re-indexing pages as they fall due
+    python fresh/music_freshness_cag.py --schedule
+
+    # Query-only use from another process
+    from fresh.music_freshness_cag import FreshnessCAG
+    context = FreshnessCAG().query_context("Latest music news")
+
 Docker:
     # Example Dockerfile usage:
     # docker build -t music-freshness-cag .
@@ -28,20 +60,19 @@ Docker:
 """
 
 import os
-import uuid
+import argparse
+import atexit
+import hashlib
 import json
 import time
-import etcd3
-import chromadb
-from sentence_transformers import SentenceTransformer
+import threading
 from urllib.parse import urlparse
-from threading import Thread
-import subprocess
 import importlib.util
 import pathlib
 import requests
+from requests.adapters import HTTPAdapter
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 
 # Configuration
 TOP_SITES = [
@@ -51,17 +82,107 @@ TOP_SITES = [
     "https://www.nme.com/"
 ]
 THREAD_LIMIT = 5
+CRAWL_WORKERS = 6
+PER_HOST_LIMIT = 2
+CRAWL_DEPTH = int(os.environ.get("CRAWL_DEPTH", 1))
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", 100))
+CRAWL_MAX_PAGES_PER_SITE = int(os.environ.get("CRAWL_MAX_PAGES_PER_SITE", 25))
 ETCD_HOST = os.environ.get("ETCD_HOST", "localhost")
 ETCD_PORT = int(os.environ.get("ETCD_PORT", 2379))
-CRAWL_OUTPUT_DIR = "fresh/crawled_json"
+# "etcd" shares crawl slots across processes; "local" limits within this process only
+CRAWL_LOCK_BACKEND = os.environ.get("CRAWL_LOCK_BACKEND", "etcd")
+# Requests per second per domain (shared by all workers), burst size, and tokens
+# taken from etcd per round trip
+CRAWL_RATE = float(os.environ.get("CRAWL_RATE", 1.0))
+CRAWL_BURST = int(os.environ.get("CRAWL_BURST", 5))
+RATE_LIMIT_BATCH = int(os.environ.get("RATE_LIMIT_BATCH", 5))
+# Scheduler mode (--schedule): recrawl intervals adapt between these bounds to how
+# often each page changes, within per-cycle global and per-domain budgets
+RECRAWL_MIN_INTERVAL = float(os.environ.get("RECRAWL_MIN_INTERVAL", 300))
+RECRAWL_MAX_INTERVAL = float(os.environ.get("RECRAWL_MAX_INTERVAL", 86400))
+RECRAWL_INITIAL_INTERVAL = float(os.environ.get("RECRAWL_INITIAL_INTERVAL", 3600))
+RECRAWL_MAX_PER_CYCLE = int(os.environ.get("RECRAWL_MAX_PER_CYCLE", 50))
+RECRAWL_MAX_PER_DOMAIN = int(os.environ.get("RECRAWL_MAX_PER_DOMAIN", 10))
+RECRAWL_STATE_PATH = os.environ.get("RECRAWL_STATE_PATH", "fresh/recrawl_schedule.json")
+# Append-only page snapshots (gzip JSONL with a .idx offset index)
+CRAWL_CORPUS_PATH = os.environ.get("CRAWL_CORPUS_PATH", "fresh/crawl_corpus.jsonl.gz")
+CRAWL_CACHE_PATH = os.environ.get("CRAWL_CACHE_PATH", "fresh/crawl_cache.json")
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "torch" (sentence-transformers), or "onnx"/"onnx-int8" for ONNX Runtime with the
+# model exported to ONNX_MODEL_DIR by utils/embedders.py's export_onnx()
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "")
+# all-MiniLM-L6-v2 reads at most 256 word pieces, so pages are embedded in windows
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", 40))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+# Ingestion pipeline: chunking threads, and capacity of each queue between stages
+CHUNK_WORKERS = int(os.environ.get("CHUNK_WORKERS", 2))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 64))
 CHROMA_COLLECTION = "music_freshness"
+# "chroma", "numpy" for the in-process NumPy index (no chromadb needed), or "snapshot"
+# to serve the newest index snapshot published to SNAPSHOT_STORE (e.g. by the crawler Lambda)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+SNAPSHOT_STORE = os.environ.get("SNAPSHOT_STORE", "")
+# Directory of the persistent Chroma store; empty for an in-memory store
+CHROMA_PERSIST_DIR = os.environ.get("CHROMA_PERSIST_DIR", "fresh/chroma_db")
+# Fetch time of the newest snapshot already synced into the store, kept inside the
+# store directory so it never outlives the index it describes
+SYNC_WATERMARK_PATH = os.path.join(CHROMA_PERSIST_DIR, "corpus_watermark.json") if CHROMA_PERSIST_DIR else ""
+# Answers reused for questions whose embedding is at least this cosine-similar,
+# until the next sync that changes the index
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.9))
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 256))
+ANSWER_CACHE_PATH = os.environ.get(
+    "ANSWER_CACHE_PATH", os.path.join(CHROMA_PERSIST_DIR, "answer_cache.npz") if CHROMA_PERSIST_DIR else "")
+# Chunks retrieved per question, and the token budget they are assembled into
+RETRIEVAL_CANDIDATES = int(os.environ.get("RETRIEVAL_CANDIDATES", 8))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+# Query embeddings cached in memory; set QUERY_CACHE_PATH to keep them across restarts
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 1024))
+QUERY_CACHE_PATH = os.environ.get("QUERY_CACHE_PATH", "")
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:4b")
+# Seconds to connect, and to wait for each streamed chunk (not for the whole answer)
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", 60))
+OLLAMA_POOL_SIZE = 4
+# Keep the model (and its prompt cache) loaded between questions
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+def load_util(name):
+    """Load a module from the top-level utils directory by file path."""
+    utils_path = pathlib.Path(__file__).parent.parent / 'utils' / f'{name}.py'
+    spec = importlib.util.spec_from_file_location(name, str(utils_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
-os.makedirs(CRAWL_OUTPUT_DIR, exist_ok=True)
+page_crawler = load_util('page_crawler')
+PageCrawler = page_crawler.PageCrawler
+frontier_crawler = load_util('frontier_crawler')
+FrontierCrawler = frontier_crawler.FrontierCrawler
+ingest = load_util('ingest')
+vector_store = load_util('vector_store')
+numpy_index = load_util('numpy_index')
+snapshot_store = load_util('snapshot_store')
+embedders = load_util('embedders')
+embedding_cache = load_util('embedding_cache')
+answer_cache = load_util('answer_cache')
+SemanticAnswerCache = answer_cache.SemanticAnswerCache
+context_assembler = load_util('context_assembler')
+crawl_corpus = load_util('crawl_corpus')
+etcd_semaphore = load_util('etcd_semaphore')
+rate_limiter = load_util('rate_limiter')
+LocalRateLimiter = rate_limiter.LocalRateLimiter
+EtcdRateLimiter = rate_limiter.EtcdRateLimiter
+Pipeline = load_util('pipeline').Pipeline
+recrawl_scheduler = load_util('recrawl_scheduler')
 
 def safe_etcd_client(host, port):
+    """Connect to etcd and verify the connection with a test round trip."""
+    import etcd3
+
     try:
         client = etcd3.client(host=host, port=port)
         # Test connection by putting and getting a test key
@@ -73,140 +194,672 @@ def safe_etcd_client(host, port):
             raise Exception("etcd test key mismatch")
         return client
     except Exception as e:
-        print(f"[ERROR] Could not connect to etcd at {host}:{port}. Is etcd running and accessible?\nError: {e}")
-        sys.exit(1)
+        raise ConnectionError(f"Could not connect to etcd at {host}:{port}. "
+                              f"Is etcd running and accessible?\nError: {e}") from e
 
-# Initialize etcd client
-etcd = safe_etcd_client(ETCD_HOST, ETCD_PORT)
+def get_domain(url):
+    return urlparse(url).netloc.replace('www.', '')
 
-# Initialize embedding model and Chroma DB
-embedder = SentenceTransformer(EMBEDDING_MODEL)
-chroma_client = chromadb.Client()
-collection = chroma_client.get_or_create_collection(CHROMA_COLLECTION)
+def page_id(url):
+    """Doc id of a crawled page: the domain for a homepage, domain plus a URL hash otherwise."""
+    parsed = urlparse(url)
+    if parsed.path in ('', '/') and not parsed.query:
+        return get_domain(url)
+    return f"{get_domain(url)}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}"
 
-utils_path = pathlib.Path(__file__).parent.parent / 'utils' / 'page_crawler.py'
-spec = importlib.util.spec_from_file_location('page_crawler', str(utils_path))
-page_crawler = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(page_crawler)
-PageCrawler = page_crawler.PageCrawler
+def open_snapshot_index(name, persist_dir):
+    """
+    Open the newest snapshot of ``name`` published to ``SNAPSHOT_STORE``, memory-mapped.
 
-crawler = PageCrawler()
+    Versions are downloaded once into ``<persist_dir>/snapshots``; ``collection.reopen()``
+    picks up a newer one. Without a published snapshot the index starts empty.
+    """
+    store = snapshot_store.open_object_store(SNAPSHOT_STORE)
+    latest = snapshot_store.download_latest(store, name, os.path.join(persist_dir or '.', 'snapshots'))
+    if latest is None:
+        return numpy_index.NumpyIndex()
+    index = numpy_index.NumpyIndex.load(latest['path'])
+    # Read-only replica: local changes are never written back to the cached version
+    index.path = None
+    return index
 
-def get_domain(url):
-    return urlparse(url).netloc.replace('www.', '')
+class LocalSlotLock:
+    """Per-domain crawl slots within this process, for single-node runs without etcd."""
 
-def acquire_thread_slot(domain):
-    """Acquire a thread slot for a domain using etcd semaphores."""
-    prefix = f"/crawler/semaphores/{domain}/"
-    keys = list(etcd.get_prefix(prefix, keys_only=True))
-    if len(keys) < THREAD_LIMIT:
-        lease = etcd.lease(300)  # 5 minutes
-        thread_id = str(uuid.uuid4())
-        key = f"{prefix}thread-{thread_id}"
-        etcd.put(key, "", lease=lease)
-        return key, lease
-    return None, None
-
-def release_thread_slot(key, lease):
-    if key:
-        etcd.delete(key)
-        if lease:
-            lease.revoke()
-
-def crawl_and_store(url):
-    domain = get_domain(url)
-    key, lease = None, None
-    try:
-        # Acquire thread slot
-        while True:
-            key, lease = acquire_thread_slot(domain)
-            if key:
-                break
-            print(f"Thread limit reached for {domain}, waiting...")
-            time.sleep(2)
-        # Crawl and save
-        output_file = os.path.join(CRAWL_OUTPUT_DIR, f"{domain}.json")
-        print(f"Crawling {url} -> {output_file}")
-        crawler.crawl_and_save(url, output_file)
-    finally:
-        release_thread_slot(key, lease)
-
-def extract_and_store_embeddings():
-    """Extract embeddings from crawled JSON files and store in Chroma DB."""
-    for fname in os.listdir(CRAWL_OUTPUT_DIR):
-        if fname.endswith('.json'):
-            with open(os.path.join(CRAWL_OUTPUT_DIR, fname), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            doc_id = fname.replace('.json', '')
-            text = data.get('text', '')
-            if not text:
+    def __init__(self, limit=THREAD_LIMIT):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    @contextmanager
+    def slot(self, domain):
+        """Hold a slot for ``domain`` for the duration of the block."""
+        with self._lock:
+            semaphore = self._semaphores.setdefault(domain, threading.BoundedSemaphore(self.limit))
+        with semaphore:
+            yield
+
+class FreshnessCAG:
+    """
+    The freshness CAG with its heavy resources injected or created lazily.
+
+    Every resource (embedding model, vector store, crawl lock backend, crawler) can
+    be passed in; anything left out is created on first use from the module
+    configuration. A query-only process therefore never connects to etcd or
+    builds a crawler, and importing this module costs nothing.
+    """
+
+    def __init__(self, embedder=None, collection=None, lock=None, rate_limiter=None, crawler=None,
+                 frontier=None, query_cache=None, answer_cache=None, corpus=None, scheduler=None,
+                 watermark_path=SYNC_WATERMARK_PATH, embedding_model=EMBEDDING_MODEL,
+                 embedding_backend=EMBEDDING_BACKEND):
+        """
+        Args:
+            embedder: Object with SentenceTransformer's ``encode``; defaults to the
+                ``embedding_backend`` embedder of ``embedding_model``.
+            collection: Chroma-like collection; defaults to a lazily opened persistent store.
+            lock: Crawl lock backend with a ``slot(domain)`` context manager; defaults to
+                an ``EtcdSemaphore`` (or ``LocalSlotLock`` when ``CRAWL_LOCK_BACKEND=local``).
+            rate_limiter: Per-domain request-rate limiter with ``acquire(domain)``; defaults to
+                an ``EtcdRateLimiter`` (or ``LocalRateLimiter`` when ``CRAWL_LOCK_BACKEND=local``)
+                allowing ``CRAWL_RATE`` requests per second.
+            crawler (PageCrawler, optional): Page crawler.
+            frontier (FrontierCrawler, optional): Link-following crawler over ``crawler``.
+            query_cache (QueryEmbeddingCache, optional): Cache of query embeddings; defaults
+                to one sized by ``QUERY_CACHE_SIZE`` and saved to ``QUERY_CACHE_PATH`` at exit.
+            answer_cache (SemanticAnswerCache, optional): Cache of generated answers; defaults
+                to one configured by ``ANSWER_CACHE_*`` and saved at exit.
+            corpus (CrawlCorpus, optional): Page snapshot corpus; defaults to ``CRAWL_CORPUS_PATH``.
+            scheduler (RecrawlScheduler, optional): Recrawl schedule of ``run_scheduler``; defaults
+                to one configured by ``RECRAWL_*`` and saved to ``RECRAWL_STATE_PATH``.
+            watermark_path (str): File recording the newest corpus snapshot already synced
+                into the collection and the corpus epoch; empty keeps them in memory only.
+            embedding_model (str): Name of the embedding model, part of the query cache key.
+            embedding_backend (str): ``torch``, ``onnx`` or ``onnx-int8`` (see ``utils/embedders.py``).
+        """
+        self._embedder = embedder
+        self._collection = collection
+        self._lock = lock
+        self._rate_limiter = rate_limiter
+        self._etcd = None
+        self._crawler = crawler
+        self._frontier = frontier
+        self._query_cache = query_cache
+        self._corpus = corpus
+        self._scheduler = scheduler
+        self.watermark_path = watermark_path
+        self._state = {'watermark': None, 'epoch': 0}
+        self._state_mtime = None
+        self._answer_cache = answer_cache
+        # Epoch the answer cache was last pruned to
+        self._answers_epoch = None
+        self.embedding_model = embedding_model
+        self.embedding_backend = embedding_backend
+        # Reentrant: factories read other lazy resources (the frontier its crawler, the
+        # lock backends the shared etcd client) while the lock is held
+        self._init_lock = threading.RLock()
+
+    def _lazy(self, attr, factory):
+        if getattr(self, attr) is None:
+            with self._init_lock:
+                if getattr(self, attr) is None:
+                    setattr(self, attr, factory())
+        return getattr(self, attr)
+
+    @property
+    def embedder(self):
+        def create():
+            return embedders.load_embedder(self.embedding_backend, self.embedding_model, ONNX_MODEL_DIR)
+        return self._lazy('_embedder', create)
+
+    @property
+    def embedding_key(self):
+        """Model name keying cached query embeddings; backends other than torch embed slightly differently."""
+        if self.embedding_backend == 'torch':
+            return self.embedding_model
+        return f"{self.embedding_model}@{self.embedding_backend}"
+
+    @property
+    def query_cache(self):
+        def create():
+            cache = embedding_cache.QueryEmbeddingCache(QUERY_CACHE_SIZE, QUERY_CACHE_PATH or None)
+            if QUERY_CACHE_PATH:
+                atexit.register(cache.save)
+            return cache
+        return self._lazy('_query_cache', create)
+
+    @property
+    def answer_cache(self):
+        def create():
+            cache = SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE, ANSWER_CACHE_PATH or None)
+            if ANSWER_CACHE_PATH:
+                atexit.register(cache.save)
+            return cache
+        return self._lazy('_answer_cache', create)
+
+    @property
+    def corpus(self):
+        return self._lazy('_corpus', lambda: crawl_corpus.CrawlCorpus(CRAWL_CORPUS_PATH))
+
+    @property
+    def scheduler(self):
+        return self._lazy('_scheduler', lambda: recrawl_scheduler.RecrawlScheduler(
+            RECRAWL_MIN_INTERVAL, RECRAWL_MAX_INTERVAL, RECRAWL_INITIAL_INTERVAL,
+            max_per_cycle=RECRAWL_MAX_PER_CYCLE, max_per_domain=RECRAWL_MAX_PER_DOMAIN,
+            path=RECRAWL_STATE_PATH or None))
+
+    @property
+    def collection(self):
+        opener = {"numpy": numpy_index.open_index, "snapshot": open_snapshot_index}.get(
+            VECTOR_BACKEND, vector_store.open_collection)
+        return self._lazy('_collection', lambda: vector_store.LazyCollection(
+            CHROMA_COLLECTION, CHROMA_PERSIST_DIR, opener=opener))
+
+    @property
+    def etcd(self):
+        return self._lazy('_etcd', lambda: safe_etcd_client(ETCD_HOST, ETCD_PORT))
+
+    @property
+    def lock(self):
+        def create():
+            if CRAWL_LOCK_BACKEND == "local":
+                return LocalSlotLock()
+            return etcd_semaphore.EtcdSemaphore(self.etcd, THREAD_LIMIT)
+        return self._lazy('_lock', create)
+
+    @property
+    def rate_limiter(self):
+        def create():
+            if CRAWL_LOCK_BACKEND == "local":
+                return LocalRateLimiter(CRAWL_RATE, CRAWL_BURST)
+            return EtcdRateLimiter(self.etcd, CRAWL_RATE, CRAWL_BURST, RATE_LIMIT_BATCH)
+        return self._lazy('_rate_limiter', create)
+
+    @property
+    def crawler(self):
+        return self._lazy('_crawler', lambda: PageCrawler(
+            max_workers=CRAWL_WORKERS, per_host_limit=PER_HOST_LIMIT, cache_path=CRAWL_CACHE_PATH))
+
+    @property
+    def frontier(self):
+        return self._lazy('_frontier', lambda: FrontierCrawler(
+            self.crawler, max_depth=CRAWL_DEPTH, max_pages=CRAWL_MAX_PAGES,
+            max_pages_per_site=CRAWL_MAX_PAGES_PER_SITE))
+
+    @contextmanager
+    def thread_slot(self, url):
+        """Hold a crawl slot for the domain of ``url`` and wait for its rate limit while crawling it."""
+        domain = get_domain(url)
+        with self.lock.slot(domain):
+            self.rate_limiter.acquire(domain)
+            yield
+
+    def crawl_all(self, urls):
+        """
+        Crawl ``urls`` and the pages they link to (up to ``CRAWL_DEPTH`` hops) concurrently,
+        appending a snapshot of each changed page to the corpus as it completes.
+
+        Returns the doc ids of pages that were not modified since the last crawl.
+        """
+        unchanged = set()
+        for record in self.frontier.crawl(urls, guard=self.thread_slot):
+            if record['error']:
+                print(f"[ERROR] Exception during crawling {record['url']}: {record['error']}")
+                continue
+            if record['not_modified']:
+                unchanged.add(page_id(record['url']))
+                print(f"Not modified: {record['url']}")
                 continue
-            embedding = embedder.encode([text])[0].tolist()
-            collection.add(
-                documents=[text],
-                embeddings=[embedding],
-                ids=[doc_id]
+            entry = self.corpus.append(record['url'], record['text'], record['title'])
+            status = "unchanged text" if entry is None else f"snapshot {entry['hash'][:12]}"
+            print(f"Crawled {record['url']} (depth {record['depth']}): {status}")
+        return unchanged
+
+    def _sync_state(self):
+        """The ``watermark`` and corpus ``epoch`` of the last sync, re-read when another process changed them."""
+        if self.watermark_path and os.path.exists(self.watermark_path):
+            mtime = os.path.getmtime(self.watermark_path)
+            if mtime != self._state_mtime:
+                with open(self.watermark_path, 'r', encoding='utf-8') as f:
+                    self._state = {'watermark': None, 'epoch': 0, **json.load(f)}
+                self._state_mtime = mtime
+        return self._state
+
+    def _save_sync_state(self, **changes):
+        self._state = {**self._sync_state(), **changes}
+        if self.watermark_path:
+            os.makedirs(os.path.dirname(self.watermark_path) or '.', exist_ok=True)
+            # Write then rename, so a crash mid-write never leaves a truncated state file
+            tmp_path = f"{self.watermark_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.watermark_path)
+            self._state_mtime = os.path.getmtime(self.watermark_path)
+        if 'epoch' in changes and self._answer_cache is not None:
+            self._prune_answers(self._state['epoch'])
+
+    def _prune_answers(self, epoch):
+        """Drop cached answers of earlier corpus epochs; they can never match again."""
+        if epoch != self._answers_epoch:
+            self.answer_cache.prune(epoch)
+            self._answers_epoch = epoch
+
+    @property
+    def synced_watermark(self):
+        """Fetch time of the newest corpus snapshot already synced into the collection."""
+        return self._sync_state()['watermark']
+
+    @property
+    def corpus_epoch(self):
+        """Version of the indexed corpus, bumped by every sync that changes the collection."""
+        return self._sync_state()['epoch']
+
+    def extract_and_store_embeddings(self, since=None):
+        """
+        Chunk the latest corpus snapshots and sync them into Chroma DB.
+
+        Only pages with a snapshot newer than ``since`` (by default, the newest snapshot
+        synced so far) are read. Of those, only chunks whose content hash is new or
+        changed are embedded (in batches) and upserted; chunks that disappeared from a
+        page are deleted.
+        """
+        if since is None:
+            since = self.synced_watermark
+        snapshots = self.corpus.latest(since)
+        if not snapshots:
+            return
+        documents = {page_id(url): record['text'] for url, record in snapshots.items() if record['text']}
+        epoch = self.corpus_epoch
+        if documents:
+            embedder = self.embedder
+            stats = ingest.sync_documents(self.collection, embedder, documents, CHUNK_TOKENS, CHUNK_OVERLAP,
+                                          tokenizer=getattr(embedder, 'tokenizer', None),
+                                          batch_size=EMBED_BATCH_SIZE)
+            print(f"Synced {len(documents)} documents: {stats['upserted']} chunks embedded, "
+                  f"{stats['unchanged']} unchanged, {stats['deleted']} deleted")
+            # Chroma persists on its own; the NumPy index is saved explicitly
+            flush = getattr(self.collection, 'flush', None)
+            if flush:
+                flush()
+            if stats['upserted'] or stats['deleted']:
+                # Cached answers were generated against the previous index
+                epoch += 1
+        self._save_sync_state(watermark=max(record['fetched_at'] for record in snapshots.values()),
+                              epoch=epoch)
+
+    def crawl_and_index(self, urls, skip=None, budget=None, observe=None):
+        """
+        Crawl ``urls`` and index the changed pages in one staged pipeline.
+
+        The frontier crawl (fetching and parsing on its own ``CRAWL_WORKERS`` threads)
+        feeds four stages connected by queues of ``PIPELINE_QUEUE_SIZE`` items:
+
+        - ``store``: append each changed page to the corpus
+        - ``chunk``: split it into windows, drop chunks whose content hash is already
+          stored and delete chunks that vanished from the page (``CHUNK_WORKERS`` threads)
+        - ``embed``: encode changed chunks in batches of ``EMBED_BATCH_SIZE``
+        - ``index``: upsert each embedded batch
+
+        Pages are embedded while the crawl is still running, and memory is bounded by
+        the queues rather than the size of the crawl. Snapshots left unsynced by an
+        earlier run are synced first, and the watermark only advances if no stage failed.
+
+        Args:
+            urls (list): Seed URLs.
+            skip (Callable[[str], bool], optional): Passed to ``FrontierCrawler.crawl``.
+            budget (Callable[[str], bool], optional): Passed to ``FrontierCrawler.crawl``.
+            observe (Callable[[str, Optional[bool]], None], optional): Called with each crawled
+                URL and whether its content changed (None after an error or for a first snapshot).
+
+        Returns:
+            dict: Per-stage statistics from ``Pipeline.run``.
+        """
+        if self.corpus.watermark != self.synced_watermark:
+            self.extract_and_store_embeddings()
+        embedder = self.embedder
+        tokenizer = getattr(embedder, 'tokenizer', None)
+        collection = self.collection
+        counts = {'upserted': 0, 'deleted': 0}
+        counts_lock = threading.Lock()
+
+        def store(record):
+            if record['error']:
+                print(f"[ERROR] Exception during crawling {record['url']}: {record['error']}")
+                entry, changed = None, None
+            elif record['not_modified']:
+                print(f"Not modified: {record['url']}")
+                entry, changed = None, False
+            else:
+                # A first snapshot says nothing about how often the page changes
+                seen = record['url'] in self.corpus
+                entry = self.corpus.append(record['url'], record['text'], record['title'])
+                status = "unchanged text" if entry is None else f"snapshot {entry['hash'][:12]}"
+                print(f"Crawled {record['url']} (depth {record['depth']}): {status}")
+                changed = (entry is not None) if seen else None
+            if observe is not None:
+                observe(record['url'], changed)
+            return None if entry is None else (page_id(record['url']), record['text'])
+
+        def chunk(page):
+            doc_id, text = page
+            chunks = ingest.build_chunks({doc_id: text}, CHUNK_TOKENS, CHUNK_OVERLAP, tokenizer)
+            stored = ingest.stored_hashes(collection, [doc_id])
+            current_ids = {c['id'] for c in chunks}
+            vanished = [chunk_id for chunk_id in stored if chunk_id not in current_ids]
+            if vanished:
+                collection.delete(ids=vanished)
+                with counts_lock:
+                    counts['deleted'] += len(vanished)
+            return [c for c in chunks if stored.get(c['id']) != c['metadata']['hash']]
+
+        def embed(chunks):
+            return chunks, ingest.embed_chunks(embedder, chunks, EMBED_BATCH_SIZE)
+
+        def index(batch):
+            chunks, embeddings = batch
+            collection.upsert(
+                ids=[c['id'] for c in chunks],
+                documents=[c['text'] for c in chunks],
+                metadatas=[c['metadata'] for c in chunks],
+                embeddings=embeddings,
             )
-            print(f"Stored embedding for {doc_id}")
-
-def query_context(query, n_results=2):
-    """Query Chroma DB for relevant context."""
-    query_embedding = embedder.encode([query]).tolist()
-    results = collection.query(
-        query_embeddings=query_embedding,
-        n_results=n_results
-    )
-    docs = results.get('documents', [[]])[0]
-    return "\n".join(docs)
+            with counts_lock:
+                counts['upserted'] += len(chunks)
 
-def call_ollama_with_context(context, query, model=None, host=None):
-    """Call Ollama model via HTTP API with the retrieved context and query."""
-    if model is None:
-        model = OLLAMA_MODEL
-    if host is None:
-        host = OLLAMA_HOST
-    prompt = f"""
-Use the context to answer the question.
-
-Context:
-{context}
-
-Question: {query}
-"""
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
+        stages = (Pipeline()
+                  .add_stage('store', store, queue_size=PIPELINE_QUEUE_SIZE)
+                  .add_stage('chunk', chunk, workers=CHUNK_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                             fan_out=True)
+                  .add_stage('embed', embed, queue_size=PIPELINE_QUEUE_SIZE, batch_size=EMBED_BATCH_SIZE)
+                  .add_stage('index', index, queue_size=PIPELINE_QUEUE_SIZE))
+        stats = stages.run(self.frontier.crawl(urls, guard=self.thread_slot, skip=skip, budget=budget))
+        print(f"Indexed {counts['upserted']} chunks, deleted {counts['deleted']}")
+
+        flush = getattr(collection, 'flush', None)
+        if flush:
+            flush()
+        state = {}
+        if counts['upserted'] or counts['deleted']:
+            # Cached answers were generated against the previous index
+            state['epoch'] = self.corpus_epoch + 1
+        if not any(stage.get('errors') for stage in stats.values()):
+            state['watermark'] = self.corpus.watermark
+        if state:
+            self._save_sync_state(**state)
+        return stats
+
+    def run_scheduler(self, seeds, max_cycles=None, sleep=time.sleep):
+        """
+        Keep the index fresh by recrawling pages when they are due.
+
+        ``seeds`` are added to the recrawl schedule, then each cycle takes the due URLs
+        (within ``RECRAWL_MAX_PER_CYCLE`` and ``RECRAWL_MAX_PER_DOMAIN``) and runs them
+        through ``crawl_and_index``. Every crawled page, including newly discovered
+        links, is rescheduled by whether its content changed. Links that are scheduled
+        but not yet due are not fetched, and discovered links count against the same
+        cycle and per-domain budgets as the due URLs, so link following cannot fetch
+        more than ``RECRAWL_MAX_PER_CYCLE`` pages a cycle. Between cycles the
+        scheduler sleeps until the next URL is due.
+
+        Args:
+            seeds (list): URLs to keep fresh.
+            max_cycles (int, optional): Stop after this many crawl cycles; None runs forever.
+            sleep (Callable[[float], None]): Used to wait for the next due URL.
+        """
+        scheduler = self.scheduler
+        for seed in seeds:
+            canonical = frontier_crawler.canonicalize_url(seed)
+            if canonical:
+                scheduler.add(canonical)
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            due = scheduler.pop_due()
+            if not due:
+                next_due = scheduler.next_due()
+                wait = RECRAWL_MIN_INTERVAL if next_due is None else next_due - scheduler.clock()
+                sleep(max(wait, 0.0))
+                continue
+            cycles += 1
+            print(f"\nRecrawl cycle {cycles}: {len(due)} due of {len(scheduler)} scheduled pages")
+            recorded = set()
+            fetched = len(due)
+            per_domain = {}
+            for url in due:
+                domain = scheduler.domain_of(url)
+                per_domain[domain] = per_domain.get(domain, 0) + 1
+
+            def observe(url, changed):
+                scheduler.record(url, changed)
+                recorded.add(url)
+
+            def budget(url):
+                # Only called for links the frontier is about to fetch, so rejected ones cost nothing
+                nonlocal fetched
+                domain = scheduler.domain_of(url)
+                if ((scheduler.max_per_cycle is not None and fetched >= scheduler.max_per_cycle)
+                        or (scheduler.max_per_domain is not None
+                            and per_domain.get(domain, 0) >= scheduler.max_per_domain)):
+                    return False
+                fetched += 1
+                per_domain[domain] = per_domain.get(domain, 0) + 1
+                return True
+
+            stats = self.crawl_and_index(due, skip=lambda url: not scheduler.is_due(url),
+                                         budget=budget, observe=observe)
+            for url in due:
+                # Taken but never fetched (e.g. disallowed by robots.txt): try again later
+                if url not in recorded:
+                    scheduler.record(url, None)
+            scheduler.save()
+            print(Pipeline.format_stats(stats))
+
+    def query_context(self, query, n_results=RETRIEVAL_CANDIDATES, budget_tokens=CONTEXT_TOKEN_BUDGET):
+        """
+        Query Chroma DB for the most relevant chunks and assemble them into a context.
+
+        Duplicate chunks are dropped, overlapping windows of a page are stitched
+        together, and the result is cut to ``budget_tokens`` (see ``assemble_context``).
+        """
+        query_embedding = self.query_cache.encode(self.embedder, [query], self.embedding_key).tolist()
+        results = self.collection.query(
+            query_embeddings=query_embedding,
+            n_results=n_results,
+            include=["documents", "metadatas"],
+        )
+        docs = results.get('documents', [[]])[0]
+        metadatas = (results.get('metadatas') or [None])[0]
+        return context_assembler.assemble_context(docs, metadatas, budget_tokens)
+
+    def stream_answer(self, query, model=None, stats=None):
+        """
+        Answer ``query`` from the corpus, streaming the answer as it is generated.
+
+        If a question similar enough to ``query`` was answered against the current
+        corpus epoch, its cached answer is yielded whole, without retrieval or
+        generation. Otherwise the answer is generated over the retrieved context and
+        cached once complete.
+
+        Args:
+            query (str): The user's question.
+            model (str, optional): Ollama model; defaults to ``OLLAMA_MODEL``.
+            stats (dict, optional): Filled with ``cached`` (and ``similarity`` on a hit) in
+                addition to the counters of ``stream_ollama_with_context``.
+
+        Raises:
+            OllamaError: See ``stream_ollama_with_context``.
+        """
+        model = model or OLLAMA_MODEL
+        stats = {} if stats is None else stats
+        start = time.perf_counter()
+        vector = self.query_cache.encode(self.embedder, [query], self.embedding_key)[0]
+        epoch = self.corpus_epoch
+        # Also catches epochs bumped by a sync in another process
+        self._prune_answers(epoch)
+        hit = self.answer_cache.lookup(vector, epoch, model)
+        stats['cached'] = hit is not None
+        if hit is not None:
+            elapsed = time.perf_counter() - start
+            stats.update(similarity=hit['similarity'], ttft_s=elapsed, total_s=elapsed, chunks=1)
+            yield hit['answer']
+            return
+        tokens = []
+        for token in stream_ollama_with_context(self.query_context(query), query, model=model, stats=stats):
+            tokens.append(token)
+            yield token
+        # Tagged with the epoch retrieval ran against, even if a sync finished meanwhile
+        self.answer_cache.store(vector, query, "".join(tokens), epoch, model)
+
+_default_cag = None
+
+def default_cag():
+    """Return the module-wide ``FreshnessCAG``, created on first use."""
+    global _default_cag
+    if _default_cag is None:
+        _default_cag = FreshnessCAG()
+    return _default_cag
+
+def crawl_all(urls):
+    return default_cag().crawl_all(urls)
+
+def extract_and_store_embeddings(since=None):
+    return default_cag().extract_and_store_embeddings(since)
+
+def crawl_and_index(urls):
+    return default_cag().crawl_and_index(urls)
+
+def query_context(query, n_results=RETRIEVAL_CANDIDATES, budget_tokens=CONTEXT_TOKEN_BUDGET):
+    return default_cag().query_context(query, n_results, budget_tokens)
+
+class OllamaError(RuntimeError):
+    """Ollama could not be reached or returned an error."""
+
+_ollama_session = None
+_ollama_session_lock = threading.Lock()
+
+def ollama_session():
+    """Return the module-wide pooled HTTP session for Ollama, created on first use."""
+    global _ollama_session
+    if _ollama_session is None:
+        with _ollama_session_lock:
+            if _ollama_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _ollama_session = session
+    return _ollama_session
+
+def stream_ollama_with_context(context, query, model=None, host=None, session=None, stats=None):
+    """
+    Stream the Ollama answer to ``query`` over the retrieved ``context``, token by token.
+
+    The read timeout applies between streamed chunks rather than to the whole answer,
+    so long answers do not time out as long as tokens keep arriving.
+
+    Args:
+        context (str): Retrieved context.
+        query (str): The user's question.
+        model (str, optional): Ollama model; defaults to ``OLLAMA_MODEL``.
+        host (str, optional): Ollama URL; defaults to ``OLLAMA_HOST``.
+        session (requests.Session, optional): HTTP session; defaults to ``ollama_session()``.
+        stats (dict, optional): Filled with ``ttft_s`` (time to first token), ``total_s``,
+            ``chunks`` and Ollama's final counters (``eval_count``, ``eval_duration``, ...).
+
+    Yields:
+        str: Pieces of the answer as they arrive.
+
+    Raises:
+        OllamaError: If Ollama is unreachable, answers with an error, or sends invalid data.
+    """
+    model = model or OLLAMA_MODEL
+    host = host or OLLAMA_HOST
+    session = session or ollama_session()
+    stats = {} if stats is None else stats
+    stats.update(ttft_s=None, total_s=None, chunks=0)
+    # Instructions, then context, then question: repeated and follow-up questions over the
+    # same context share a prompt prefix whose KV cache Ollama keeps while the model is loaded
+    payload = {"model": model, "prompt": context_assembler.build_prompt(context, query),
+               "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+    start = time.perf_counter()
     try:
-        response = requests.post(f"{host}/api/generate", json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("response", "")
+        with session.post(f"{host}/api/generate", json=payload, stream=True,
+                          timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    raise OllamaError(f"Invalid response from Ollama at {host}: {line[:200]!r}") from e
+                if data.get("error"):
+                    raise OllamaError(f"Ollama error: {data['error']}")
+                token = data.get("response", "")
+                if token:
+                    if stats["ttft_s"] is None:
+                        stats["ttft_s"] = time.perf_counter() - start
+                    stats["chunks"] += 1
+                    yield token
+                if data.get("done"):
+                    stats.update({k: v for k, v in data.items() if k.endswith(("_count", "_duration"))})
+                    break
     except requests.RequestException as e:
-        print(f"[ERROR] Could not connect to Ollama at {host}. Is Ollama running and accessible?\nError: {e}")
-        sys.exit(1)
+        raise OllamaError(f"Could not get an answer from Ollama at {host}. Is Ollama running and accessible?\nError: {e}") from e
+    finally:
+        stats["total_s"] = time.perf_counter() - start
+
+def call_ollama_with_context(context, query, model=None, host=None):
+    """
+    Call Ollama model via HTTP API with the retrieved context and query and return the whole answer.
 
-def main():
-    # Step 1: Crawl all top sites using a pool of 6 threads
-    with ThreadPoolExecutor(max_workers=6) as executor:
-        futures = [executor.submit(crawl_and_store, url) for url in TOP_SITES]
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"[ERROR] Exception during crawling: {e}")
-    # Step 2: Extract and store embeddings
-    extract_and_store_embeddings()
-    # Step 3: Query example
+    Raises:
+        OllamaError: See ``stream_ollama_with_context``.
+    """
+    return "".join(stream_ollama_with_context(context, query, model, host))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl music news sites, index them and answer a question.")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Run as a long-running recrawl scheduler instead of crawling once and answering")
+    parser.add_argument("--cycles", type=int, default=None,
+                        help="With --schedule, stop after this many crawl cycles")
+    args = parser.parse_args(argv)
+    cag = default_cag()
+    try:
+        # Connect the crawl lock and rate limiter backends up front; inside the crawl an
+        # unreachable etcd would only show up as one failed record per URL
+        cag.lock
+        cag.rate_limiter
+    except ConnectionError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    if args.schedule:
+        try:
+            cag.run_scheduler(TOP_SITES, max_cycles=args.cycles)
+        except KeyboardInterrupt:
+            cag.scheduler.save()
+        return
+    # Steps 1-2: Crawl all top sites concurrently with per-host limits, embedding and
+    # indexing changed pages while the crawl is still running
+    stats = cag.crawl_and_index(TOP_SITES)
+    print(f"\n{Pipeline.format_stats(stats)}")
+    # Step 3: Query example, answered from the semantic cache when a similar question
+    # was answered against the current corpus
     query = "Latest music news"
     print(f"\nQuery: {query}")
-    context = query_context(query)
-    print(f"Relevant context:\n{context[:500]}...")
-    # Step 4: Call Ollama with context
-    print("\nCalling Ollama for LLM answer...")
-    answer = call_ollama_with_context(context, query)
-    print(f"\nOllama LLM answer:\n{answer}")
+    # Step 4: Stream the Ollama answer as it is generated
+    print("\nCalling Ollama for LLM answer...\n\nOllama LLM answer:")
+    stats = {}
+    try:
+        for token in cag.stream_answer(query, stats=stats):
+            print(token, end="", flush=True)
+    except OllamaError as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
+    if stats["cached"]:
+        print(f"\n\n(cached answer, similarity {stats['similarity']:.2f})")
+    elif stats["ttft_s"] is not None:
+        print(f"\n\n(first token after {stats['ttft_s']:.2f}s, answer complete after {stats['total_s']:.2f}s)")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
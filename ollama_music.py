@@ -1,10 +1,18 @@
 import requests
+from requests.adapters import HTTPAdapter
 import argparse
 import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # OLLAMA_HOST = 'http://localhost:11434'  # Adjust if your Ollama server is running elsewhere
 OLLAMA_HOST = 'http://localhost:3000'  # Adjust if your Ollama server is running elsewhere
 MODEL = 'gemma3:4b'
+CONNECT_TIMEOUT = 5  # Seconds to connect to Ollama
+READ_TIMEOUT = 60  # Seconds to wait for each streamed chunk, not for the whole answer
+BATCH_CONCURRENCY = 4  # Queries in flight at once in batch mode
 
 # Define the music lover persona
 MUSIC_LOVER_PERSONA = """You are an enthusiastic and knowledgeable music lover with a deep passion 
@@ -19,62 +27,201 @@ for all genres of music. You have:
 Please maintain this personality in all your responses, sharing your enthusiasm 
 and personal perspective while being informative and engaging."""
 
-def query_ollama(query):
+def make_session(pool_size=BATCH_CONCURRENCY):
+    """Return an HTTP session keeping up to ``pool_size`` connections to Ollama open for reuse."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def query_ollama(query, session=None, model=MODEL, read_timeout=READ_TIMEOUT, stats=None):
+    """
+    Ask the music lover persona ``query`` and return the whole streamed answer.
+
+    Args:
+        query (str): The question.
+        session (requests.Session, optional): Session to send the request on.
+        model (str): Ollama model.
+        read_timeout (float): Seconds to wait for each streamed chunk.
+        stats (dict, optional): Filled with ``ttft_s`` (time to first token) and ``total_s``.
+
+    Raises:
+        requests.RequestException: If Ollama cannot be reached, times out or answers with an HTTP error.
+        RuntimeError: If Ollama reports an error in the stream.
+    """
     url = f"{OLLAMA_HOST}/api/chat"
     headers = {'Content-Type': 'application/json'}
-    
+
     # Include the persona as the system message and the user query
     messages = [
         {"role": "system", "content": MUSIC_LOVER_PERSONA},
         {"role": "user", "content": query}
     ]
-    
+
     payload = {
-        "model": MODEL,
+        "model": model,
         "messages": messages,
         "stream": True  # Enable streaming for line-by-line processing
     }
 
-    response = requests.post(url, json=payload, headers=headers, stream=True)
-    response.raise_for_status()
-    
-    # Process the streaming response
-    full_response = ""
-    for line in response.iter_lines():
-        if line:
-            json_response = json.loads(line)
-            if 'message' in json_response:
-                content = json_response['message'].get('content', '')
-                full_response += content
-    
-    return full_response
+    stats = {} if stats is None else stats
+    stats.update(ttft_s=None, total_s=None)
+    start = time.perf_counter()
+    post = session.post if session is not None else requests.post
+    try:
+        with post(url, json=payload, headers=headers, stream=True,
+                  timeout=(CONNECT_TIMEOUT, read_timeout)) as response:
+            response.raise_for_status()
+
+            # Process the streaming response; joining the pieces once keeps long answers linear
+            parts = []
+            for line in response.iter_lines():
+                if line:
+                    json_response = json.loads(line)
+                    if json_response.get('error'):
+                        raise RuntimeError(f"Ollama error: {json_response['error']}")
+                    if 'message' in json_response:
+                        content = json_response['message'].get('content', '')
+                        if content and stats['ttft_s'] is None:
+                            stats['ttft_s'] = time.perf_counter() - start
+                        parts.append(content)
+                    if json_response.get('done'):
+                        break
+    finally:
+        stats['total_s'] = time.perf_counter() - start
+
+    return "".join(parts)
+
+def read_queries(source):
+    """Return the non-empty lines of the file ``source`` (``-`` for stdin) as queries."""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+def completed_queries(output):
+    """
+    Return ``(index, query)`` of every successful record in the JSONL file ``output``.
+
+    A last line cut off by an interrupted run is removed, so appending continues
+    on a clean line. Records with an error are not counted and their queries run again.
+    """
+    done = set()
+    try:
+        with open(output, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+                data = data[:data.rfind(b'\n') + 1]
+    except FileNotFoundError:
+        return done
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('error') is None:
+            done.add((record.get('index'), record.get('query')))
+    return done
+
+def run_batch(queries, output=None, concurrency=BATCH_CONCURRENCY, model=MODEL,
+              read_timeout=READ_TIMEOUT, session=None):
+    """
+    Answer ``queries`` with at most ``concurrency`` requests in flight, writing one JSONL record each.
+
+    Each record holds the query's ``index`` (its position in ``queries``), the ``query``,
+    the ``response`` or the ``error``, and ``ttft_s``/``total_s`` timings. Records are
+    written in completion order and flushed one by one. When ``output`` already holds
+    results, queries answered there (same index and text) are skipped, so an interrupted
+    batch resumes where it stopped; a query that failed is retried and its new record
+    follows the old one.
+
+    Args:
+        queries (list): The questions.
+        output (str, optional): JSONL file appended to; stdout (without resuming) by default.
+        concurrency (int): Queries in flight at once, over one pooled session.
+        model (str): Ollama model.
+        read_timeout (float): Seconds to wait for each streamed chunk.
+        session (requests.Session, optional): Session to use; defaults to ``make_session(concurrency)``.
+
+    Returns:
+        dict: ``answered``, ``failed`` and ``skipped`` query counts and the batch's ``elapsed_s``.
+    """
+    done = completed_queries(output) if output else set()
+    pending = [(i, q) for i, q in enumerate(queries) if (i, q) not in done]
+    session = session or make_session(concurrency)
+    summary = {'answered': 0, 'failed': 0, 'skipped': len(queries) - len(pending), 'elapsed_s': 0.0}
+    write_lock = threading.Lock()
+    out = open(output, 'a', encoding='utf-8') if output else sys.stdout
+
+    def answer(item):
+        index, query = item
+        stats = {}
+        record = {'index': index, 'query': query, 'response': None, 'error': None}
+        try:
+            record['response'] = query_ollama(query, session, model, read_timeout, stats)
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+        record.update(ttft_s=stats.get('ttft_s'), total_s=stats.get('total_s'))
+        with write_lock:
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            summary['failed' if record['error'] else 'answered'] += 1
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            list(pool.map(answer, pending))
+    finally:
+        summary['elapsed_s'] = time.perf_counter() - start
+        if output:
+            out.close()
+    return summary
 
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Query the music-loving AI about any music topic.')
-    parser.add_argument('query', type=str, help='Your music-related question or topic')
-    
+    parser.add_argument('query', type=str, nargs='?', help='Your music-related question or topic')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='Answer the questions in FILE, one per line ("-" reads stdin), as JSONL')
+    parser.add_argument('--output', metavar='FILE',
+                        help='JSONL file for batch results; an existing one is resumed (default: stdout)')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help=f'Questions in flight at once in batch mode (default: {BATCH_CONCURRENCY})')
+    parser.add_argument('--timeout', type=float, default=READ_TIMEOUT,
+                        help=f'Seconds to wait for each piece of a streamed answer (default: {READ_TIMEOUT})')
+    parser.add_argument('--model', default=MODEL, help=f'Ollama model (default: {MODEL})')
+
     # Parse arguments
     args = parser.parse_args()
-    
+    if (args.query is None) == (args.batch is None):
+        parser.error('give either a query or --batch FILE')
+
+    if args.batch:
+        summary = run_batch(read_queries(args.batch), args.output, args.concurrency, args.model, args.timeout)
+        print(f"{summary['answered']} answered, {summary['failed']} failed, {summary['skipped']} already done "
+              f"in {summary['elapsed_s']:.1f}s", file=sys.stderr)
+        return 1 if summary['failed'] else 0
+
     try:
         # Get response from Ollama
-        response = query_ollama(args.query)
-        
+        response = query_ollama(args.query, model=args.model, read_timeout=args.timeout)
+
         if response:
             print("\n🎵 Music Lover's Response:\n")
             print(response)
             print()  # Add a blank line at the end
         else:
             print("\nNo response received from the assistant.\n")
-            
+
     except Exception as e:
         print(f"\nError: {str(e)}\n")
         return 1
-    
+
     return 0
 
 if __name__ == "__main__":
     exit(main())
-
-
@@ -0,0 +1,48 @@
+"""
+Tests for the semantic answer cache.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.answer_cache import SemanticAnswerCache
+
+
+def test_similar_question_hits_within_threshold():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.0, 0.0], 'latest music news', 'answer', epoch=1)
+    hit = cache.lookup([0.95, 0.1, 0.0], epoch=1)
+    assert hit['answer'] == 'answer' and hit['query'] == 'latest music news'
+    assert hit['similarity'] > 0.9
+    assert cache.lookup([0.0, 1.0, 0.0], epoch=1) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_other_epoch_or_model_never_matches():
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], 'q', 'old answer', epoch=1, model='a')
+    assert cache.lookup([1.0, 0.0], epoch=2, model='a') is None
+    assert cache.lookup([1.0, 0.0], epoch=1, model='b') is None
+    assert cache.prune(epoch=2) == 1 and cache.stats()['size'] == 0
+
+
+def test_closest_entry_wins_and_lru_evicts():
+    cache = SemanticAnswerCache(threshold=0.5, max_entries=2)
+    cache.store([1.0, 0.0], 'a', 'A', epoch=0)
+    cache.store([0.8, 0.6], 'b', 'B', epoch=0)
+    assert cache.lookup([0.7, 0.7], epoch=0)['answer'] == 'B'
+    cache.lookup([1.0, 0.0], epoch=0)
+    cache.store([0.0, 1.0], 'c', 'C', epoch=0)
+    # 'b' was least recently used
+    assert [cache.lookup(v, epoch=0)['answer'] for v in ([1.0, 0.0], [0.0, 1.0])] == ['A', 'C']
+    assert cache.stats()['size'] == 2
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'store' / 'answers.npz')
+    cache = SemanticAnswerCache(path=path)
+    cache.store([0.0, 1.0], 'q', 'persisted', epoch=3, model='m')
+    cache.save()
+    assert SemanticAnswerCache(path=path).lookup([0.0, 1.0], epoch=3, model='m')['answer'] == 'persisted'
@@ -0,0 +1,54 @@
+"""
+Tests for token-budgeted context assembly and the prompt layout.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.context_assembler import DEFAULT_INSTRUCTIONS, assemble_context, build_prompt
+from utils.ingest import build_chunks
+
+
+def _words(count, start=0):
+    return ' '.join(f"w{i}" for i in range(start, start + count))
+
+
+def test_adjacent_windows_are_stitched_without_overlap():
+    chunks = build_chunks({'page': _words(20)}, chunk_tokens=8, overlap=3)
+    ranked = list(reversed(chunks))
+    context = assemble_context([c['text'] for c in ranked], [c['metadata'] for c in ranked],
+                               budget_tokens=10000)
+    assert context == _words(20)
+
+
+def test_duplicates_and_contained_chunks_are_dropped():
+    context = assemble_context(['alpha beta gamma', 'alpha beta gamma', 'beta'],
+                               [{'doc_id': 'a', 'chunk': 0}, {'doc_id': 'b', 'chunk': 0},
+                                {'doc_id': 'c', 'chunk': 0}])
+    assert context == 'alpha beta gamma'
+
+
+def test_budget_skips_chunks_that_do_not_fit():
+    documents = ['x' * 40, 'y' * 400, 'z' * 40]
+    metadatas = [{'doc_id': d, 'chunk': 0} for d in 'abc']
+    context = assemble_context(documents, metadatas, budget_tokens=20, count_tokens=lambda t: len(t) // 4)
+    assert context == 'x' * 40 + '\n\n' + 'z' * 40
+
+
+def test_same_chunks_give_identical_context_in_any_rank_order():
+    documents = ['news one', 'news two', 'news three']
+    metadatas = [{'doc_id': 'b', 'chunk': 4}, {'doc_id': 'a', 'chunk': 0}, {'doc_id': 'b', 'chunk': 1}]
+    first = assemble_context(documents, metadatas)
+    second = assemble_context(documents[::-1], metadatas[::-1])
+    assert first == second == 'news two\n\nnews three\n\nnews one'
+
+
+def test_prompt_puts_the_question_last():
+    first = build_prompt('shared context', 'Who topped the charts?')
+    second = build_prompt('shared context', 'Which albums came out?')
+    assert first.startswith(DEFAULT_INSTRUCTIONS)
+    prefix = first[:first.index('Question:')]
+    assert second.startswith(prefix) and 'shared context' in prefix
+    assert first.endswith('Question: Who topped the charts?\nAnswer:')
@@ -0,0 +1,72 @@
+"""
+Tests for the append-only crawl corpus and its offset index.
+"""
+
+import sys
+import os
+import gzip
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.crawl_corpus import CrawlCorpus, content_hash
+
+
+@pytest.mark.parametrize('name', ['corpus.jsonl', 'corpus.jsonl.gz'])
+def test_append_and_random_access(tmp_path, name):
+    corpus = CrawlCorpus(str(tmp_path / name))
+    corpus.append('https://a.com/', 'first page', 'A', fetched_at=10.0)
+    corpus.append('https://b.com/', 'second page', 'B', fetched_at=11.0)
+    assert len(corpus) == 2
+    record = corpus.read(1)
+    assert record == {'url': 'https://b.com/', 'fetched_at': 11.0,
+                      'hash': content_hash('second page'), 'title': 'B', 'text': 'second page'}
+    assert corpus.get('https://a.com/')['text'] == 'first page'
+    assert corpus.get('https://c.com/') is None
+    assert 'https://a.com/' in corpus and 'https://c.com/' not in corpus
+
+
+def test_compressed_file_is_gzip(tmp_path):
+    path = tmp_path / 'corpus.jsonl.gz'
+    CrawlCorpus(str(path)).append('https://a.com/', 'text ' * 100)
+    lines = gzip.decompress(path.read_bytes()).decode('utf-8').splitlines()
+    assert json.loads(lines[0])['url'] == 'https://a.com/'
+    assert path.stat().st_size < 500
+
+
+def test_unchanged_snapshot_is_not_appended(tmp_path):
+    corpus = CrawlCorpus(str(tmp_path / 'corpus.jsonl'))
+    assert corpus.append('https://a.com/', 'same', fetched_at=1.0) is not None
+    assert corpus.append('https://a.com/', 'same', fetched_at=2.0) is None
+    assert corpus.append('https://a.com/', 'changed', fetched_at=3.0) is not None
+    assert [e['fetched_at'] for e in corpus.entries] == [1.0, 3.0]
+
+
+def test_since_and_latest_use_the_watermark(tmp_path):
+    corpus = CrawlCorpus(str(tmp_path / 'corpus.jsonl.gz'))
+    corpus.append('https://a.com/', 'v1', fetched_at=1.0)
+    corpus.append('https://b.com/', 'v1', fetched_at=2.0)
+    watermark = corpus.watermark
+    corpus.append('https://a.com/', 'v2', fetched_at=3.0)
+    assert [r['text'] for r in corpus.since(watermark)] == ['v2']
+    assert [r['url'] for r in corpus.since()] == ['https://a.com/', 'https://b.com/', 'https://a.com/']
+    latest = corpus.latest()
+    assert latest['https://a.com/']['text'] == 'v2' and latest['https://b.com/']['text'] == 'v1'
+    assert list(corpus.latest(since=watermark)) == ['https://a.com/']
+
+
+def test_reopen_ignores_unindexed_and_torn_entries(tmp_path):
+    path = str(tmp_path / 'corpus.jsonl')
+    corpus = CrawlCorpus(path)
+    corpus.append('https://a.com/', 'kept', fetched_at=1.0)
+    # A crash after writing data but before its index line, and a torn index line
+    with open(path, 'ab') as f:
+        f.write(b'{"url": "https://orphan.com/"}\n')
+    with open(f"{path}.idx", 'a', encoding='utf-8') as f:
+        f.write('{"offset": 9')
+    reopened = CrawlCorpus(path)
+    assert len(reopened) == 1
+    reopened.append('https://b.com/', 'after restart', fetched_at=2.0)
+    assert CrawlCorpus(path).get('https://b.com/')['text'] == 'after restart'
@@ -0,0 +1,116 @@
+"""
+Tests for the crawler Lambda's deadline handling, with in-memory etcd and embedder stand-ins.
+"""
+
+import sys
+import os
+import importlib.util
+import json
+import threading
+import time
+import types
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.rate_limiter import LocalRateLimiter
+
+LAMBDA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'aws', 'lambda', 'crawler_lambda.py'))
+
+
+class FakeEtcd:
+    """The key-value calls ``safe_etcd_client`` makes, in memory."""
+
+    def __init__(self):
+        self.values = {}
+
+    def put(self, key, value, lease=None):
+        self.values[key] = value.encode('utf-8') if isinstance(value, str) else value
+
+    def get(self, key):
+        return self.values.get(key), None
+
+    def delete(self, key):
+        return self.values.pop(key, None) is not None
+
+
+class FakeEmbedder:
+    def __init__(self, model_name=None, **kwargs):
+        pass
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+class FakeContext:
+    def __init__(self, remaining_ms):
+        self.deadline = time.monotonic() + remaining_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+class BlockingSlots:
+    """Semaphore stand-in whose ``busy.test`` slot is never free."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def acquire(self, name, timeout=None):
+        if name != 'busy.test':
+            return name
+        self.timeouts.append(timeout)
+        time.sleep(timeout)
+        return None
+
+    def release(self, key):
+        pass
+
+
+@pytest.fixture
+def crawler_lambda(tmp_path, monkeypatch):
+    monkeypatch.setenv('CRAWL_CORPUS_PATH', str(tmp_path / 'corpus.jsonl.gz'))
+    monkeypatch.setenv('CRAWL_CACHE_PATH', '')
+    monkeypatch.setenv('CHROMA_PERSIST_DIR', '')
+    monkeypatch.setenv('VECTOR_BACKEND', 'numpy')
+    monkeypatch.setitem(sys.modules, 'etcd3', types.SimpleNamespace(client=lambda host, port: FakeEtcd()))
+    monkeypatch.setitem(sys.modules, 'sentence_transformers',
+                        types.SimpleNamespace(SentenceTransformer=FakeEmbedder))
+    spec = importlib.util.spec_from_file_location('crawler_lambda', LAMBDA_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.semaphore = BlockingSlots()
+    module.rate_limiter = LocalRateLimiter(rate=1000.0, burst=100)
+    return module
+
+
+def test_blocked_and_hung_crawls_are_returned_as_pending(crawler_lambda):
+    hung = threading.Event()
+
+    def get(url, headers=None, timeout=None, stream=False):
+        if 'hung.test' in url:
+            hung.wait(5)
+        response = MagicMock(status_code=200, headers={'Content-Type': 'text/html'}, encoding=None)
+        response.iter_content.side_effect = lambda chunk_size: iter([b'<title>T</title><p>fresh news</p>'])
+        return response
+
+    crawler = crawler_lambda.PageCrawler(max_workers=3, session=MagicMock())
+    crawler.session.get.side_effect = get
+    crawler_lambda.crawler = crawler
+    crawler_lambda.DEADLINE_MARGIN_MS = 1000
+    crawler_lambda.EMBED_MARGIN_MS = 800
+    urls = ['https://busy.test/', 'https://ok.test/', 'https://hung.test/']
+    start = time.monotonic()
+    try:
+        response = crawler_lambda.lambda_handler({'pending': urls}, FakeContext(1200))
+    finally:
+        hung.set()
+    # Slot waits end 200ms in and the hung fetch is abandoned 400ms in
+    assert time.monotonic() - start < 2
+    assert all(timeout <= 0.2 for timeout in crawler_lambda.semaphore.timeouts)
+    assert response['pending'] == ['https://busy.test/', 'https://hung.test/']
+    body = json.loads(response['body'])
+    assert [r['url'] for r in body['crawled']] == ['https://ok.test/'] and not body['errors']
@@ -0,0 +1,87 @@
+"""
+Tests for the pluggable embedders, with fake ONNX sessions and tokenizers.
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import ingest
+from utils.embedders import FastTokenizer, OnnxEmbedder, hub_model_id, load_embedder
+
+
+class FakeRawTokenizer:
+    """Word-level stand-in for ``tokenizers.Tokenizer``; token ids are word lengths."""
+
+    def encode(self, text, add_special_tokens=True):
+        spans = [(m.start(), m.end()) for m in ingest._WORD.finditer(text)]
+        return SimpleNamespace(ids=[end - start for start, end in spans], attention_mask=[1] * len(spans),
+                               type_ids=[0] * len(spans), offsets=spans)
+
+    def encode_batch(self, texts):
+        encodings = [self.encode(text) for text in texts]
+        width = max(len(e.ids) for e in encodings)
+        for e in encodings:
+            pad = width - len(e.ids)
+            e.ids, e.attention_mask, e.type_ids = e.ids + [0] * pad, e.attention_mask + [0] * pad, e.type_ids + [0] * pad
+        return encodings
+
+
+class FakeSession:
+    """Returns a hidden state of ``[id, 1]`` per token and records the batches it ran."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, feeds):
+        self.batches.append(feeds)
+        ids = feeds['input_ids'].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def fake_onnx_embedder(normalize=False):
+    embedder = OnnxEmbedder.__new__(OnnxEmbedder)
+    embedder.session = FakeSession()
+    embedder._input_names = {'input_ids', 'attention_mask'}
+    embedder._batch_tokenizer = FakeRawTokenizer()
+    embedder.tokenizer = FastTokenizer(FakeRawTokenizer())
+    embedder.normalize = normalize
+    return embedder
+
+
+def test_mean_pooling_ignores_padding_and_keeps_input_order():
+    embedder = fake_onnx_embedder()
+    vectors = embedder.encode(['ab', 'abcd efgh ij', 'abc a'], batch_size=2)
+    # Mean word length per text; padded positions do not count
+    np.testing.assert_allclose(vectors, [[2, 1], [10 / 3, 1], [2, 1]])
+    assert vectors.dtype == np.float32
+    # Longest texts are batched together, and only the declared inputs are fed
+    first = embedder.session.batches[0]
+    assert set(first) == {'input_ids', 'attention_mask'} and first['input_ids'].shape == (2, 3)
+
+
+def test_normalized_vectors_have_unit_length():
+    vector = fake_onnx_embedder(normalize=True).encode('abc defg')
+    assert vector.shape == (2,)
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_fast_tokenizer_drives_token_span_chunking():
+    tokenizer = FastTokenizer(FakeRawTokenizer())
+    text = 'one two three four five'
+    assert ingest.token_spans(text, tokenizer) == ingest.token_spans(text)
+    assert ingest.chunk_text(text, 2, 0, tokenizer) == ['one two', 'three four', 'five']
+
+
+def test_load_embedder_validates_its_arguments():
+    with pytest.raises(ValueError):
+        load_embedder('tensorflow')
+    with pytest.raises(ValueError):
+        load_embedder('onnx-int8')
+    assert hub_model_id('all-MiniLM-L6-v2') == 'sentence-transformers/all-MiniLM-L6-v2'
+    assert hub_model_id('BAAI/bge-small-en') == 'BAAI/bge-small-en'
@@ -0,0 +1,68 @@
+"""
+Tests for the query embedding LRU cache.
+"""
+
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.embedding_cache import QueryEmbeddingCache, normalize_query
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_normalize_query():
+    assert normalize_query('  Latest\tMusic   NEWS\n') == 'latest music news'
+
+
+def test_encode_only_runs_model_for_misses():
+    cache = QueryEmbeddingCache()
+    embedder = FakeEmbedder()
+    first = cache.encode(embedder, ['Top songs'], 'model-a')
+    second = cache.encode(embedder, ['top  songs', 'new albums'], 'model-a')
+    assert embedder.encoded == [['Top songs'], ['new albums']]
+    assert second.shape == (2, 2)
+    assert np.array_equal(first[0], second[0])
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3, 'size': 2}
+
+
+def test_model_name_is_part_of_the_key():
+    cache = QueryEmbeddingCache()
+    cache.put('query', 'model-a', [1.0, 0.0])
+    assert cache.get('query', 'model-b') is None
+    assert cache.get('query', 'model-a') is not None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put('a', 'm', [1.0])
+    cache.put('b', 'm', [2.0])
+    cache.get('a', 'm')
+    cache.put('c', 'm', [3.0])
+    assert cache.get('b', 'm') is None
+    assert cache.get('a', 'm') is not None and cache.get('c', 'm') is not None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'cache' / 'queries.npz')
+    cache = QueryEmbeddingCache(path=path)
+    cache.put('Latest news', 'model-a', [0.5, 0.25])
+    cache.save()
+    restored = QueryEmbeddingCache(path=path)
+    assert np.allclose(restored.get('latest news', 'model-a'), [0.5, 0.25])
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / 'queries.npz'
+    path.write_bytes(b'not a numpy archive')
+    assert QueryEmbeddingCache(path=str(path)).stats()['size'] == 0
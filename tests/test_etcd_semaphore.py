@@ -0,0 +1,197 @@
+"""
+Tests for the etcd semaphore against an in-memory stand-in for the etcd3 client.
+"""
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.etcd_semaphore import EtcdSemaphore
+
+
+class FakeLease:
+    def __init__(self):
+        self.refreshed = 0
+        self.revoked = False
+        self.expired = False
+
+    def refresh(self):
+        self.refreshed += 1
+        # Like python-etcd3, an expired lease is reported by its TTL rather than an error
+        return [SimpleNamespace(TTL=0 if self.expired else 30)]
+
+    def revoke(self):
+        self.revoked = True
+
+
+class CreateRevision:
+    """Stand-in for ``transactions.create(key)``; ``== 0`` yields the compare itself."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, revision):
+        return self
+
+
+class FakeEtcd:
+    """Keys with create revisions, create-revision compares and prefix watch callbacks."""
+
+    def __init__(self):
+        self.revision = 0
+        self.keys = {}
+        self.watches = {}
+        self.leases = []
+        self.lock = threading.Lock()
+        self.transactions = self
+
+    def lease(self, ttl):
+        self.leases.append(FakeLease())
+        return self.leases[-1]
+
+    # transactions.create(key) == 0 / transactions.put(key, value, lease)
+    def create(self, key):
+        return CreateRevision(key)
+
+    def put(self, key, value, lease=None):
+        return ('put', key, lease)
+
+    def transaction(self, compare, success, failure):
+        with self.lock:
+            if any(c.key in self.keys for c in compare):
+                return False, []
+            for lease in self.leases:
+                if lease.expired and lease is success[0][2]:
+                    raise RuntimeError('etcdserver: requested lease not found')
+            for _, key, _ in success:
+                self.revision += 1
+                self.keys[key] = self.revision
+        self._notify(success[0][1])
+        return True, []
+
+    def get_prefix(self, prefix, keys_only=False):
+        with self.lock:
+            items = [(k, r) for k, r in self.keys.items() if k.startswith(prefix)]
+        return [(None, SimpleNamespace(key=k.encode(), create_revision=r)) for k, r in items]
+
+    def delete(self, key):
+        with self.lock:
+            existed = self.keys.pop(key, None) is not None
+        if existed:
+            self._notify(key)
+        return existed
+
+    def add_watch_prefix_callback(self, prefix, callback):
+        with self.lock:
+            watch_id = len(self.watches) + 1
+            self.watches[watch_id] = (prefix, callback)
+        return watch_id
+
+    def cancel_watch(self, watch_id):
+        with self.lock:
+            self.watches.pop(watch_id, None)
+
+    def _notify(self, key):
+        with self.lock:
+            callbacks = [cb for prefix, cb in self.watches.values() if key.startswith(prefix)]
+        for callback in callbacks:
+            callback(key)
+
+
+def test_never_more_than_limit_holders():
+    semaphore = EtcdSemaphore(FakeEtcd(), limit=2)
+    active, peak = [0], [0]
+    guard = threading.Lock()
+
+    def work():
+        with semaphore.slot('example.com'):
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with guard:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    semaphore.close()
+
+
+def test_waiters_are_admitted_in_fifo_order_on_release():
+    client = FakeEtcd()
+    semaphore = EtcdSemaphore(client, limit=1, recheck_interval=60)
+    holder = semaphore.acquire('example.com')
+    order = []
+
+    def wait(label):
+        key = semaphore.acquire('example.com')
+        order.append(label)
+        semaphore.release(key)
+
+    first = threading.Thread(target=wait, args=('first',))
+    first.start()
+    while len(client.keys) < 2:
+        time.sleep(0.001)
+    second = threading.Thread(target=wait, args=('second',))
+    second.start()
+    while len(client.keys) < 3:
+        time.sleep(0.001)
+
+    started = time.monotonic()
+    semaphore.release(holder)
+    first.join(5)
+    second.join(5)
+    # Woken by the watch, not the 60 second re-check
+    assert time.monotonic() - started < 5
+    assert order == ['first', 'second']
+    semaphore.close()
+
+
+def test_acquire_times_out_and_withdraws():
+    client = FakeEtcd()
+    semaphore = EtcdSemaphore(client, limit=1)
+    holder = semaphore.acquire('example.com')
+    assert semaphore.acquire('example.com', timeout=0.05) is None
+    assert list(client.keys) == [holder]
+    semaphore.close()
+
+
+def test_slots_share_one_lease_revoked_on_close():
+    client = FakeEtcd()
+    semaphore = EtcdSemaphore(client, limit=3)
+    keys = [semaphore.acquire(name) for name in ('a.com', 'b.com', 'a.com')]
+    assert all(keys) and len(client.leases) == 1
+    semaphore.close()
+    assert client.leases[0].revoked
+
+
+def test_expired_lease_is_replaced_by_the_keepalive_thread():
+    client = FakeEtcd()
+    semaphore = EtcdSemaphore(client, limit=1, ttl=0.03)
+    semaphore.release(semaphore.acquire('example.com'))
+    client.leases[0].expired = True
+    deadline = time.monotonic() + 5
+    while semaphore._lease is not None and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert semaphore._lease is None
+    assert semaphore.acquire('example.com') and len(client.leases) == 2
+    semaphore.close()
+
+
+def test_acquire_grants_a_new_lease_when_etcd_no_longer_knows_it():
+    client = FakeEtcd()
+    # Keepalive never runs, as in a container frozen between invocations
+    semaphore = EtcdSemaphore(client, limit=1, ttl=3600)
+    semaphore.release(semaphore.acquire('example.com'))
+    client.leases[0].expired = True
+    key = semaphore.acquire('example.com')
+    assert key in client.keys and len(client.leases) == 2
+    semaphore.close()
@@ -0,0 +1,113 @@
+"""
+Tests for the breadth-first FrontierCrawler and its helpers.
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.frontier_crawler import BloomFilter, FrontierCrawler, RobotsCache, canonicalize_url
+
+
+def test_canonicalize_url():
+    assert canonicalize_url('HTTPS://WWW.Example.com:443/a?b=2&utm_source=x&a=1#top') == \
+        'https://www.example.com/a?a=1&b=2'
+    assert canonicalize_url('http://example.com') == 'http://example.com/'
+    assert canonicalize_url('http://example.com:8080/x') == 'http://example.com:8080/x'
+    assert canonicalize_url('mailto:someone@example.com') is None
+    assert canonicalize_url('javascript:void(0)') is None
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f'https://example.com/{i}' for i in range(1000)]
+    assert sum(bloom.add(item) for item in items) > 980
+    assert all(item in bloom for item in items)
+    assert bloom.add(items[0]) is False
+    false_positives = sum(f'https://other.com/{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+    assert len(bloom._bits) < 1300
+
+
+def test_robots_cache_fetches_once_per_host():
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    session.get.return_value.text = 'User-agent: *\nDisallow: /private\n'
+    robots = RobotsCache(session)
+    assert robots.allowed('https://a.test/public')
+    assert not robots.allowed('https://a.test/private/x')
+    assert session.get.call_count == 1
+
+    session.get.return_value.status_code = 503
+    assert not robots.allowed('https://b.test/anything')
+    session.get.return_value.status_code = 404
+    assert robots.allowed('https://c.test/anything')
+
+
+class FakeCrawler:
+    """Serves a tiny link graph through the crawl_many interface."""
+
+    timeout = (1, 1)
+    session = None
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.fetched = []
+
+    def crawl_many(self, urls, guard=None, extract_links=False):
+        for url in urls:
+            self.fetched.append(url)
+            data = {'title': url, 'text': 'text'}
+            if extract_links:
+                data['links'] = self.graph.get(url, [])
+            yield {'url': url, 'data': data, 'error': None, 'not_modified': False}
+
+
+GRAPH = {
+    'https://a.test/': ['https://a.test/1', 'https://a.test/2#frag', 'https://b.test/x'],
+    'https://a.test/1': ['https://a.test/', 'https://a.test/1/deep'],
+    'https://a.test/2': ['https://a.test/2/deep?utm_medium=x'],
+}
+
+
+def test_frontier_crawls_breadth_first_with_dedupe_and_scope():
+    crawler = FakeCrawler(GRAPH)
+    frontier = FrontierCrawler(crawler, max_depth=2, respect_robots=False)
+    records = list(frontier.crawl(['https://a.test']))
+    assert [(r['url'], r['depth']) for r in records] == [
+        ('https://a.test/', 0),
+        ('https://a.test/1', 1),
+        ('https://a.test/2', 1),
+        ('https://a.test/1/deep', 2),
+        ('https://a.test/2/deep', 2),
+    ]
+
+
+def test_frontier_respects_depth_and_page_budgets():
+    frontier = FrontierCrawler(FakeCrawler(GRAPH), max_depth=0, respect_robots=False)
+    assert [r['url'] for r in frontier.crawl(['https://a.test/'])] == ['https://a.test/']
+
+    frontier = FrontierCrawler(FakeCrawler(GRAPH), max_depth=5, max_pages=3, respect_robots=False)
+    assert len(list(frontier.crawl(['https://a.test/']))) == 3
+
+
+def test_frontier_skips_links_the_caller_rejects():
+    frontier = FrontierCrawler(FakeCrawler(GRAPH), max_depth=2, respect_robots=False)
+    records = frontier.crawl(['https://a.test/'], skip=lambda url: url == 'https://a.test/1')
+    assert [r['url'] for r in records] == ['https://a.test/', 'https://a.test/2', 'https://a.test/2/deep']
+
+
+def test_frontier_charges_the_budget_only_for_accepted_links():
+    charged = []
+
+    def budget(url):
+        charged.append(url)
+        return len(charged) <= 2
+
+    frontier = FrontierCrawler(FakeCrawler(GRAPH), max_depth=2, respect_robots=False)
+    records = frontier.crawl(['https://a.test/'], budget=budget)
+    assert [r['url'] for r in records] == ['https://a.test/', 'https://a.test/1', 'https://a.test/2']
+    # The off-site link and the link back to the seed never reach the budget
+    assert charged == ['https://a.test/1', 'https://a.test/2', 'https://a.test/1/deep', 'https://a.test/2/deep']
@@ -0,0 +1,125 @@
+"""
+Tests for chunking and batched embedding of crawled pages.
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.ingest import build_chunks, chunk_id, chunk_text, content_hash, embed_and_add, sync_documents
+
+
+class FakeEmbedder:
+    """Records encode calls and returns one small vector per text."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.calls.append((list(texts), batch_size))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_chunk_text_sliding_windows():
+    text = ' '.join(f'w{i}' for i in range(10))
+    assert chunk_text(text, chunk_tokens=4, overlap=1) == [
+        'w0 w1 w2 w3', 'w3 w4 w5 w6', 'w6 w7 w8 w9',
+    ]
+    assert chunk_text('a b', chunk_tokens=4, overlap=1) == ['a b']
+    assert chunk_text('', chunk_tokens=4, overlap=1) == []
+    with pytest.raises(ValueError):
+        chunk_text(text, chunk_tokens=4, overlap=4)
+
+
+def test_chunk_text_uses_tokenizer_offsets():
+    tokenizer = MagicMock(is_fast=True)
+    # "unbelievable news" as three word pieces
+    tokenizer.return_value = {'offset_mapping': [(0, 2), (2, 12), (13, 17)]}
+    assert chunk_text('unbelievable news', chunk_tokens=2, overlap=0, tokenizer=tokenizer) == [
+        'unbelievable', 'news',
+    ]
+
+
+def test_embed_and_add_batches_all_documents():
+    chunks = build_chunks({'a': 'one two three', 'b': 'four'}, chunk_tokens=2, overlap=0)
+    ids = [chunk_id('a', content_hash('one two')), chunk_id('a', content_hash('three')),
+           chunk_id('b', content_hash('four'))]
+    assert [c['id'] for c in chunks] == ids
+    assert chunks[1]['metadata']['doc_id'] == 'a' and chunks[1]['metadata']['chunk'] == 1
+
+    embedder = FakeEmbedder()
+    collection = MagicMock()
+    assert embed_and_add(collection, embedder, chunks, batch_size=128, add_batch_size=2) == 3
+    assert embedder.calls == [(['one two', 'three', 'four'], 128)]
+    assert [call[1]['ids'] for call in collection.add.call_args_list] == [ids[:2], ids[2:]]
+    assert collection.add.call_args_list[1][1]['embeddings'] == [[4.0, 1.0]]
+
+
+class FakeCollection:
+    """In-memory stand-in for the parts of a Chroma collection used by ingestion."""
+
+    def __init__(self):
+        self.records = {}
+
+    def get(self, where=None, include=None, ids=None, limit=None):
+        doc_ids = where['doc_id']['$in']
+        found = [(i, r) for i, r in self.records.items() if r['metadata']['doc_id'] in doc_ids]
+        return {'ids': [i for i, _ in found], 'metadatas': [r['metadata'] for _, r in found]}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.records[i] = {'text': d, 'metadata': m, 'embedding': e}
+
+    def delete(self, ids):
+        for i in ids:
+            self.records.pop(i, None)
+
+
+def test_sync_documents_only_embeds_changes():
+    collection = FakeCollection()
+    embedder = FakeEmbedder()
+    stats = sync_documents(collection, embedder, {'a': 'one two three four', 'b': 'x'},
+                           chunk_tokens=2, overlap=0)
+    assert stats == {'upserted': 3, 'unchanged': 0, 'deleted': 0}
+
+    # Unchanged corpus: nothing is embedded
+    stats = sync_documents(collection, embedder, {'a': 'one two three four', 'b': 'x'},
+                           chunk_tokens=2, overlap=0)
+    assert stats == {'upserted': 0, 'unchanged': 3, 'deleted': 0}
+    assert len(embedder.calls) == 1
+
+    # Page 'a' shrinks and changes its second chunk; 'b' is not re-synced
+    stats = sync_documents(collection, embedder, {'a': 'one two'}, chunk_tokens=2, overlap=0)
+    assert stats == {'upserted': 0, 'unchanged': 1, 'deleted': 1}
+    stats = sync_documents(collection, embedder, {'a': 'one two five'}, chunk_tokens=2, overlap=0)
+    assert stats == {'upserted': 1, 'unchanged': 1, 'deleted': 0}
+    assert embedder.calls[-1][0] == ['five']
+    assert sorted(collection.records) == sorted(
+        [chunk_id('a', content_hash('one two')), chunk_id('a', content_hash('five')), chunk_id('b', content_hash('x'))])
+
+
+def test_chunk_ids_are_content_derived_and_unique_per_document():
+    chunks = build_chunks({'a': 'same same same same'}, chunk_tokens=2, overlap=0)
+    digest = content_hash('same same')
+    assert [c['id'] for c in chunks] == [chunk_id('a', digest), chunk_id('a', digest, 1)]
+    assert chunks[1]['id'] == f"a#{digest[:16]}-1"
+
+
+def test_insertion_at_the_top_only_reembeds_nearby_chunks():
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in rng.integers(0, 5000, size=3000)]
+    page = ' '.join(words)
+    collection = FakeCollection()
+    embedder = FakeEmbedder()
+    first = sync_documents(collection, embedder, {'news': page}, chunk_tokens=200, overlap=40)
+    assert first['upserted'] > 15
+
+    updated = 'breaking headline about a new album ' * 5 + page
+    second = sync_documents(collection, embedder, {'news': updated}, chunk_tokens=200, overlap=40)
+    # Boundaries resynchronize right after the inserted text
+    assert second['upserted'] <= 4 and second['unchanged'] >= first['upserted'] - 4
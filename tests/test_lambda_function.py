@@ -0,0 +1,75 @@
+"""
+Tests for the API Lambda's warm-container response cache and its Ollama request settings.
+"""
+
+import os
+import importlib.util
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+LAMBDA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'aws', 'lambda', 'lambda_function.py'))
+
+
+@pytest.fixture
+def api():
+    spec = importlib.util.spec_from_file_location('lambda_function', LAMBDA_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.http = MagicMock()
+    module.http.request.return_value = MagicMock(status=200, data=b'{"message": {"content": "answer"}}')
+    return module
+
+
+def post(query):
+    return {'requestContext': {'http': {'method': 'POST'}}, 'body': json.dumps({'query': query})}
+
+
+def test_repeated_questions_are_served_from_the_cache(api):
+    first = api.lambda_handler(post('Who plays jazz piano?'), None)
+    second = api.lambda_handler(post('  who plays   JAZZ piano? '), None)
+    assert first['headers']['X-Cache'] == 'MISS' and second['headers']['X-Cache'] == 'HIT'
+    assert second['body'] == first['body']
+    assert api.http.request.call_count == 1
+
+
+def test_errors_are_not_cached(api):
+    api.http.request.return_value = MagicMock(status=503, data=b'{"error": "busy"}')
+    assert api.lambda_handler(post('Jazz piano'), None)['statusCode'] == 503
+    api.http.request.return_value = MagicMock(status=200, data=b'{}')
+    response = api.lambda_handler(post('Jazz piano'), None)
+    assert response['statusCode'] == 200 and response['headers']['X-Cache'] == 'MISS'
+
+
+def test_response_cache_expires_and_evicts(api):
+    now = [0.0]
+    cache = api.ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None and len(cache) == 2
+    now[0] = 11
+    assert cache.get('a') is None
+
+
+def test_non_post_requests_are_rejected(api):
+    response = api.lambda_handler({'requestContext': {'http': {'method': 'GET'}}}, None)
+    assert response['statusCode'] == 405 and 'X-Cache' not in response['headers']
+
+
+def test_ollama_call_gets_the_time_left_in_the_invocation(api):
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = 10500
+    api.lambda_handler(post('Jazz piano'), context)
+    timeout = api.http.request.call_args[1]['timeout']
+    assert timeout.connect_timeout == api.OLLAMA_CONNECT_TIMEOUT
+    assert timeout.read_timeout == pytest.approx(10.5 - api.RESPONSE_MARGIN_S)
+    assert api.request_timeout(None).read_timeout == api.OLLAMA_READ_TIMEOUT < 30
+
+
+def test_only_unprocessed_requests_are_retried(api):
+    assert api.RETRY.is_retry('POST', 503)
+    assert not api.RETRY.is_retry('POST', 502) and not api.RETRY.is_retry('POST', 504)
+    assert api.RETRY.read == 0 and api.RETRY.other == 0 and api.RETRY.connect == 2
@@ -0,0 +1,327 @@
+"""
+Tests for the FreshnessCAG with injected stand-in resources.
+
+Importing the module must not connect to etcd, load a model or open a vector store.
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fresh import music_freshness_cag as cag_module
+from fresh.music_freshness_cag import FreshnessCAG, LocalSlotLock
+from utils.crawl_corpus import CrawlCorpus
+from utils.ingest import chunk_id, content_hash
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.calls += 1
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_import_creates_no_resources():
+    assert cag_module._default_cag is None
+    cag = FreshnessCAG()
+    assert cag._embedder is None and cag._lock is None and cag._crawler is None
+
+
+def test_default_frontier_and_crawler_are_created_without_deadlock(tmp_path, monkeypatch):
+    monkeypatch.setattr(cag_module, 'CRAWL_CACHE_PATH', str(tmp_path / 'crawl_cache.json'))
+    cag = FreshnessCAG(lock=object())
+    result = []
+    worker = threading.Thread(target=lambda: result.append(cag.frontier), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert result, "creating the default frontier deadlocked"
+    assert result[0].crawler is cag.crawler
+
+
+def test_main_exits_before_crawling_when_etcd_is_unreachable(monkeypatch):
+    def unreachable(host, port):
+        raise ConnectionError('Could not connect to etcd')
+
+    frontier = MagicMock()
+    monkeypatch.setattr(cag_module, 'CRAWL_LOCK_BACKEND', 'etcd')
+    monkeypatch.setattr(cag_module, 'safe_etcd_client', unreachable)
+    monkeypatch.setattr(cag_module, '_default_cag', FreshnessCAG(frontier=frontier))
+    with pytest.raises(SystemExit) as exit_info:
+        cag_module.main([])
+    assert exit_info.value.code == 1
+    frontier.crawl.assert_not_called()
+
+
+def test_query_only_cag_uses_injected_resources():
+    collection = MagicMock()
+    collection.query.return_value = {'documents': [['first chunk', 'second chunk']]}
+    lock = MagicMock()
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, lock=lock)
+    assert cag.query_context('latest news', n_results=2) == 'first chunk\n\nsecond chunk'
+    assert collection.query.call_args[1]['query_embeddings'] == [[11.0, 1.0]]
+    lock.slot.assert_not_called()
+    assert cag._crawler is None
+
+
+def test_repeated_queries_reuse_cached_embedding():
+    collection = MagicMock()
+    collection.query.return_value = {'documents': [['chunk']]}
+    embedder = FakeEmbedder()
+    cag = FreshnessCAG(embedder=embedder, collection=collection)
+    cag.query_context('Latest news')
+    cag.query_context('  latest   NEWS ')
+    assert embedder.calls == 1
+    assert cag.query_cache.stats()['hits'] == 1
+
+
+def test_query_embeddings_are_cached_per_embedding_backend():
+    collection = MagicMock()
+    collection.query.return_value = {'documents': [['chunk']]}
+    query_cache = cag_module.embedding_cache.QueryEmbeddingCache(16)
+    torch_embedder, onnx_embedder = FakeEmbedder(), FakeEmbedder()
+    FreshnessCAG(embedder=torch_embedder, collection=collection, query_cache=query_cache).query_context('news')
+    onnx_cag = FreshnessCAG(embedder=onnx_embedder, collection=collection, query_cache=query_cache,
+                            embedding_backend='onnx-int8')
+    onnx_cag.query_context('news')
+    assert onnx_cag.embedding_key == 'all-MiniLM-L6-v2@onnx-int8'
+    assert torch_embedder.calls == 1 and onnx_embedder.calls == 1
+
+
+def test_extract_and_store_embeddings_syncs_new_snapshots(tmp_path):
+    corpus = CrawlCorpus(str(tmp_path / 'corpus.jsonl.gz'))
+    corpus.append('https://www.billboard.com/', 'chart news ' * 10, 'Billboard', fetched_at=1.0)
+    collection = MagicMock()
+    collection.get.return_value = {'ids': [], 'metadatas': []}
+    watermark_path = str(tmp_path / 'store' / 'corpus_watermark.json')
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, corpus=corpus,
+                       watermark_path=watermark_path)
+    cag.extract_and_store_embeddings()
+    upserted = collection.upsert.call_args[1]
+    assert upserted['ids'] == [chunk_id('billboard.com', content_hash(('chart news ' * 10).strip()))]
+    assert upserted['metadatas'][0]['doc_id'] == 'billboard.com'
+    # The state file is replaced whole, with no temporary file left behind
+    assert os.listdir(tmp_path / 'store') == ['corpus_watermark.json']
+
+    # Nothing newer than the persisted watermark: the corpus is not read again
+    collection.reset_mock()
+    restarted = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, corpus=corpus,
+                             watermark_path=watermark_path)
+    restarted.extract_and_store_embeddings()
+    collection.upsert.assert_not_called()
+    corpus.append('https://pitchfork.com/', 'album reviews ' * 10, 'Pitchfork', fetched_at=2.0)
+    restarted.extract_and_store_embeddings()
+    assert collection.upsert.call_args[1]['ids'] == [chunk_id('pitchfork.com', content_hash(('album reviews ' * 10).strip()))]
+
+
+def test_local_slot_lock_limits_concurrency_per_domain():
+    lock = LocalSlotLock(limit=2)
+    active, peak = [0], [0]
+    guard = threading.Lock()
+
+    def work():
+        with lock.slot('example.com'):
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with guard:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+
+
+def test_thread_slot_waits_for_rate_limit_inside_slot():
+    calls = []
+    lock = MagicMock()
+    lock.slot.return_value.__enter__.side_effect = lambda *a: calls.append('slot')
+    limiter = MagicMock()
+    limiter.acquire.side_effect = lambda domain: calls.append(('rate', domain))
+    cag = FreshnessCAG(lock=lock, rate_limiter=limiter)
+    with cag.thread_slot('https://www.billboard.com/charts'):
+        calls.append('crawl')
+    assert calls == ['slot', ('rate', 'billboard.com'), 'crawl']
+
+
+def _ollama_session(lines=None, error=None):
+    session = MagicMock()
+    if error is not None:
+        session.post.side_effect = error
+        return session
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = [json.dumps(line).encode() for line in lines]
+    session.post.return_value = response
+    return session
+
+
+def test_stream_ollama_yields_tokens_and_reports_ttft():
+    session = _ollama_session([
+        {'response': 'Taylor', 'done': False},
+        {'response': ' Swift', 'done': False},
+        {'response': '', 'done': True, 'eval_count': 2, 'eval_duration': 1000},
+    ])
+    stats = {}
+    tokens = list(cag_module.stream_ollama_with_context('ctx', 'who?', model='m', host='http://ollama',
+                                                        session=session, stats=stats))
+    assert tokens == ['Taylor', ' Swift']
+    assert stats['chunks'] == 2 and stats['eval_count'] == 2
+    assert 0 <= stats['ttft_s'] <= stats['total_s']
+    url = session.post.call_args[0][0]
+    kwargs = session.post.call_args[1]
+    assert url == 'http://ollama/api/generate'
+    assert kwargs['stream'] is True and kwargs['json']['stream'] is True
+    assert 'ctx' in kwargs['json']['prompt'] and 'who?' in kwargs['json']['prompt']
+
+
+def test_stream_ollama_raises_instead_of_exiting():
+    import requests
+
+    session = _ollama_session(error=requests.ConnectionError('refused'))
+    with pytest.raises(cag_module.OllamaError):
+        list(cag_module.stream_ollama_with_context('ctx', 'q', session=session))
+
+    session = _ollama_session([{'error': 'model not found'}])
+    with pytest.raises(cag_module.OllamaError, match='model not found'):
+        list(cag_module.stream_ollama_with_context('ctx', 'q', session=session))
+
+
+def test_crawl_and_index_embeds_changed_pages_as_they_are_crawled(tmp_path):
+    corpus = CrawlCorpus(str(tmp_path / 'corpus.jsonl'))
+    collection = MagicMock()
+    collection.get.side_effect = lambda where, include: (
+        {'ids': ['pitchfork.com#0', 'pitchfork.com#1'], 'metadatas': [{'hash': 'old'}, {'hash': 'old'}]}
+        if where['doc_id']['$in'] == ['pitchfork.com'] else {'ids': [], 'metadatas': []})
+    frontier = MagicMock()
+    frontier.crawl.return_value = iter([
+        {'url': 'https://www.billboard.com/', 'depth': 0, 'title': 'Billboard',
+         'text': 'chart news ' * 10, 'error': None, 'not_modified': False},
+        {'url': 'https://pitchfork.com/', 'depth': 0, 'title': 'Pitchfork',
+         'text': 'album reviews', 'error': None, 'not_modified': False},
+        {'url': 'https://www.rollingstone.com/', 'depth': 0, 'title': None,
+         'text': None, 'error': None, 'not_modified': True},
+    ])
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, corpus=corpus, frontier=frontier,
+                       lock=LocalSlotLock(), watermark_path=str(tmp_path / 'state.json'))
+    stats = cag.crawl_and_index(['https://www.billboard.com/'])
+
+    upserted = sorted(i for call in collection.upsert.call_args_list for i in call[1]['ids'])
+    assert upserted == sorted([chunk_id('billboard.com', content_hash(('chart news ' * 10).strip())),
+                               chunk_id('pitchfork.com', content_hash('album reviews'))])
+    collection.delete.assert_called_once_with(ids=['pitchfork.com#0', 'pitchfork.com#1'])
+    assert stats['store']['items_in'] == 3 and stats['store']['items_out'] == 2
+    assert stats['embed']['items_in'] == 2
+    assert cag.corpus_epoch == 1 and cag.synced_watermark == corpus.watermark
+
+
+def test_scheduler_recrawls_only_due_pages(tmp_path):
+    clock = [1000.0]
+    scheduler = cag_module.recrawl_scheduler.RecrawlScheduler(
+        min_interval=60, max_interval=3600, initial_interval=600, clock=lambda: clock[0])
+    crawled = []
+
+    def crawl(urls, guard=None, skip=None, budget=None):
+        for url in urls:
+            crawled.append(url)
+            changed = url == 'https://pitchfork.com/'
+            yield {'url': url, 'depth': 0, 'title': 'T', 'text': f'text {clock[0]}' if changed else None,
+                   'error': None, 'not_modified': not changed}
+
+    frontier = MagicMock()
+    frontier.crawl.side_effect = crawl
+    collection = MagicMock()
+    collection.get.return_value = {'ids': [], 'metadatas': []}
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, frontier=frontier,
+                       corpus=CrawlCorpus(str(tmp_path / 'corpus.jsonl')), scheduler=scheduler,
+                       lock=LocalSlotLock(), watermark_path='')
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    cag.run_scheduler(['https://pitchfork.com', 'https://www.nme.com/'], max_cycles=3, sleep=sleep)
+    # The first snapshot of the changing page keeps the initial 600s, its first change
+    # halves that to 300s; the static page is due again only after 900s
+    assert crawled == ['https://pitchfork.com/', 'https://www.nme.com/', 'https://pitchfork.com/',
+                       'https://pitchfork.com/', 'https://www.nme.com/']
+    assert scheduler.page('https://www.nme.com/')['interval'] == 1350
+    assert scheduler.page('https://pitchfork.com/')['changes'] == 2
+
+
+class LinkCrawler:
+    """Serves a link graph through the crawl_many interface; every page is not modified."""
+
+    timeout = (1, 1)
+    session = None
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.fetched = []
+
+    def crawl_many(self, urls, guard=None, extract_links=False):
+        for url in urls:
+            self.fetched.append(url)
+            data = {'links': self.graph.get(url, [])} if extract_links else None
+            yield {'url': url, 'data': data, 'error': None, 'not_modified': True}
+
+
+def test_scheduler_budgets_limit_followed_links(tmp_path):
+    scheduler = cag_module.recrawl_scheduler.RecrawlScheduler(
+        min_interval=60, max_interval=3600, initial_interval=600, max_per_cycle=5, max_per_domain=3,
+        clock=lambda: 1000.0)
+    # Off-site, repeated and already queued links come first; none of them may use up the budget
+    pitchfork = [f"https://twitter.com/p{i}" for i in range(10)] + ['https://www.nme.com/']
+    pitchfork += [f"https://pitchfork.com/page{i}" for i in range(10)] * 2
+    crawler = LinkCrawler({
+        'https://pitchfork.com/': pitchfork,
+        'https://www.nme.com/': [f"https://www.nme.com/page{i}" for i in range(10)],
+    })
+    frontier = cag_module.frontier_crawler.FrontierCrawler(crawler, max_depth=1, respect_robots=False)
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=MagicMock(), frontier=frontier,
+                       corpus=CrawlCorpus(str(tmp_path / 'corpus.jsonl')), scheduler=scheduler,
+                       lock=LocalSlotLock(), watermark_path='')
+    cag.run_scheduler(['https://pitchfork.com/', 'https://www.nme.com/'], max_cycles=1, sleep=lambda s: None)
+    assert crawler.fetched == ['https://pitchfork.com/', 'https://www.nme.com/', 'https://pitchfork.com/page0',
+                               'https://pitchfork.com/page1', 'https://www.nme.com/page0']
+    # Links over budget stay unknown and are fetched in a later cycle
+    assert scheduler.is_due('https://pitchfork.com/page2') and len(scheduler) == 5
+
+
+def test_answers_are_cached_until_a_sync_changes_the_index(tmp_path, monkeypatch):
+    answers = iter(['first answer', 'second answer'])
+    monkeypatch.setattr(cag_module, 'stream_ollama_with_context',
+                        lambda context, query, model=None, stats=None: iter([next(answers)]))
+    corpus = CrawlCorpus(str(tmp_path / 'corpus.jsonl'))
+    collection = MagicMock()
+    collection.get.return_value = {'ids': [], 'metadatas': []}
+    collection.query.return_value = {'documents': [['chunk']], 'metadatas': [[{}]]}
+    cag = FreshnessCAG(embedder=FakeEmbedder(), collection=collection, corpus=corpus,
+                       answer_cache=cag_module.SemanticAnswerCache(threshold=0.99),
+                       watermark_path=str(tmp_path / 'state.json'))
+
+    stats = {}
+    assert ''.join(cag.stream_answer('latest news', stats=stats)) == 'first answer'
+    assert stats['cached'] is False
+    assert ''.join(cag.stream_answer('Latest News', stats=stats)) == 'first answer'
+    assert stats['cached'] is True and collection.query.call_count == 1
+
+    corpus.append('https://pitchfork.com/', 'new review text', 'Pitchfork', fetched_at=1.0)
+    cag.extract_and_store_embeddings()
+    assert cag.corpus_epoch == 1
+    # The bump drops the stale answer instead of letting it hold a slot
+    assert cag.answer_cache.stats()['size'] == 0
+    assert ''.join(cag.stream_answer('latest news', stats=stats)) == 'second answer'
+    assert stats['cached'] is False
@@ -0,0 +1,143 @@
+"""
+Tests for the NumPy vector index and its Chroma-compatible interface.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.ingest import chunk_id, content_hash, sync_documents
+from utils.numpy_index import NumpyIndex, matches, open_index
+
+
+def _vectors(count, dimension=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dimension)).astype(np.float32)
+
+
+def _filled(dtype='float16', count=200):
+    index = NumpyIndex(dtype=dtype)
+    vectors = _vectors(count)
+    index.add(ids=[f"doc{i % 10}#{i}" for i in range(count)], embeddings=vectors,
+              documents=[f"text {i}" for i in range(count)],
+              metadatas=[{'doc_id': f"doc{i % 10}", 'chunk': i} for i in range(count)])
+    return index, vectors
+
+
+@pytest.mark.parametrize('dtype', ['float16', 'int8', 'float32'])
+def test_query_finds_nearest_vectors(dtype):
+    index, vectors = _filled(dtype)
+    result = index.query(query_embeddings=vectors[:3] * 2.0, n_results=2)
+    assert [ids[0] for ids in result['ids']] == ['doc0#0', 'doc1#1', 'doc2#2']
+    assert result['documents'][0][0] == 'text 0'
+    assert result['distances'][0][0] == pytest.approx(0.0, abs=0.02)
+    assert result['distances'][0][0] <= result['distances'][0][1]
+
+
+def test_small_blocks_give_the_same_results():
+    index, vectors = _filled()
+    expected = index.query(query_embeddings=vectors[:5], n_results=7)['ids']
+    index.block_size = 16
+    assert index.query(query_embeddings=vectors[:5], n_results=7)['ids'] == expected
+
+
+def test_int8_rows_use_the_full_range_of_their_own_scale():
+    index = NumpyIndex(dtype='int8')
+    vectors = _vectors(50, dimension=384)
+    index.add(ids=[str(i) for i in range(50)], embeddings=vectors)
+    assert np.abs(index._matrix[:50]).max(axis=1).tolist() == [127] * 50
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    error = np.abs(index.get(include=('embeddings',))['embeddings'] - unit).max(axis=1)
+    assert np.all(error <= np.abs(unit).max(axis=1) / 254 + 1e-6)
+
+
+def test_int8_save_and_load_keeps_row_scales(tmp_path):
+    index, vectors = _filled('int8', count=40)
+    index.delete(ids=['doc0#0'])
+    path = str(tmp_path / 'index.npvi')
+    index.save(path)
+    loaded = NumpyIndex.load(path, mmap=False)
+    np.testing.assert_array_equal(loaded._scales, index._scales[:39])
+    assert loaded.query(query_embeddings=vectors[:4], n_results=3) == index.query(query_embeddings=vectors[:4], n_results=3)
+    loaded.upsert(ids=['extra#0'], embeddings=vectors[:1])
+    assert loaded.query(query_embeddings=vectors[:1], n_results=1)['ids'] == [['extra#0']]
+
+
+def test_where_filters_get_query_and_delete():
+    index, vectors = _filled()
+    assert len(index.get(where={'doc_id': {'$in': ['doc1', 'doc2']}})['ids']) == 40
+    result = index.query(query_embeddings=vectors[:1], n_results=3, where={'doc_id': 'doc5'})
+    assert all(m['doc_id'] == 'doc5' for m in result['metadatas'][0])
+    index.delete(where={'doc_id': 'doc5'})
+    assert index.count() == 180
+    assert index.get(where={'doc_id': 'doc5'})['ids'] == []
+    with pytest.raises(ValueError):
+        matches({}, {'$or': []})
+
+
+def test_delete_keeps_remaining_rows_consistent():
+    index, vectors = _filled(count=20)
+    index.delete(ids=['doc0#0', 'doc3#13', 'doc9#19'])
+    assert index.count() == 17
+    for i in (1, 5, 18):
+        assert index.query(query_embeddings=vectors[i], n_results=1)['ids'][0][0] == f"doc{i % 10}#{i}"
+
+
+def test_add_keeps_existing_ids_and_upsert_replaces_them():
+    index, vectors = _filled(count=5)
+    index.add(ids=['doc0#0'], embeddings=vectors[4:5], documents=['ignored'])
+    assert index.get(ids=['doc0#0'])['documents'] == ['text 0']
+    index.upsert(ids=['doc0#0'], embeddings=vectors[4:5], documents=['replaced'])
+    assert index.get(ids=['doc0#0'])['documents'] == ['replaced']
+    assert index.count() == 5
+
+
+def test_ivf_search_finds_exact_matches():
+    index, vectors = _filled(count=500)
+    index.build_ivf(n_lists=8, n_probe=2)
+    result = index.query(query_embeddings=vectors[:20], n_results=1)
+    assert [ids[0] for ids in result['ids']] == [f"doc{i % 10}#{i}" for i in range(20)]
+    # Vectors added after training are assigned to a cluster and found too
+    index.add(ids=['new#0'], embeddings=_vectors(1, seed=7))
+    assert index.query(query_embeddings=_vectors(1, seed=7), n_results=1)['ids'] == [['new#0']]
+
+
+@pytest.mark.parametrize('ivf', [False, True])
+def test_save_and_memory_mapped_load(tmp_path, ivf):
+    index, vectors = _filled(count=300)
+    if ivf:
+        index.build_ivf(n_lists=4)
+    path = str(tmp_path / 'index.npvi')
+    index.save(path)
+    loaded = NumpyIndex.load(path)
+    assert isinstance(loaded._matrix, np.memmap)
+    assert loaded.query(query_embeddings=vectors[:4], n_results=3) == index.query(query_embeddings=vectors[:4], n_results=3)
+    # Writing copies the mapped matrix into memory and leaves the file alone
+    loaded.upsert(ids=['extra#0'], embeddings=vectors[:1])
+    assert loaded.count() == 301 and NumpyIndex.load(path).count() == 300
+
+
+def test_open_index_and_flush(tmp_path):
+    index = open_index('music', str(tmp_path))
+    index.add(ids=['a#0'], embeddings=_vectors(1), metadatas=[{'doc_id': 'a'}])
+    index.flush()
+    assert open_index('music', str(tmp_path)).get(ids=['a#0'])['metadatas'] == [{'doc_id': 'a'}]
+
+
+class FakeEmbedder:
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        return np.array([[float(len(t)), float(t.count('a')), 1.0] for t in texts])
+
+
+def test_sync_documents_against_numpy_index():
+    index = NumpyIndex()
+    first = sync_documents(index, FakeEmbedder(), {'a': 'one two three', 'b': 'four five'},
+                           chunk_tokens=2, overlap=0)
+    assert first == {'upserted': 3, 'unchanged': 0, 'deleted': 0}
+    second = sync_documents(index, FakeEmbedder(), {'a': 'one two'}, chunk_tokens=2, overlap=0)
+    assert second == {'upserted': 0, 'unchanged': 1, 'deleted': 1}
+    assert sorted(index.get()['ids']) == sorted([chunk_id('a', content_hash('one two')),
+                                                 chunk_id('b', content_hash('four five'))])
@@ -0,0 +1,101 @@
+"""
+Tests for the ollama_music.py batch mode, with a fake Ollama session.
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ollama_music
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+class FakeSession:
+    """Streams the query back in two chunks; queries containing "fail" time out."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = []
+        self.timeouts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, **kwargs):
+        query = kwargs['json']['messages'][-1]['content']
+        with self._lock:
+            self.queries.append(query)
+            self.timeouts.append(kwargs['timeout'])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if 'fail' in query:
+                raise requests.ReadTimeout('read timed out')
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        chunks = [{'message': {'content': 'Re: '}}, {'message': {'content': query}}, {'done': True}]
+        return FakeResponse([b''] + [json.dumps(c).encode() for c in chunks])
+
+
+def read_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_query_ollama_joins_streamed_chunks_and_times_them():
+    session = FakeSession()
+    stats = {}
+    assert ollama_music.query_ollama('jazz?', session, read_timeout=7, stats=stats) == 'Re: jazz?'
+    assert session.timeouts == [(ollama_music.CONNECT_TIMEOUT, 7)]
+    assert 0 <= stats['ttft_s'] <= stats['total_s']
+
+
+def test_batch_runs_with_bounded_concurrency_and_records_errors(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    session = FakeSession(delay=0.02)
+    queries = [f"question {i}" for i in range(8)] + ['please fail']
+    summary = ollama_music.run_batch(queries, output, concurrency=3, session=session)
+    assert summary['answered'] == 8 and summary['failed'] == 1 and summary['skipped'] == 0
+    assert 1 < session.max_in_flight <= 3
+    records = {r['index']: r for r in read_records(output)}
+    assert records[0]['response'] == 'Re: question 0' and records[0]['error'] is None
+    assert records[8]['response'] is None and 'ReadTimeout' in records[8]['error']
+    assert records[8]['total_s'] is not None
+
+
+def test_batch_resumes_from_a_partially_written_output(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    done = {'index': 0, 'query': 'first', 'response': 'Re: first', 'error': None}
+    failed = {'index': 1, 'query': 'second', 'response': None, 'error': 'ReadTimeout: read timed out'}
+    # The previous run was killed in the middle of writing the third record
+    output.write_text(json.dumps(done) + '\n' + json.dumps(failed) + '\n{"index": 2, "que')
+    session = FakeSession()
+    summary = ollama_music.run_batch(['first', 'second', 'third'], str(output), session=session)
+    assert sorted(session.queries) == ['second', 'third']
+    assert summary == dict(summary, answered=2, failed=0, skipped=1)
+    records = read_records(str(output))
+    assert [r['index'] for r in records[:2]] == [0, 1] and sorted(r['index'] for r in records[2:]) == [1, 2]
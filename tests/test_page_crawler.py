@@ -11,11 +11,18 @@ Usage:
 import sys
 import os
 import json
+import threading
+import time
+from unittest.mock import MagicMock
 
 # Ensure the project root is in sys.path for direct execution
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils.page_crawler import PageCrawler
+import pytest
+
+from utils.page_crawler import PageCrawler, PARSER_BACKENDS, STREAM_PARSERS, UnsupportedContentType
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
 
 def test_billboard_crawl():
     url = 'https://www.billboard.com'
@@ -33,5 +40,245 @@ def test_billboard_crawl():
     print("\nFirst 500 characters of text:")
     print(data['text'][:500])
 
+def _response(status, body=b'', headers=None):
+    """Build a streaming response mock whose body is served in ``chunk_size`` pieces."""
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.encoding = None
+    response.iter_content.side_effect = lambda chunk_size: (
+        body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+    )
+    return response
+
+
+def _fake_session(pages, delay=0.0, tracker=None):
+    """Build a session mock serving ``pages`` (url -> html) and tracking concurrency."""
+    session = MagicMock()
+    lock = threading.Lock()
+
+    def get(url, headers=None, timeout=None, stream=False):
+        if tracker is not None:
+            host = url.split('/')[2]
+            with lock:
+                tracker['active'][host] = tracker['active'].get(host, 0) + 1
+                tracker['peak'][host] = max(tracker['peak'].get(host, 0), tracker['active'][host])
+                tracker['total'] += 1
+                tracker['peak_total'] = max(tracker['peak_total'], tracker['total'])
+        time.sleep(delay)
+        if tracker is not None:
+            with lock:
+                tracker['active'][host] -= 1
+                tracker['total'] -= 1
+        if url not in pages:
+            raise ValueError(f"unreachable: {url}")
+        return _response(200, pages[url].encode('utf-8'))
+
+    session.get.side_effect = get
+    return session
+
+
+def test_fetch_page_uses_timeouts():
+    session = _fake_session({'https://a.test/': '<title>A</title>'})
+    crawler = PageCrawler(connect_timeout=1.5, read_timeout=7, session=session)
+    assert crawler.fetch_page('https://a.test/') == '<title>A</title>'
+    assert session.get.call_args[1]['timeout'] == (1.5, 7)
+
+
+def test_crawl_many_yields_results_and_errors():
+    pages = {f'https://a.test/{i}': f'<title>A{i}</title><p>x</p>' for i in range(3)}
+    crawler = PageCrawler(session=_fake_session(pages))
+    results = list(crawler.crawl_many(list(pages) + ['https://b.test/missing']))
+    by_url = {r['url']: r for r in results}
+    assert len(results) == 4
+    assert by_url['https://a.test/1']['data']['title'] == 'A1'
+    assert by_url['https://b.test/missing']['data'] is None
+    assert 'unreachable' in by_url['https://b.test/missing']['error']
+
+
+def test_crawl_many_respects_global_and_per_host_limits():
+    urls = [f'https://{host}.test/{i}' for host in 'abc' for i in range(4)]
+    tracker = {'active': {}, 'peak': {}, 'total': 0, 'peak_total': 0}
+    crawler = PageCrawler(session=_fake_session({u: '<p>x</p>' for u in urls}, 0.02, tracker))
+    results = list(crawler.crawl_many(urls, max_workers=3, per_host_limit=1))
+    assert len(results) == len(urls)
+    assert max(tracker['peak'].values()) == 1
+    assert tracker['peak_total'] <= 3
+
+
+def test_crawl_many_holds_guard_around_each_crawl():
+    entered = []
+
+    class Guard:
+        def __init__(self, url):
+            self.url = url
+
+        def __enter__(self):
+            entered.append(self.url)
+
+        def __exit__(self, *exc):
+            return False
+
+    crawler = PageCrawler(session=_fake_session({'https://a.test/': '<p>x</p>'}))
+    list(crawler.crawl_many(['https://a.test/'], guard=Guard))
+    assert entered == ['https://a.test/']
+
+
+def test_crawl_many_stops_starting_urls_when_asked():
+    urls = [f'https://a.test/{i}' for i in range(4)]
+    crawler = PageCrawler(session=_fake_session({u: '<p>x</p>' for u in urls}))
+    results = []
+    for result in crawler.crawl_many(urls, max_workers=1, stop_when=lambda: len(results) >= 2):
+        results.append(result)
+    assert [r['url'] for r in results] == urls[:2]
+
+
+def test_crawl_many_abandons_blocked_crawls_at_the_deadline():
+    urls = ['https://a.test/', 'https://b.test/', 'https://c.test/']
+    crawler = PageCrawler(session=_fake_session({u: '<p>x</p>' for u in urls}))
+    release = threading.Event()
+
+    class BlockingGuard:
+        def __init__(self, url):
+            self.url = url
+
+        def __enter__(self):
+            if self.url == 'https://b.test/':
+                release.wait(5)
+
+        def __exit__(self, *exc):
+            return False
+
+    start = time.monotonic()
+    try:
+        results = list(crawler.crawl_many(urls, max_workers=2, guard=BlockingGuard,
+                                          deadline=start + 0.2))
+    finally:
+        release.set()
+    assert time.monotonic() - start < 2
+    # The blocked URL is left out; the others finished before the deadline
+    assert sorted(r['url'] for r in results) == ['https://a.test/', 'https://c.test/']
+
+
+def test_abandoned_crawl_leaves_the_validator_cache_alone(tmp_path):
+    release, closed = threading.Event(), threading.Event()
+    session = MagicMock()
+
+    def get(url, headers=None, timeout=None, stream=False):
+        release.wait(5)
+        response = _response(200, b'<title>A</title>', {'ETag': '"v1"'})
+        response.close.side_effect = closed.set
+        return response
+
+    session.get.side_effect = get
+    crawler = PageCrawler(session=session, cache_path=str(tmp_path / 'cache.json'))
+    assert list(crawler.crawl_many(['https://a.test/'], deadline=time.monotonic() + 0.1)) == []
+    # The abandoned fetch finishes after the deadline without recording the page
+    release.set()
+    assert closed.wait(5)
+    assert crawler.cache.get('https://a.test/') is None
+    # So resuming the URL fetches and parses it instead of reporting it unchanged
+    results = list(crawler.crawl_many(['https://a.test/']))
+    assert results[0]['data']['title'] == 'A' and results[0]['not_modified'] is False
+    assert 'If-None-Match' not in (session.get.call_args[1]['headers'] or {})
+
+
+def test_conditional_get_sends_validators_and_reports_not_modified(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    session = MagicMock()
+    session.get.return_value = _response(200, b'<title>A</title>', {'ETag': '"v1"', 'Last-Modified': 'Mon'})
+    crawler = PageCrawler(session=session, cache_path=cache_path)
+    assert crawler.crawl_and_save('https://a.test/', str(tmp_path / 'a.json')) is True
+
+    # A fresh crawler picks the validators up from disk
+    session.get.return_value = _response(304)
+    crawler = PageCrawler(session=session, cache_path=cache_path)
+    assert crawler.crawl('https://a.test/') is None
+    assert session.get.call_args[1]['headers'] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon'}
+
+
+def test_identical_body_without_validators_is_not_modified(tmp_path):
+    session = MagicMock()
+    session.get.return_value = _response(200, b'<title>A</title>')
+    crawler = PageCrawler(session=session, cache_path=str(tmp_path / 'cache.json'))
+    assert crawler.crawl('https://a.test/') == {'title': 'A', 'text': 'A'}
+    assert crawler.crawl('https://a.test/') is None
+    session.get.return_value = _response(200, b'<title>B</title>')
+    assert crawler.crawl('https://a.test/')['title'] == 'B'
+    results = list(crawler.crawl_many(['https://a.test/']))
+    assert results[0]['not_modified'] is True and results[0]['error'] is None
+
+
+
+@pytest.mark.parametrize('backend', sorted(PARSER_BACKENDS))
+def test_parser_backends_drop_non_visible_text(backend):
+    with open(os.path.join(FIXTURE_DIR, 'news_homepage.html'), encoding='utf-8') as f:
+        html = f.read()
+    data = PageCrawler(parser=backend).parse_content(html)
+    assert data['title'] == 'Music News & Charts | Example Weekly'
+    assert 'Indie Trio Announces Surprise Third Album' in data['text']
+    assert 'to top the chart this week. Streaming drove most of the gain.' in data['text']
+    for hidden in ('dataLayer', 'trackImpression', 'font-family', 'Enable JavaScript',
+                   'Template text', 'Lead story'):
+        assert hidden not in data['text']
+
+
+def test_parser_backends_agree():
+    with open(os.path.join(FIXTURE_DIR, 'news_homepage.html'), encoding='utf-8') as f:
+        html = f.read()
+    outputs = [PageCrawler(parser=name).parse_content(html) for name in PARSER_BACKENDS]
+    assert all(output == outputs[0] for output in outputs)
+
+
+def test_unknown_parser_backend_is_rejected():
+    with pytest.raises(ValueError):
+        PageCrawler(parser='no-such-parser')
+
+
+
+@pytest.mark.parametrize('backend', sorted(STREAM_PARSERS))
+def test_streaming_crawl_matches_parse_content(backend):
+    with open(os.path.join(FIXTURE_DIR, 'news_homepage.html'), encoding='utf-8') as f:
+        html = f.read().replace('Example Weekly', 'Exámple Wéekly')
+    session = MagicMock()
+    session.get.return_value = _response(200, html.encode('utf-8'), {'Content-Type': 'text/html'})
+    # Tiny chunks split tags, entities and multi-byte characters across feeds
+    crawler = PageCrawler(session=session, parser=backend, chunk_size=7)
+    assert crawler.crawl('https://a.test/') == crawler.parse_content(html)
+    assert session.get.call_args[1]['stream'] is True
+
+
+def test_body_is_capped_at_max_bytes():
+    session = MagicMock()
+    session.get.return_value = _response(200, b'<p>' + b'a' * 10000 + b'</p>')
+    crawler = PageCrawler(session=session, max_bytes=100, chunk_size=64)
+    assert len(crawler.fetch_page('https://a.test/')) == 100
+    assert len(crawler.crawl('https://a.test/')['text']) == 97
+    session.get.return_value.close.assert_called()
+
+
+def test_non_html_content_type_is_rejected():
+    session = MagicMock()
+    session.get.return_value = _response(200, b'%PDF', {'Content-Type': 'application/pdf'})
+    crawler = PageCrawler(session=session)
+    with pytest.raises(UnsupportedContentType):
+        crawler.crawl('https://a.test/doc.pdf')
+    session.get.return_value.iter_content.assert_not_called()
+
+
+
+@pytest.mark.parametrize('backend', sorted(PARSER_BACKENDS))
+def test_crawl_extracts_absolute_links(backend):
+    with open(os.path.join(FIXTURE_DIR, 'news_homepage.html'), encoding='utf-8') as f:
+        html = f.read()
+    session = MagicMock()
+    session.get.return_value = _response(200, html.encode('utf-8'))
+    data = PageCrawler(session=session, parser=backend).crawl('https://news.test/home/', extract_links=True)
+    assert data['links'][:2] == ['https://news.test/charts', 'https://news.test/news']
+    assert 'https://other.example/reviews/synth-pop' in data['links']
+    assert 'links' not in PageCrawler(session=session, parser=backend).crawl('https://news.test/home/')
+
+
+
 if __name__ == '__main__':
-    test_billboard_crawl() 
\ No newline at end of file
+    test_billboard_crawl()
@@ -0,0 +1,78 @@
+"""
+Tests for the staged producer/consumer pipeline.
+"""
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.pipeline import Pipeline
+
+
+def test_items_flow_through_fan_out_and_batching_stages():
+    batches = []
+    lock = threading.Lock()
+
+    def collect(batch):
+        with lock:
+            batches.append(list(batch))
+
+    stats = (Pipeline()
+             .add_stage('split', lambda n: range(n), workers=2, fan_out=True)
+             .add_stage('square', lambda n: n * n, workers=3)
+             .add_stage('sink', collect, batch_size=4, batch_timeout=0.05)
+             .run([1, 2, 3, 4]))
+
+    results = sorted(value for batch in batches for value in batch)
+    assert results == sorted(n * n for count in [1, 2, 3, 4] for n in range(count))
+    assert all(len(batch) <= 4 for batch in batches)
+    assert stats['source']['items_out'] == 4
+    assert stats['split']['items_in'] == 4 and stats['split']['items_out'] == 10
+    assert stats['square']['items_in'] == 10
+    assert stats['sink']['items_in'] == 10 and stats['sink']['workers'] == 1
+
+
+def test_failing_items_are_counted_and_the_rest_continue():
+    def fragile(n):
+        if n == 2:
+            raise ValueError('bad item')
+        return n
+
+    seen = []
+    stats = (Pipeline()
+             .add_stage('fragile', fragile)
+             .add_stage('sink', seen.append)
+             .run([1, 2, 3]))
+    assert sorted(seen) == [1, 3]
+    assert stats['fragile']['errors'] == 1 and stats['fragile']['items_out'] == 2
+
+
+def test_bounded_queues_throttle_the_source():
+    release = threading.Event()
+    produced = []
+
+    def source():
+        for n in range(10):
+            produced.append(n)
+            yield n
+
+    def slow(n):
+        release.wait()
+
+    runner = threading.Thread(target=lambda: Pipeline().add_stage('slow', slow, queue_size=2).run(source()))
+    runner.start()
+    time.sleep(0.2)
+    # One item is being processed and two are queued; the fourth put blocks the source
+    assert len(produced) <= 4
+    release.set()
+    runner.join(timeout=5)
+    assert len(produced) == 10
+
+
+def test_format_stats_lists_every_stage():
+    stats = Pipeline().add_stage('only', lambda n: n).run(range(3))
+    table = Pipeline.format_stats(stats)
+    assert 'source' in table and 'only' in table
@@ -0,0 +1,139 @@
+"""
+Tests for the per-domain token-bucket rate limiters.
+"""
+
+import sys
+import os
+import json
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.rate_limiter import EtcdRateLimiter, LocalRateLimiter, take_tokens
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Compare:
+    def __init__(self, target, key):
+        self.target, self.key = target, key
+
+    def __eq__(self, value):
+        self.value = value
+        return self
+
+
+class FakeEtcd:
+    """Values with mod revisions and create/mod compares, like an etcd3 client."""
+
+    def __init__(self):
+        self.values = {}
+        self.revision = 0
+        self.round_trips = 0
+        self.lock = threading.Lock()
+        self.transactions = self
+
+    def create(self, key):
+        return Compare('create', key)
+
+    def mod(self, key):
+        return Compare('mod', key)
+
+    def put(self, key, value):
+        return (key, value)
+
+    def get(self, key):
+        self.round_trips += 1
+        with self.lock:
+            if key not in self.values:
+                return None, None
+            value, revision = self.values[key]
+            return value.encode(), SimpleNamespace(mod_revision=revision)
+
+    def transaction(self, compare, success, failure):
+        self.round_trips += 1
+        with self.lock:
+            for c in compare:
+                current = self.values.get(c.key, (None, 0))[1]
+                if current != c.value:
+                    return False, []
+            for key, value in success:
+                self.revision += 1
+                self.values[key] = (value, self.revision)
+        return True, []
+
+
+def test_take_tokens_refills_up_to_burst():
+    assert take_tokens(0.0, 0.0, 10.0, rate=1.0, burst=3, wanted=5) == (0.0, 3, 0.0)
+    tokens, granted, wait = take_tokens(0.5, 0.0, 0.0, rate=2.0, burst=3, wanted=1)
+    assert granted == 0 and wait == 0.25
+
+
+def test_local_limiter_allows_burst_then_rate():
+    clock = FakeClock()
+    limiter = LocalRateLimiter(rate=2.0, burst=3, clock=clock, sleep=clock.sleep)
+    start = clock.now
+    for _ in range(3):
+        limiter.acquire('example.com')
+    assert clock.now == start
+    for _ in range(4):
+        limiter.acquire('example.com')
+    assert clock.now - start == 2.0
+    # Other domains have their own bucket
+    assert limiter.try_acquire('other.com') == 0.0
+
+
+def test_acquire_gives_up_when_no_token_is_due_in_time():
+    clock = FakeClock()
+    limiter = LocalRateLimiter(rate=1.0, burst=1, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire('example.com', timeout=0) is True
+    start = clock.now
+    assert limiter.acquire('example.com', timeout=0.5) is False
+    assert clock.now == start
+    assert limiter.acquire('example.com', timeout=1.0) is True
+    assert clock.now - start == 1.0
+
+
+def test_etcd_limiter_spends_batches_locally():
+    clock = FakeClock()
+    client = FakeEtcd()
+    limiter = EtcdRateLimiter(client, rate=100.0, burst=10, batch_size=5, clock=clock,
+                              sleep=clock.sleep)
+    for _ in range(10):
+        assert limiter.try_acquire('example.com') == 0.0
+    # Two batches of five: one get and one transaction each
+    assert limiter.grants == 2 and client.round_trips == 4
+    state = json.loads(client.values['/crawler/rate/example.com'][0])
+    assert state['tokens'] == 0
+
+
+def test_workers_share_the_bucket():
+    clock = FakeClock()
+    client = FakeEtcd()
+    workers = [EtcdRateLimiter(client, rate=1.0, burst=4, batch_size=2, clock=clock,
+                               sleep=clock.sleep) for _ in range(3)]
+    granted = [w.try_acquire('example.com') == 0.0 for w in workers for _ in range(2)]
+    # The bucket holds four tokens: the third worker has to wait
+    assert granted == [True, True, True, True, False, False]
+    assert workers[2].try_acquire('example.com') > 0
+
+
+def test_unspent_batch_expires():
+    clock = FakeClock()
+    client = FakeEtcd()
+    limiter = EtcdRateLimiter(client, rate=1.0, burst=5, batch_size=5, clock=clock,
+                              sleep=clock.sleep)
+    limiter.acquire('example.com')
+    clock.now += 60
+    limiter.acquire('example.com')
+    assert limiter.grants == 2
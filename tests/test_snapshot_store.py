@@ -0,0 +1,88 @@
+"""
+Tests for versioned index snapshots in an object store.
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import ingest
+from utils.numpy_index import NumpyIndex
+from utils.snapshot_store import (LocalObjectStore, S3ObjectStore, download_latest, latest_snapshot,
+                                  open_object_store, publish_snapshot)
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.texts.extend(texts)
+        return np.array([[float(len(t)), 1.0, 0.5] for t in texts])
+
+
+def test_local_object_store_round_trip(tmp_path):
+    store = open_object_store(f"file://{tmp_path / 'objects'}")
+    assert isinstance(store, LocalObjectStore)
+    store.put_bytes('a/one', b'1')
+    source = tmp_path / 'source.bin'
+    source.write_bytes(b'payload')
+    store.put_file('a/two', str(source))
+    store.put_bytes('b/three', b'3')
+    assert store.list('a/') == ['a/one', 'a/two']
+    store.get_file('a/two', str(tmp_path / 'copy.bin'))
+    assert (tmp_path / 'copy.bin').read_bytes() == b'payload'
+    store.delete('a/one')
+    assert store.get_bytes('a/one') is None and store.get_bytes('b/three') == b'3'
+
+
+def test_published_snapshot_is_loaded_and_only_changes_are_embedded(tmp_path):
+    store = LocalObjectStore(str(tmp_path / 'objects'))
+    assert download_latest(store, 'music', str(tmp_path / 'cache')) is None
+
+    index = NumpyIndex()
+    first = FakeEmbedder()
+    ingest.sync_documents(index, first, {'a': 'one two three', 'b': 'four five'}, chunk_tokens=2, overlap=0)
+    pointer = publish_snapshot(store, 'music', index.save, count=index.count())
+    assert latest_snapshot(store, 'music') == pointer and pointer['count'] == 3
+
+    latest = download_latest(store, 'music', str(tmp_path / 'cache'))
+    replica = NumpyIndex.load(latest['path'])
+    assert isinstance(replica._matrix, np.memmap)
+    assert sorted(replica.get()['ids']) == sorted(index.get()['ids'])
+
+    # A later run starting from the snapshot only embeds the changed chunk
+    second = FakeEmbedder()
+    stats = ingest.sync_documents(replica, second, {'a': 'one two six', 'b': 'four five'},
+                                  chunk_tokens=2, overlap=0)
+    assert second.texts == ['six'] and stats['upserted'] == 1
+
+
+def test_publishing_prunes_old_versions_and_cache(tmp_path):
+    store = LocalObjectStore(str(tmp_path / 'objects'))
+    cache = str(tmp_path / 'cache')
+    index = NumpyIndex()
+    index.add(ids=['x'], embeddings=[[1.0, 0.0]], documents=['x'])
+    versions = []
+    for _ in range(4):
+        versions.append(publish_snapshot(store, 'music', index.save, keep=2)['version'])
+        download_latest(store, 'music', cache)
+    assert versions == sorted(set(versions))
+    assert len([key for key in store.list('music/') if key.endswith('.npvi')]) == 2
+    assert os.listdir(cache) == [f"music-{versions[-1]}.npvi"]
+
+
+def test_s3_store_maps_keys_under_its_prefix():
+    client = MagicMock()
+    client.get_paginator.return_value.paginate.return_value = [
+        {'Contents': [{'Key': 'snapshots/music/LATEST'}, {'Key': 'snapshots/music/1.npvi'}]}]
+    store = open_object_store('s3://bucket/snapshots/')
+    assert isinstance(store, S3ObjectStore)
+    store._client = client
+    store.put_bytes('music/LATEST', b'{}')
+    client.put_object.assert_called_once_with(Bucket='bucket', Key='snapshots/music/LATEST', Body=b'{}')
+    assert store.list('music/') == ['music/1.npvi', 'music/LATEST']
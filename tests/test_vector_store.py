@@ -0,0 +1,34 @@
+"""
+Tests for the lazily opened vector store.
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.vector_store import LazyCollection
+
+
+def test_lazy_collection_opens_on_first_use_only():
+    opened = []
+    backing = MagicMock()
+    backing.query.return_value = {'documents': [['hit']]}
+
+    def opener(name, persist_dir):
+        opened.append((name, persist_dir))
+        return backing
+
+    collection = LazyCollection('music', '/data/chroma', opener=opener)
+    assert not collection.is_open and opened == []
+
+    assert collection.query(query_embeddings=[[0.1]], n_results=1) == {'documents': [['hit']]}
+    collection.get(ids=['a'])
+    assert collection.is_open
+    assert opened == [('music', '/data/chroma')]
+
+    collection.reopen()
+    assert not collection.is_open
+    collection.count()
+    assert len(opened) == 2
@@ -0,0 +1,164 @@
+"""
+answer_cache.py
+
+Semantic cache of generated answers, invalidated by a corpus version.
+
+Questions to a news assistant cluster heavily ("latest music news", "what's new in
+music"), and each one otherwise pays for retrieval plus a full LLM generation.
+This cache stores every answer with the embedding of its question and returns it
+for a new question whose embedding is within a cosine-similarity ``threshold``.
+
+Each entry is tagged with the corpus ``epoch`` (version) it was generated
+against. Callers bump the epoch whenever ingestion changes the index, and lookups
+only match entries of the current epoch, so answers never outlive the content
+they were based on.
+
+Features:
+- Cosine-similarity lookup over all cached question embeddings in one matmul
+- Per-entry corpus epoch and model name; stale entries are ignored and pruned
+- Least-recently-used eviction at ``max_entries``
+- Optional persistence to a ``.npz`` file, hit/miss statistics
+
+Dependencies:
+- numpy
+
+Usage:
+    from utils.answer_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(threshold=0.9, path='fresh/chroma_db/answer_cache.npz')
+    hit = cache.lookup(query_vector, epoch=3, model='gemma3:4b')
+    if hit is None:
+        answer = generate(...)
+        cache.store(query_vector, query, answer, epoch=3, model='gemma3:4b')
+
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_ENTRIES = 256
+
+
+def _unit(vector: Any) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding, matched by cosine similarity within a corpus epoch."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: Optional[str] = None):
+        """
+        Args:
+            threshold (float): Minimum cosine similarity for a cached answer to be returned.
+            max_entries (int): Maximum number of cached answers.
+            path (str, optional): ``.npz`` file the cache is loaded from and saved to.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def lookup(self, vector: Any, epoch: Any, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached answer closest to ``vector``, if it is similar enough.
+
+        Args:
+            vector: Embedding of the new question.
+            epoch: Current corpus version; entries of other epochs never match.
+            model (str, optional): Model that must have generated the answer.
+
+        Returns:
+            Optional[Dict[str, Any]]: ``{'query', 'answer', 'similarity', 'created_at'}``, or None.
+        """
+        query = _unit(vector)
+        with self._lock:
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if entry['epoch'] == epoch and entry['model'] == model]
+            if candidates:
+                similarities = np.stack([entry['vector'] for _, entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return {'query': entry['query'], 'answer': entry['answer'],
+                            'similarity': float(similarities[best]), 'created_at': entry['created_at']}
+            self.misses += 1
+            return None
+
+    def store(self, vector: Any, query: str, answer: str, epoch: Any, model: Optional[str] = None) -> None:
+        """Cache ``answer`` to ``query``, generated against corpus ``epoch``."""
+        with self._lock:
+            self._entries[self._next_id] = {
+                'vector': _unit(vector), 'query': query, 'answer': answer,
+                'epoch': epoch, 'model': model, 'created_at': time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prune(self, epoch: Any) -> int:
+        """Drop entries of every epoch but ``epoch``; return how many were dropped."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry['epoch'] != epoch]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return ``hits``, ``misses``, ``hit_rate`` and the current ``size``."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def save(self) -> None:
+        """Atomically write the cache to ``path`` (least recently used first)."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.values())
+        records = [json.dumps({k: v for k, v in entry.items() if k != 'vector'}) for entry in entries]
+        vectors = np.stack([entry['vector'] for entry in entries]) if entries else np.zeros((0, 0), np.float32)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, records=np.array(records, dtype=str), vectors=vectors)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> None:
+        """Load entries saved by ``save``; a corrupt file leaves the cache empty."""
+        try:
+            with np.load(self.path) as data:
+                records, vectors = list(data['records']), data['vectors']
+        except (OSError, ValueError, KeyError):
+            return
+        with self._lock:
+            for record, vector in zip(records, vectors):
+                entry = json.loads(str(record))
+                entry['vector'] = vector
+                self._entries[self._next_id] = entry
+                self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,137 @@
+"""
+context_assembler.py
+
+Token-budgeted assembly of retrieved chunks into an LLM prompt.
+
+Retrieval returns overlapping windows of the same pages (consecutive chunks share
+``CHUNK_OVERLAP`` tokens) and sometimes the same text twice. Joining them verbatim
+wastes prompt tokens, and prompt evaluation dominates local RAG latency. The
+assembler:
+
+- drops chunks that repeat (or are contained in) an already selected chunk,
+- fills a token budget in retrieval rank order, skipping chunks that do not fit,
+- stitches adjacent windows of the same page back together without the overlap,
+- orders the result by document and chunk position rather than by score, so the
+  same set of chunks always produces byte-identical context.
+
+``build_prompt`` then lays the prompt out as a fixed instruction prefix, then the
+context, then the question. Everything up to the question is identical for
+repeated or follow-up questions over the same context, which lets Ollama reuse
+its KV cache for that prefix instead of re-evaluating it.
+
+Features:
+- Exact and containment de-duplication of chunks
+- Configurable token budget with a pluggable token counter
+- Overlap-free stitching of adjacent chunks of one document
+- Deterministic, cache-friendly context order and prompt layout
+
+Dependencies:
+- None (standard library only)
+
+Usage:
+    from utils.context_assembler import assemble_context, build_prompt
+
+    results = collection.query(query_embeddings=[vector], n_results=8)
+    context = assemble_context(results['documents'][0], results['metadatas'][0], budget_tokens=1500)
+    prompt = build_prompt(context, "What are the latest music news?")
+
+"""
+
+import hashlib
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BUDGET_TOKENS = 1500
+DEFAULT_INSTRUCTIONS = (
+    "You are a music news assistant. Answer the question using only the context below. "
+    "If the context does not contain the answer, say so."
+)
+DOCUMENT_SEPARATOR = "\n\n"
+
+_WORD = re.compile(r'\S+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate LLM tokens in ``text`` (about four characters per token for English)."""
+    return math.ceil(len(text) / 4)
+
+
+def _overlap_start(previous: str, following: str) -> int:
+    """Return the offset in ``following`` just past the words it repeats from the end of ``previous``."""
+    tail = _WORD.findall(previous)
+    head = list(_WORD.finditer(following))
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == [match.group() for match in head[:size]]:
+            return head[size - 1].end()
+    return 0
+
+
+def assemble_context(documents: Sequence[str], metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+                     budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+                     count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Fit retrieved chunks into ``budget_tokens`` and join them into one context string.
+
+    Args:
+        documents (Sequence[str]): Chunk texts, best match first.
+        metadatas (Sequence[dict], optional): Per-chunk metadata with ``doc_id`` and
+            ``chunk`` (as written by ``ingest.build_chunks``). Chunks without them are
+            treated as independent documents.
+        budget_tokens (int): Maximum tokens of the returned context.
+        count_tokens (Callable[[str], int]): Token counter.
+
+    Returns:
+        str: The context, one paragraph per document, in document and chunk order.
+    """
+    metadatas = metadatas or [None] * len(documents)
+    selected: List[Dict[str, Any]] = []
+    seen = set()
+    used = 0
+    for rank, (text, metadata) in enumerate(zip(documents, metadatas)):
+        text = (text or '').strip()
+        if not text:
+            continue
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if digest in seen or any(text in chunk['text'] for chunk in selected):
+            continue
+        cost = count_tokens(text)
+        if used + cost > budget_tokens:
+            continue
+        seen.add(digest)
+        used += cost
+        metadata = metadata or {}
+        selected.append({
+            'text': text,
+            'doc_id': str(metadata.get('doc_id', f"#{rank}")),
+            'chunk': metadata.get('chunk', 0),
+        })
+
+    paragraphs = []
+    selected.sort(key=lambda chunk: (chunk['doc_id'], chunk['chunk']))
+    previous = None
+    for chunk in selected:
+        if (previous is not None and chunk['doc_id'] == previous['doc_id']
+                and chunk['chunk'] == previous['chunk'] + 1):
+            rest = chunk['text'][_overlap_start(previous['text'], chunk['text']):].strip()
+            if rest:
+                paragraphs[-1] = f"{paragraphs[-1]} {rest}"
+        else:
+            paragraphs.append(chunk['text'])
+        previous = chunk
+    return DOCUMENT_SEPARATOR.join(paragraphs)
+
+
+def build_prompt(context: str, question: str, instructions: str = DEFAULT_INSTRUCTIONS) -> str:
+    """
+    Lay out a RAG prompt as instructions, then context, then question.
+
+    Args:
+        context (str): Context from ``assemble_context``.
+        question (str): The user's question; it comes last so the prefix stays reusable.
+        instructions (str): Fixed instruction prefix shared by every prompt.
+
+    Returns:
+        str: The prompt.
+    """
+    return f"{instructions}\n\nContext:\n{context}\n\nQuestion: {question.strip()}\nAnswer:"
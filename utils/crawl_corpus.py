@@ -0,0 +1,204 @@
+"""
+crawl_corpus.py
+
+Append-only, optionally compressed JSONL corpus of crawled page snapshots.
+
+Writing one pretty-printed JSON file per page overwrites the previous crawl and
+forces every consumer to list and reparse the whole directory. Here every crawl of
+a page appends one compact JSON record (one gzip member per record when
+compressed) to a single data file. A sidecar index (``<path>.idx``, one JSON line
+per record) holds each record's byte offset and length together with its URL,
+fetch time and content hash, so readers can:
+
+- jump straight to any record or to the latest snapshot of a URL,
+- stream only the records fetched after a watermark,
+
+without reading or decompressing anything else.
+
+The data is written before its index line, so a crash can at worst leave an
+unindexed record behind, which readers never see.
+
+Features:
+- One record per page snapshot: ``url``, ``fetched_at``, ``hash``, ``title``, ``text``
+- gzip compression chosen by the ``.gz`` suffix (or explicitly)
+- Snapshots identical to the URL's latest one are not appended again
+- Random access through the offset index, and ``since(watermark)`` streaming
+
+Dependencies:
+- None (standard library only)
+
+Usage:
+    from utils.crawl_corpus import CrawlCorpus
+
+    corpus = CrawlCorpus('fresh/crawl_corpus.jsonl.gz')
+    corpus.append('https://pitchfork.com/', text, title='Pitchfork')
+    watermark = corpus.watermark
+    ...
+    for record in corpus.since(watermark):
+        print(record['url'], record['hash'])
+
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a page's text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CrawlCorpus:
+    """A JSONL data file of page snapshots plus its ``.idx`` offset index."""
+
+    def __init__(self, path: str, compress: Optional[bool] = None):
+        """
+        Args:
+            path (str): The data file, e.g. ``crawl_corpus.jsonl.gz``.
+            compress (bool, optional): gzip each record. Defaults to whether ``path``
+                ends in ``.gz``.
+        """
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.compress = path.endswith('.gz') if compress is None else compress
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._latest: Dict[str, int] = {}
+        # Set when the index ends in a torn line the next entry must not be glued to
+        self._torn_index = False
+        self._load_index()
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._torn_index = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted append
+                    continue
+                if entry['offset'] + entry['length'] > size:
+                    continue
+                self._latest[entry['url']] = len(self._entries)
+                self._entries.append(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        """Return whether the corpus holds a snapshot of ``url``."""
+        with self._lock:
+            return url in self._latest
+
+    @property
+    def entries(self) -> List[Dict[str, Any]]:
+        """Index entries (``offset``, ``length``, ``url``, ``fetched_at``, ``hash``) in append order."""
+        with self._lock:
+            return list(self._entries)
+
+    @property
+    def watermark(self) -> Optional[float]:
+        """Fetch time of the newest record, or None for an empty corpus."""
+        with self._lock:
+            return max((e['fetched_at'] for e in self._entries), default=None)
+
+    def append(self, url: str, text: str, title: str = '', fetched_at: Optional[float] = None,
+               skip_unchanged: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Append a snapshot of ``url``.
+
+        Args:
+            url (str): The page URL.
+            text (str): The page's visible text.
+            title (str): The page title.
+            fetched_at (float, optional): Unix time of the fetch; defaults to now.
+            skip_unchanged (bool): Do not append if the URL's latest snapshot has the same hash.
+
+        Returns:
+            Optional[Dict[str, Any]]: The index entry of the new record, or None if skipped.
+        """
+        digest = content_hash(text)
+        record = {
+            'url': url,
+            'fetched_at': time.time() if fetched_at is None else fetched_at,
+            'hash': digest,
+            'title': title,
+            'text': text,
+        }
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        if self.compress:
+            data = gzip.compress(data)
+        with self._lock:
+            latest = self._latest.get(url)
+            if skip_unchanged and latest is not None and self._entries[latest]['hash'] == digest:
+                return None
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            entry = {'offset': offset, 'length': len(data), 'url': url,
+                     'fetched_at': record['fetched_at'], 'hash': digest}
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                if self._torn_index:
+                    f.write('\n')
+                    self._torn_index = False
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._latest[url] = len(self._entries)
+            self._entries.append(entry)
+            return entry
+
+    def _read_entry(self, f: Any, entry: Dict[str, Any]) -> Dict[str, Any]:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+        if self.compress:
+            data = gzip.decompress(data)
+        return json.loads(data)
+
+    def read(self, position: int) -> Dict[str, Any]:
+        """Return the record at ``position`` (0 is the oldest)."""
+        entry = self._entries[position]
+        with open(self.path, 'rb') as f:
+            return self._read_entry(f, entry)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the latest snapshot of ``url``, or None if it was never crawled."""
+        position = self._latest.get(url)
+        return None if position is None else self.read(position)
+
+    def since(self, watermark: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield the records fetched after ``watermark`` (all records if None), in append order."""
+        entries = [e for e in self.entries if watermark is None or e['fetched_at'] > watermark]
+        if not entries:
+            return
+        with open(self.path, 'rb') as f:
+            for entry in entries:
+                yield self._read_entry(f, entry)
+
+    def latest(self, since: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the latest snapshot of every URL, reading only those records.
+
+        Args:
+            since (float, optional): Only include URLs whose latest snapshot was
+                fetched after this watermark.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Records keyed by URL.
+        """
+        with self._lock:
+            entries = [self._entries[i] for i in sorted(self._latest.values())]
+        entries = [e for e in entries if since is None or e['fetched_at'] > since]
+        if not entries:
+            return {}
+        with open(self.path, 'rb') as f:
+            return {entry['url']: self._read_entry(f, entry) for entry in entries}
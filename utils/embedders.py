@@ -0,0 +1,220 @@
+"""
+embedders.py
+
+Pluggable sentence embedders: PyTorch sentence-transformers or ONNX Runtime.
+
+Loading ``SentenceTransformer`` imports PyTorch, which dominates process (and
+Lambda cold) start time and package size, and PyTorch is not the fastest CPU
+runtime for a 6-layer MiniLM. ``OnnxEmbedder`` runs the same transformer exported
+to ONNX under ONNX Runtime, optionally with int8 dynamically quantized weights,
+and reproduces the sentence-transformers pipeline of all-MiniLM-L6-v2 (mean
+pooling over the attention mask, then L2 normalization). It needs only
+``onnxruntime``, ``tokenizers`` and numpy at run time.
+
+Every backend exposes SentenceTransformer's ``encode(texts, batch_size=...,
+show_progress_bar=...)`` and a fast ``tokenizer`` usable by ``ingest.token_spans``,
+so the rest of the code is unaware of which one is loaded. Float32 ONNX vectors
+match the PyTorch ones to rounding error; int8 vectors stay close (cosine
+similarity around 0.99), so an index built with one backend can be queried with
+another. Check with ``benchmarks/bench_embedders.py`` before switching a live index.
+
+Features:
+- ``load_embedder(backend, model_name, onnx_dir)`` selecting ``torch``, ``onnx`` or ``onnx-int8``
+- Length-sorted batching with per-batch padding
+- ``export_onnx`` to export a Hugging Face model (and an int8 copy) once, at build time
+
+Dependencies:
+- sentence-transformers (``torch`` backend, imported on first use)
+- onnxruntime, tokenizers (``onnx`` backends, imported on first use)
+- transformers, torch (``export_onnx`` only)
+
+Usage:
+    from utils.embedders import export_onnx, load_embedder
+
+    export_onnx('all-MiniLM-L6-v2', 'models/all-MiniLM-L6-v2-onnx')    # once
+    embedder = load_embedder('onnx-int8', 'all-MiniLM-L6-v2', 'models/all-MiniLM-L6-v2-onnx')
+    vectors = embedder.encode(['first chunk', 'second chunk'], batch_size=64)
+
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_INT8_MODEL_FILE = 'model_int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+DEFAULT_MAX_SEQ_LENGTH = 256
+DEFAULT_BATCH_SIZE = 32
+
+
+def hub_model_id(model_name: str) -> str:
+    """Return the Hugging Face Hub id of a sentence-transformers model name."""
+    return model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+
+
+class FastTokenizer:
+    """
+    Adapter giving a ``tokenizers.Tokenizer`` the call signature of a Hugging Face fast
+    tokenizer, as far as ``ingest.token_spans`` uses it.
+    """
+
+    is_fast = True
+
+    def __init__(self, tokenizer: Any):
+        self._tokenizer = tokenizer
+
+    def __call__(self, text: str, add_special_tokens: bool = True, return_offsets_mapping: bool = False,
+                 verbose: bool = True) -> Dict[str, List[Any]]:
+        encoding = self._tokenizer.encode(text, add_special_tokens=add_special_tokens)
+        result = {'input_ids': encoding.ids, 'attention_mask': encoding.attention_mask}
+        if return_offsets_mapping:
+            result['offset_mapping'] = encoding.offsets
+        return result
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from an ONNX export of a sentence-transformers model."""
+
+    def __init__(self, model_dir: str, quantized: bool = False, max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH,
+                 normalize: bool = True, threads: Optional[int] = None):
+        """
+        Args:
+            model_dir (str): Directory written by ``export_onnx`` (ONNX model and ``tokenizer.json``).
+            quantized (bool): Load the int8 model instead of the float32 one.
+            max_seq_length (int): Tokens per text; longer texts are truncated, like
+                SentenceTransformer's ``max_seq_length``.
+            normalize (bool): L2-normalize the vectors (all-MiniLM-L6-v2 does).
+            threads (int, optional): Intra-op threads; ONNX Runtime picks by default.
+
+        Raises:
+            FileNotFoundError: If the model or tokenizer file is missing.
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"{path} not found; create it with export_onnx()")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+
+        raw = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer = FastTokenizer(Tokenizer.from_str(raw.to_str()))
+        raw.enable_truncation(max_length=max_seq_length)
+        pad_token = '[PAD]' if raw.token_to_id('[PAD]') is not None else '<pad>'
+        raw.enable_padding(pad_id=raw.token_to_id(pad_token) or 0, pad_token=pad_token)
+        self._batch_tokenizer = raw
+
+    def _encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        encodings = self._batch_tokenizer.encode_batch(list(texts))
+        inputs = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self._input_names})[0]
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, texts: Any, batch_size: int = DEFAULT_BATCH_SIZE, show_progress_bar: bool = False,
+               **kwargs: Any) -> np.ndarray:
+        """
+        Embed ``texts`` like ``SentenceTransformer.encode``.
+
+        Texts are sorted by length so each batch pads to similar lengths, and the
+        vectors are returned in input order.
+
+        Returns:
+            np.ndarray: ``(len(texts), dimension)`` float32 vectors, or one vector for a single string.
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        vectors = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            for row, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                vectors[row] = vector
+        result = np.stack(vectors)
+        return result[0] if single else result
+
+
+def load_embedder(backend: str = 'torch', model_name: str = 'all-MiniLM-L6-v2',
+                  onnx_dir: Optional[str] = None, **kwargs: Any) -> Any:
+    """
+    Create the embedder of ``backend``.
+
+    Args:
+        backend (str): ``torch`` (sentence-transformers), ``onnx`` or ``onnx-int8``.
+        model_name (str): sentence-transformers model name (``torch`` backend).
+        onnx_dir (str, optional): Directory written by ``export_onnx`` (ONNX backends).
+        **kwargs: Passed to ``OnnxEmbedder``.
+
+    Raises:
+        ValueError: For an unknown backend, or an ONNX backend without ``onnx_dir``.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}")
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if not onnx_dir:
+        raise ValueError(f"The {backend} backend needs onnx_dir (see export_onnx)")
+    return OnnxEmbedder(onnx_dir, quantized=backend == 'onnx-int8', **kwargs)
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14) -> Dict[str, str]:
+    """
+    Export ``model_name``'s transformer to ONNX (and an int8 copy) with its tokenizer.
+
+    Run once at build time; it needs transformers and torch, the ONNX backends do not.
+
+    Args:
+        model_name (str): sentence-transformers or Hugging Face Hub model name.
+        output_dir (str): Directory for ``model.onnx``, ``model_int8.onnx`` and ``tokenizer.json``.
+        quantize (bool): Also write the dynamically int8-quantized model.
+        opset (int): ONNX opset version.
+
+    Returns:
+        Dict[str, str]: Paths of the written ``model``, ``model_int8`` (if quantized) and ``tokenizer``.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(hub_model_id(model_name))
+    model = AutoModel.from_pretrained(hub_model_id(model_name)).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(['an example sentence', 'another one'], padding=True, return_tensors='pt')
+    names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    paths = {'model': os.path.join(output_dir, ONNX_MODEL_FILE),
+             'tokenizer': os.path.join(output_dir, TOKENIZER_FILE)}
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in names), paths['model'],
+                          input_names=names, output_names=['last_hidden_state'],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        paths['model_int8'] = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+        quantize_dynamic(paths['model'], paths['model_int8'], weight_type=QuantType.QInt8)
+    return paths
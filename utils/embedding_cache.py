@@ -0,0 +1,145 @@
+"""
+embedding_cache.py
+
+Bounded LRU cache of query embeddings.
+
+Identical (or trivially different) queries arriving seconds apart should not pay
+for another transformer forward pass. Entries are keyed on the model name and
+the normalized query text, so switching models never returns stale vectors.
+
+Features:
+- Least-recently-used eviction at a fixed number of entries
+- Query normalization (case, surrounding and repeated whitespace)
+- Optional persistence to a ``.npz`` file across restarts
+- Hit/miss counters and hit rate
+
+Dependencies:
+- numpy
+
+Usage:
+    from utils.embedding_cache import QueryEmbeddingCache
+
+    cache = QueryEmbeddingCache(max_entries=1024, path='query_cache.npz')
+    vectors = cache.encode(embedder, ['Latest music news'], model_name='all-MiniLM-L6-v2')
+    print(cache.stats())
+    cache.save()
+
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase ``query`` and collapse its whitespace."""
+    return _WHITESPACE.sub(' ', query).strip().lower()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache mapping ``(model name, normalized query)`` to a vector."""
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        """
+        Args:
+            max_entries (int): Maximum number of cached vectors.
+            path (str, optional): ``.npz`` file the cache is loaded from and saved to.
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple[str, str], np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, query: str, model_name: str) -> Optional[np.ndarray]:
+        """Return the cached vector for ``query``, counting a hit or a miss."""
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, model_name: str, vector: Any) -> None:
+        """Cache ``vector`` for ``query``, evicting the least recently used entry if full."""
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def encode(self, embedder: Any, queries: List[str], model_name: str) -> np.ndarray:
+        """
+        Embed ``queries``, running the model only for the ones not cached yet.
+
+        Args:
+            embedder: Object with SentenceTransformer's ``encode``.
+            queries (List[str]): The queries to embed.
+            model_name (str): Name of the model behind ``embedder``.
+
+        Returns:
+            np.ndarray: One row per query, in order.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.get(q, model_name) for q in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = embedder.encode([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                self.put(queries[i], model_name, vector)
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        return np.stack(vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return ``hits``, ``misses``, ``hit_rate`` and the current ``size``."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def save(self) -> None:
+        """Atomically write the cache to ``path`` (most recently used last)."""
+        if not self.path:
+            return
+        with self._lock:
+            keys = [json.dumps(key) for key in self._entries]
+            vectors = list(self._entries.values())
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        if vectors:
+            np.savez(tmp_path, keys=np.array(keys), vectors=np.stack(vectors))
+        else:
+            np.savez(tmp_path, keys=np.array([], dtype=str), vectors=np.zeros((0, 0), np.float32))
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> None:
+        """Load entries saved by ``save``; a corrupt file leaves the cache empty."""
+        try:
+            with np.load(self.path) as data:
+                keys, vectors = list(data['keys']), data['vectors']
+        except (OSError, ValueError, KeyError):
+            return
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._entries[tuple(json.loads(str(key)))] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
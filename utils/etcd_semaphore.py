@@ -0,0 +1,208 @@
+"""
+etcd_semaphore.py
+
+Counting semaphore on etcd, shared by every crawler process.
+
+Counting the keys under a prefix and then writing a new one is a check-then-act
+race: two workers can both see ``limit - 1`` holders and both get in. Here every
+worker instead registers a key under the semaphore's prefix with a transaction
+(``create_revision == 0``, so the key is written exactly once), and etcd's
+revision order decides who holds a slot: the ``limit`` keys with the lowest
+create revisions are the holders, everyone else waits. A key never moves behind
+a newer one, so at most ``limit`` workers hold the semaphore at any time and
+waiters are admitted in FIFO order.
+
+Waiters block on an etcd watch of the prefix and re-check the moment a key is
+deleted (a holder released or its lease expired) instead of polling. All keys of
+one ``EtcdSemaphore`` share a short lease that a background thread keeps alive,
+so slots of a crashed process are freed within ``ttl`` seconds. A lease that
+expired anyway (the process was suspended, e.g. a frozen Lambda container) is
+replaced by a new one.
+
+Features:
+- Transactional, race-free slot registration
+- FIFO admission by etcd create revision
+- Watch-based wake-up, with a fallback re-check interval
+- One kept-alive lease per process instead of a long fixed lease per slot
+
+Dependencies:
+- etcd3 (the client is passed in)
+
+Usage:
+    from utils.etcd_semaphore import EtcdSemaphore
+
+    semaphore = EtcdSemaphore(etcd3.client(), limit=5)
+    with semaphore.slot('billboard.com'):
+        ...  # at most 5 holders of 'billboard.com' across all processes
+
+"""
+
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = '/crawler/semaphores/'
+DEFAULT_TTL = 30
+# Re-check even without a watch event, in case an event was missed
+DEFAULT_RECHECK_INTERVAL = 10.0
+
+
+class EtcdSemaphore:
+    """Named counting semaphores stored as leased keys under ``prefix/<name>/``."""
+
+    def __init__(self, client: Any, limit: int, prefix: str = DEFAULT_PREFIX,
+                 ttl: int = DEFAULT_TTL, recheck_interval: float = DEFAULT_RECHECK_INTERVAL):
+        """
+        Args:
+            client: An ``etcd3`` client.
+            limit (int): Maximum number of concurrent holders per name.
+            prefix (str): Key prefix of all semaphores.
+            ttl (int): Lease TTL in seconds; the lease is refreshed every ``ttl / 3``.
+            recheck_interval (float): Longest a waiter sleeps without a watch event.
+        """
+        self.client = client
+        self.limit = limit
+        self.prefix = prefix
+        self.ttl = ttl
+        self.recheck_interval = recheck_interval
+        self._lease = None
+        self._lease_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._keepalive = None
+
+    def _current_lease(self) -> Any:
+        """Return the shared lease, granting it and starting its keepalive thread if needed."""
+        with self._lease_lock:
+            if self._lease is None:
+                self._lease = self.client.lease(self.ttl)
+                if self._keepalive is None or not self._keepalive.is_alive():
+                    self._stop.clear()
+                    self._keepalive = threading.Thread(target=self._refresh_lease, daemon=True,
+                                                       name='etcd-semaphore-keepalive')
+                    self._keepalive.start()
+            return self._lease
+
+    def _drop_lease(self, lease: Any) -> None:
+        """Forget ``lease`` if it is still the shared one, so the next acquire grants a new one."""
+        with self._lease_lock:
+            if self._lease is lease:
+                self._lease = None
+
+    def _refresh_lease(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            with self._lease_lock:
+                lease = self._lease
+            if lease is None:
+                continue
+            try:
+                responses = lease.refresh()
+            except Exception as e:
+                # etcd is unreachable (or the lease is gone); grant a new one on next acquire
+                logger.warning(f"Could not refresh etcd lease: {e}")
+                self._drop_lease(lease)
+                continue
+            # Refreshing an expired lease does not raise; etcd answers with a TTL <= 0
+            if any(getattr(response, 'TTL', 1) <= 0 for response in responses or ()):
+                logger.warning("etcd lease expired; granting a new one on next acquire")
+                self._drop_lease(lease)
+
+    def _holder_keys(self, name: str) -> list:
+        """Return the keys waiting on or holding ``name``, oldest first."""
+        entries = self.client.get_prefix(f"{self.prefix}{name}/", keys_only=True)
+        ordered = sorted(entries, key=lambda entry: entry[1].create_revision)
+        return [metadata.key.decode() if isinstance(metadata.key, bytes) else metadata.key
+                for _, metadata in ordered]
+
+    def _register(self, name: str) -> str:
+        """Write this waiter's key exactly once and return it."""
+        key = f"{self.prefix}{name}/{uuid.uuid4().hex}"
+        for attempt in range(2):
+            lease = self._current_lease()
+            try:
+                succeeded, _ = self.client.transaction(
+                    compare=[self.client.transactions.create(key) == 0],
+                    success=[self.client.transactions.put(key, '', lease)],
+                    failure=[],
+                )
+                break
+            except Exception as e:
+                # The lease expired before the keepalive thread noticed (e.g. the process
+                # was suspended for longer than the TTL); grant a new one and retry once
+                if attempt or 'lease not found' not in str(e).lower():
+                    raise
+                self._drop_lease(lease)
+        if not succeeded:
+            raise RuntimeError(f"etcd semaphore key {key} already exists")
+        return key
+
+    def acquire(self, name: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for a slot of ``name``.
+
+        Args:
+            name (str): The semaphore name, e.g. a domain.
+            timeout (float, optional): Seconds to wait before giving up; None waits forever.
+
+        Returns:
+            Optional[str]: The key holding the slot (pass it to ``release``), or None on timeout.
+        """
+        key = self._register(name)
+        changed = threading.Event()
+        watch_id = self.client.add_watch_prefix_callback(f"{self.prefix}{name}/",
+                                                         lambda _event: changed.set())
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                # Clear before reading, so a release after the read still wakes us
+                changed.clear()
+                holders = self._holder_keys(name)
+                if key not in holders:
+                    # Our lease expired while waiting; queue up again at the back
+                    key = self._register(name)
+                    continue
+                if holders.index(key) < self.limit:
+                    return key
+                wait = self.recheck_interval
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.client.delete(key)
+                        return None
+                    wait = min(wait, remaining)
+                logger.debug(f"Semaphore {name} full, waiting for a slot")
+                changed.wait(wait)
+        except BaseException:
+            self.client.delete(key)
+            raise
+        finally:
+            self.client.cancel_watch(watch_id)
+
+    def release(self, key: Optional[str]) -> None:
+        """Give up the slot held by ``key``; waiters are woken by the deletion."""
+        if key:
+            self.client.delete(key)
+
+    @contextmanager
+    def slot(self, name: str) -> Iterator[None]:
+        """Hold a slot of ``name`` for the duration of the block."""
+        key = self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def close(self) -> None:
+        """Stop the keepalive thread and revoke the lease, freeing every slot still held."""
+        self._stop.set()
+        with self._lease_lock:
+            lease, self._lease = self._lease, None
+        if lease is not None:
+            try:
+                lease.revoke()
+            except Exception as e:
+                logger.warning(f"Could not revoke etcd lease: {e}")
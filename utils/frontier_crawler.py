@@ -0,0 +1,308 @@
+"""
+frontier_crawler.py
+
+A breadth-first, link-following crawler built on top of PageCrawler.
+
+Features:
+- Breadth-first crawl from seed URLs with depth and page budgets
+- URL canonicalization (case, default ports, fragments, tracking parameters, query order)
+- Compact Bloom-filter deduplication, so million-URL frontiers fit in a few MiB
+- robots.txt fetched once per host and cached
+- Page records are streamed as they are fetched instead of being held in memory
+
+Dependencies:
+- requests (through the PageCrawler passed in)
+
+Usage:
+    from utils.page_crawler import PageCrawler
+    from utils.frontier_crawler import FrontierCrawler
+
+    frontier = FrontierCrawler(PageCrawler(), max_depth=2, max_pages=200)
+    for record in frontier.crawl(['https://www.billboard.com/']):
+        print(record['depth'], record['url'], record['error'] or record['title'])
+
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref_src')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    Normalize a URL so that equivalent spellings dedupe to the same string.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking query
+    parameters, sorts the remaining parameters and gives empty paths a ``/``.
+
+    Args:
+        url (str): An absolute URL.
+
+    Returns:
+        Optional[str]: The canonical URL, or None if it is not an http(s) URL.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def site_of(url: str) -> str:
+    """Return the host of ``url`` without a leading ``www.``, used to scope a crawl."""
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set of strings.
+
+    Membership tests never give false negatives; false positives happen at roughly
+    ``error_rate`` once ``capacity`` items were added. One million URLs at a 0.1%
+    error rate take about 1.8 MiB.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        """
+        Args:
+            capacity (int): Expected number of items.
+            error_rate (float): Target false positive rate at ``capacity``.
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """
+        Add ``item`` to the filter.
+
+        Returns:
+            bool: True if the item was (probably) not present before.
+        """
+        with self._lock:
+            added = False
+            for pos in self._positions(item):
+                mask = 1 << (pos & 7)
+                if not self._bits[pos >> 3] & mask:
+                    self._bits[pos >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+            return added
+
+
+class RobotsCache:
+    """
+    Per-host cache of parsed robots.txt files.
+
+    Follows RFC 9309: a missing robots.txt (4xx) allows everything, while an
+    unreachable one (5xx or network error) disallows the whole host until the
+    entry expires.
+    """
+
+    def __init__(self, session, user_agent: str = '*', ttl: float = 24 * 3600,
+                 timeout: Any = (5.0, 10.0)):
+        """
+        Args:
+            session (requests.Session): Session used to download robots.txt.
+            user_agent (str): User agent token matched against robots.txt groups.
+            ttl (float): Seconds a robots.txt stays cached.
+            timeout: Timeout passed to ``session.get``.
+        """
+        self.session = session
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._parsers: Dict[str, Any] = {}
+
+    def _load(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self.session.get(parser.url, timeout=self.timeout)
+            status = response.status_code
+        except Exception:
+            status = 503
+        if status >= 500:
+            parser.disallow_all = True
+        elif status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        parser.modified()
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        """Return True if robots.txt of the URL's host permits fetching it."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            parser = self._parsers.get(origin)
+        if parser is None or time.time() - parser.mtime() > self.ttl:
+            parser = self._load(origin)
+            with self._lock:
+                self._parsers[origin] = parser
+        return parser.can_fetch(self.user_agent, url)
+
+
+class FrontierCrawler:
+    """
+    Breadth-first crawler that follows links from seed pages.
+
+    Each depth level is fetched concurrently through ``PageCrawler.crawl_many``, so
+    its global and per-host concurrency caps and timeouts apply. Only the next
+    level's URLs are kept in memory, and the page budget bounds that list.
+    """
+
+    def __init__(
+        self,
+        crawler,
+        max_depth: int = 1,
+        max_pages: int = 100,
+        max_pages_per_site: Optional[int] = None,
+        same_site: bool = True,
+        respect_robots: bool = True,
+        bloom_capacity: int = 1_000_000,
+        bloom_error_rate: float = 0.001,
+    ):
+        """
+        Args:
+            crawler (PageCrawler): Crawler used to fetch and parse pages.
+            max_depth (int): Link hops to follow from the seeds; 0 crawls only the seeds.
+            max_pages (int): Maximum number of pages fetched in total.
+            max_pages_per_site (int, optional): Maximum number of pages fetched per site.
+            same_site (bool): Only follow links to the sites of the seed URLs.
+            respect_robots (bool): Skip URLs disallowed by robots.txt.
+            bloom_capacity (int): Expected number of distinct URLs seen.
+            bloom_error_rate (float): Bloom filter false positive rate; a false positive
+                means a URL is skipped as already seen.
+        """
+        self.crawler = crawler
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_pages_per_site = max_pages_per_site
+        self.same_site = same_site
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.seen: Optional[BloomFilter] = None
+        self.robots = (
+            RobotsCache(crawler.session, user_agent='*', timeout=crawler.timeout)
+            if respect_robots else None
+        )
+
+    def crawl(
+        self,
+        seeds: Iterable[str],
+        guard: Optional[Callable[[str], ContextManager]] = None,
+        skip: Optional[Callable[[str], bool]] = None,
+        budget: Optional[Callable[[str], bool]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Crawl breadth-first from ``seeds`` and yield one record per fetched page.
+
+        Args:
+            seeds (Iterable[str]): Start URLs (depth 0).
+            guard (Callable[[str], ContextManager], optional): Passed to ``crawl_many``.
+            skip (Callable[[str], bool], optional): Called with each canonical link found;
+                links it returns True for are not fetched (seeds are always fetched).
+            budget (Callable[[str], bool], optional): Called with each link the frontier
+                accepts (same site, not seen, allowed, within the page caps), just before
+                it is queued; links it returns False for are not fetched. Unlike ``skip``,
+                it only sees links that would otherwise be fetched, so it can count them.
+
+        Yields:
+            Dict[str, Any]: ``{'url', 'depth', 'title', 'text', 'error', 'not_modified'}``.
+            ``title`` and ``text`` are None for failed or not-modified pages; links of
+            a not-modified page are not followed.
+        """
+        # Every crawl starts with an empty frontier
+        self.seen = seen = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        sites = set()
+        site_counts: Dict[str, int] = {}
+        enqueued = 0
+
+        def admit(url: str, charge: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+            nonlocal enqueued
+            canonical = canonicalize_url(url)
+            if canonical is None or enqueued >= self.max_pages:
+                return None
+            site = site_of(canonical)
+            if self.same_site and sites and site not in sites:
+                return None
+            if self.max_pages_per_site and site_counts.get(site, 0) >= self.max_pages_per_site:
+                return None
+            if canonical in seen:
+                return None
+            if self.robots is not None and not self.robots.allowed(canonical):
+                return None
+            if charge is not None and not charge(canonical):
+                return None
+            seen.add(canonical)
+            site_counts[site] = site_counts.get(site, 0) + 1
+            enqueued += 1
+            return canonical
+
+        seeds = list(seeds)
+        for seed in seeds:
+            canonical = canonicalize_url(seed)
+            if canonical:
+                sites.add(site_of(canonical))
+        level = [url for url in map(admit, seeds) if url]
+
+        depth = 0
+        while level:
+            follow = depth < self.max_depth
+            next_level: List[str] = []
+            for result in self.crawler.crawl_many(level, guard=guard, extract_links=follow):
+                data = result['data'] or {}
+                yield {
+                    'url': result['url'],
+                    'depth': depth,
+                    'title': data.get('title'),
+                    'text': data.get('text'),
+                    'error': result['error'],
+                    'not_modified': result['not_modified'],
+                }
+                for link in data.get('links', ()):
+                    if skip is not None:
+                        canonical = canonicalize_url(link)
+                        if canonical is None or skip(canonical):
+                            continue
+                    url = admit(link, budget)
+                    if url:
+                        next_level.append(url)
+            level = next_level
+            depth += 1
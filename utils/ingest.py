@@ -0,0 +1,276 @@
+"""
+ingest.py
+
+Chunking and batched embedding of crawled pages for the vector store.
+
+Embedding models such as all-MiniLM-L6-v2 truncate their input (256 word pieces),
+so a whole page embedded as one vector loses almost all of its text. This module
+splits every page into overlapping windows of a configurable token size, embeds
+all chunks of all pages in large batches and writes them with bulk ``add`` calls.
+
+Window boundaries are content-defined: a window ends where the hash of the last
+few tokens hits an anchor value (within a minimum and maximum length), not at a
+fixed token count. Text inserted near the top of a page (the usual change on a
+news homepage) therefore only moves the boundaries next to it, and every later
+window keeps its exact text. Chunk ids are derived from that text, so an
+unchanged window keeps its id and hash wherever it moved on the page.
+
+Re-ingestion is incremental: every chunk's content hash is stored next to its
+vector, so only new or changed chunks are embedded and upserted and chunks that
+disappeared from a page are deleted. A refresh costs time proportional to what
+changed, not to the size of the corpus.
+
+Features:
+- Content-defined, overlapping windows measured in model tokens (or whitespace words)
+- Content-derived chunk ids and ``doc_id``/``chunk``/``hash`` metadata per chunk
+- One batched ``encode`` call and one bulk ``collection.add`` per ingestion
+- Incremental ``sync_documents`` that embeds only new or changed chunks
+
+Dependencies:
+- None (works with any embedder exposing ``encode`` and any Chroma-like collection)
+
+Usage:
+    from utils.ingest import build_chunks, embed_and_add
+
+    chunks = build_chunks({'billboard.com': text}, chunk_tokens=200, overlap=40,
+                          tokenizer=embedder.tokenizer)
+    embed_and_add(collection, embedder, chunks, batch_size=64)
+
+    # Or, on every refresh, only embed what changed since the last one
+    stats = sync_documents(collection, embedder, {'billboard.com': text})
+
+"""
+
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+DEFAULT_CHUNK_TOKENS = 200
+DEFAULT_CHUNK_OVERLAP = 40
+DEFAULT_BATCH_SIZE = 64
+# Chroma rejects adds above its max batch size (a few thousand records on SQLite)
+DEFAULT_ADD_BATCH_SIZE = 5000
+
+_WORD = re.compile(r'\S+')
+# Tokens hashed to decide whether a window may end after them
+ANCHOR_TOKENS = 3
+
+
+def token_spans(text: str, tokenizer: Optional[Any] = None) -> List[Tuple[int, int]]:
+    """
+    Return the character span of every token in ``text``.
+
+    Args:
+        text (str): The text to tokenize.
+        tokenizer (optional): A Hugging Face fast tokenizer (e.g.
+            ``SentenceTransformer.tokenizer``). Without one, whitespace-separated
+            words are used as tokens.
+
+    Returns:
+        List[Tuple[int, int]]: ``(start, end)`` offsets into ``text``.
+    """
+    if tokenizer is not None and getattr(tokenizer, 'is_fast', False):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                             verbose=False)
+        return [(start, end) for start, end in encoding['offset_mapping'] if end > start]
+    return [match.span() for match in _WORD.finditer(text)]
+
+
+def chunk_text(text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+               overlap: int = DEFAULT_CHUNK_OVERLAP, tokenizer: Optional[Any] = None) -> List[str]:
+    """
+    Split ``text`` into overlapping windows of at most ``chunk_tokens`` tokens.
+
+    Each window starts with between two fifths of and all ``chunk_tokens - overlap``
+    tokens of its own, followed by the first ``overlap`` tokens of the next window. Its
+    own tokens end at the first anchor in that range: a position where the CRC-32 of
+    the preceding ``ANCHOR_TOKENS`` tokens is divisible by two fifths of the range's
+    width. Only without an anchor (or when the range is too narrow to hold anchors) is
+    the window cut at its maximum length. Boundaries thus depend on the nearby text, and
+    an edit only changes the windows around it: inserting text at the top of a page
+    re-embeds about two windows. Windows average about two thirds of ``chunk_tokens``.
+
+    Args:
+        text (str): The text to split.
+        chunk_tokens (int): Tokens per chunk. Keep this below the model's maximum
+            sequence length minus its special tokens.
+        overlap (int): Tokens shared by consecutive chunks.
+        tokenizer (optional): See ``token_spans``.
+
+    Returns:
+        List[str]: The chunks, in document order. Empty text gives no chunks.
+
+    Raises:
+        ValueError: If ``overlap`` is not smaller than ``chunk_tokens``.
+    """
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError("overlap must be >= 0 and smaller than chunk_tokens")
+    spans = token_spans(text, tokenizer)
+    chunks = []
+    step = chunk_tokens - overlap
+    min_step = max(1, step * 2 // 5)
+    divisor = (step - min_step) * 2 // 5
+    start = 0
+    while start < len(spans):
+        end = min(start + step, len(spans))
+        for boundary in range(start + min_step, end) if divisor > 1 else ():
+            anchor = text[spans[max(0, boundary - ANCHOR_TOKENS)][0]:spans[boundary - 1][1]]
+            if zlib.crc32(anchor.encode('utf-8')) % divisor == 0:
+                end = boundary
+                break
+        window = spans[start:end + overlap]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if end + overlap >= len(spans):
+            break
+        start = end
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest identifying the content of a chunk."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_id(doc_id: str, digest: str, occurrence: int = 0) -> str:
+    """
+    Return the vector store id of the chunk of ``doc_id`` with content hash ``digest``.
+
+    ``occurrence`` numbers repeats of the same text within one document.
+    """
+    suffix = f"-{occurrence}" if occurrence else ''
+    return f"{doc_id}#{digest[:16]}{suffix}"
+
+
+def build_chunks(documents: Union[Dict[str, str], Iterable[Tuple[str, str]]],
+                 chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                 tokenizer: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    Chunk every document.
+
+    Args:
+        documents: Mapping (or pairs) of doc id to text.
+        chunk_tokens (int): Tokens per chunk.
+        overlap (int): Tokens shared by consecutive chunks.
+        tokenizer (optional): See ``token_spans``.
+
+    Returns:
+        List[Dict[str, Any]]: One ``{'id', 'text', 'metadata'}`` record per chunk, where
+        ``metadata`` is ``{'doc_id': ..., 'chunk': index, 'hash': content hash}``. The
+        ``chunk`` index is the chunk's position when it was embedded; an unchanged
+        chunk is not rewritten when text before it moves it.
+    """
+    items = documents.items() if isinstance(documents, dict) else documents
+    chunks = []
+    for doc_id, text in items:
+        occurrences: Dict[str, int] = {}
+        for index, chunk in enumerate(chunk_text(text or '', chunk_tokens, overlap, tokenizer)):
+            digest = content_hash(chunk)
+            occurrence = occurrences.get(digest, 0)
+            occurrences[digest] = occurrence + 1
+            chunks.append({
+                'id': chunk_id(doc_id, digest, occurrence),
+                'text': chunk,
+                'metadata': {'doc_id': doc_id, 'chunk': index, 'hash': digest},
+            })
+    return chunks
+
+
+def embed_chunks(embedder: Any, chunks: List[Dict[str, Any]],
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> List[List[float]]:
+    """Encode the text of all ``chunks`` with batched ``embedder.encode`` calls."""
+    if not chunks:
+        return []
+    vectors = embedder.encode([c['text'] for c in chunks], batch_size=batch_size,
+                              show_progress_bar=False)
+    return vectors.tolist()
+
+
+def embed_and_add(collection: Any, embedder: Any, chunks: List[Dict[str, Any]],
+                  batch_size: int = DEFAULT_BATCH_SIZE,
+                  add_batch_size: int = DEFAULT_ADD_BATCH_SIZE) -> int:
+    """
+    Embed ``chunks`` in batches and bulk-add them to ``collection``.
+
+    Args:
+        collection: A Chroma collection (or anything with the same ``add`` signature).
+        embedder: A SentenceTransformer (or anything with the same ``encode`` signature).
+        chunks (List[Dict[str, Any]]): Records from ``build_chunks``.
+        batch_size (int): Texts per forward pass of the embedding model.
+        add_batch_size (int): Records per ``collection.add`` call.
+
+    Returns:
+        int: The number of chunks added.
+    """
+    embeddings = embed_chunks(embedder, chunks, batch_size)
+    for start in range(0, len(chunks), add_batch_size):
+        batch = chunks[start:start + add_batch_size]
+        collection.add(
+            ids=[c['id'] for c in batch],
+            documents=[c['text'] for c in batch],
+            metadatas=[c['metadata'] for c in batch],
+            embeddings=embeddings[start:start + add_batch_size],
+        )
+    return len(chunks)
+
+
+def stored_hashes(collection: Any, doc_ids: List[str]) -> Dict[str, str]:
+    """Return ``{chunk id: content hash}`` of every stored chunk of ``doc_ids``."""
+    if not doc_ids:
+        return {}
+    stored = collection.get(where={'doc_id': {'$in': list(doc_ids)}}, include=['metadatas'])
+    return {
+        chunk: (metadata or {}).get('hash')
+        for chunk, metadata in zip(stored['ids'], stored['metadatas'])
+    }
+
+
+def sync_documents(collection: Any, embedder: Any,
+                   documents: Union[Dict[str, str], Iterable[Tuple[str, str]]],
+                   chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                   tokenizer: Optional[Any] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                   add_batch_size: int = DEFAULT_ADD_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Bring the stored chunks of ``documents`` in line with their current text.
+
+    Chunks whose id and content hash are already stored are left alone. New or
+    changed chunks are embedded in batches and upserted, and stored chunks of these
+    documents that no longer exist are deleted. Documents not passed in are untouched.
+
+    Args:
+        collection: A Chroma collection (``get``/``upsert``/``delete``).
+        embedder: A SentenceTransformer (or anything with the same ``encode`` signature).
+        documents: Mapping (or pairs) of doc id to its current text.
+        chunk_tokens (int): Tokens per chunk.
+        overlap (int): Tokens shared by consecutive chunks.
+        tokenizer (optional): See ``token_spans``.
+        batch_size (int): Texts per forward pass of the embedding model.
+        add_batch_size (int): Records per ``collection.upsert`` call.
+
+    Returns:
+        Dict[str, int]: Counts of ``upserted``, ``unchanged`` and ``deleted`` chunks.
+    """
+    documents = dict(documents)
+    chunks = build_chunks(documents, chunk_tokens, overlap, tokenizer)
+    stored = stored_hashes(collection, list(documents))
+
+    changed = [c for c in chunks if stored.get(c['id']) != c['metadata']['hash']]
+    current_ids = {c['id'] for c in chunks}
+    vanished = [chunk for chunk in stored if chunk not in current_ids]
+
+    embeddings = embed_chunks(embedder, changed, batch_size)
+    for start in range(0, len(changed), add_batch_size):
+        batch = changed[start:start + add_batch_size]
+        collection.upsert(
+            ids=[c['id'] for c in batch],
+            documents=[c['text'] for c in batch],
+            metadatas=[c['metadata'] for c in batch],
+            embeddings=embeddings[start:start + add_batch_size],
+        )
+    if vanished:
+        collection.delete(ids=vanished)
+    return {
+        'upserted': len(changed),
+        'unchanged': len(chunks) - len(changed),
+        'deleted': len(vanished),
+    }
@@ -0,0 +1,519 @@
+"""
+numpy_index.py
+
+In-process cosine-similarity vector index on NumPy, usable in place of a Chroma collection.
+
+The CAG only needs top-k cosine search over a few thousand MiniLM vectors, which a
+single matrix multiplication answers in well under a millisecond. ``NumpyIndex``
+stores the normalized vectors in one contiguous ``float16`` (or ``int8``) matrix
+and implements the part of the Chroma collection API the repo uses (``add``,
+``upsert``, ``get``, ``delete``, ``query``, ``count``), so it can stand behind
+``query_context`` and ``ingest.sync_documents`` unchanged without chromadb.
+
+An ``int8`` index keeps one float32 scale per row (the row's largest absolute
+component over 127), so every vector uses the full int8 range: a unit vector of
+384 components rarely has one above 0.3, and a fixed scale would leave it only a
+few dozen levels. Queries decode ``block_size`` rows at a time, so scoring never
+holds more than one float32 block next to the stored matrix.
+
+The index is saved as a single file: a JSON header (ids, documents, metadata)
+followed by the raw matrix (and the int8 row scales), so loading memory-maps the vectors instead of
+reading and parsing them. For larger corpora an optional inverted-file (IVF)
+mode clusters the vectors with spherical k-means and searches only the
+``n_probe`` clusters nearest to each query.
+
+Features:
+- Contiguous ``float16``/``int8``/``float32`` storage of L2-normalized vectors,
+  with per-row scales for ``int8``
+- Batched brute-force top-k with block-wise matrix multiplication
+- Optional IVF coarse partitioning (``build_ivf``)
+- Chroma-style ``where`` filters on metadata (equality, ``$eq``, ``$ne``, ``$in``, ``$nin``)
+- Single-file save with memory-mapped load
+
+Dependencies:
+- numpy
+
+Usage:
+    from utils.numpy_index import NumpyIndex, open_index
+
+    index = NumpyIndex(dtype='float16')
+    index.add(ids=['a#0'], embeddings=[vector], documents=['text'], metadatas=[{'doc_id': 'a'}])
+    index.query(query_embeddings=[query_vector], n_results=4)
+    index.save('fresh/chroma_db/music_freshness.npvi')
+
+    # Drop-in collection opener for vector_store.LazyCollection
+    collection = LazyCollection('music_freshness', 'fresh/chroma_db', opener=open_index)
+
+"""
+
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b'NPVI1\n'
+# The matrix starts on this boundary so it can be memory-mapped efficiently
+ALIGNMENT = 64
+DTYPES = ('float16', 'int8', 'float32')
+INT8_MAX = 127
+# Legacy int8 files (saved without row scales) were quantized with this fixed scale
+LEGACY_INT8_SCALE = 1.0 / INT8_MAX
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_INCLUDE = ('metadatas', 'documents')
+QUERY_INCLUDE = ('metadatas', 'documents', 'distances')
+
+
+def _normalize(vectors: Any) -> np.ndarray:
+    """Return ``vectors`` as a 2-D float32 array of unit rows (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def matches(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Return whether ``metadata`` satisfies a Chroma-style ``where`` filter.
+
+    Raises:
+        ValueError: For logical (``$and``/``$or``) or unknown operators.
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+    for field, condition in where.items():
+        if field.startswith('$'):
+            raise ValueError(f"Unsupported where operator: {field}")
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, operand in condition.items():
+            if op == '$eq':
+                ok = value == operand
+            elif op == '$ne':
+                ok = value != operand
+            elif op == '$in':
+                ok = value in operand
+            elif op == '$nin':
+                ok = value not in operand
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+            if not ok:
+                return False
+    return True
+
+
+class NumpyIndex:
+    """A Chroma-like collection backed by one contiguous NumPy matrix."""
+
+    def __init__(self, dtype: str = 'float16', path: Optional[str] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        Args:
+            dtype (str): Storage type of the vectors: ``float16``, ``int8`` or ``float32``.
+            path (str, optional): File ``flush`` saves to.
+            block_size (int): Rows decoded and scored per matrix multiplication.
+
+        Raises:
+            ValueError: If ``dtype`` is not supported.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.dtype = dtype
+        self.path = path
+        self.block_size = block_size
+        self.dimension: Optional[int] = None
+        self.n_probe = 1
+        self._matrix: Optional[np.ndarray] = None
+        # Per-row dequantization scales, int8 only
+        self._scales: Optional[np.ndarray] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    # -- storage ---------------------------------------------------------
+
+    def _encode(self, vectors: np.ndarray):
+        """Return ``(rows, scales)`` to store for ``vectors``; ``scales`` is None unless int8."""
+        if self.dtype != 'int8':
+            return vectors.astype(self.dtype), None
+        scales = np.abs(vectors).max(axis=1) / INT8_MAX
+        scales[scales == 0] = 1.0
+        rows = np.clip(np.rint(vectors / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+        return rows, scales.astype(np.float32)
+
+    def _decode(self, rows: Any) -> np.ndarray:
+        """Return the stored vectors of ``rows`` (a slice or row indices) as float32."""
+        block = self._matrix[rows].astype(np.float32)
+        if self.dtype == 'int8':
+            block *= self._scales[rows][:, None]
+        return block
+
+    def _reserve(self, extra: int) -> None:
+        """Make room for ``extra`` more rows, copying a memory-mapped matrix into memory."""
+        needed = self._size + extra
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed <= capacity and not isinstance(self._matrix, np.memmap):
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        matrix = np.zeros((capacity, self.dimension), dtype=self.dtype)
+        scales = np.ones(capacity, dtype=np.float32) if self.dtype == 'int8' else None
+        assignments = np.zeros(capacity, dtype=np.int32)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+            if scales is not None:
+                scales[:self._size] = self._scales[:self._size]
+            if self._assignments is not None:
+                assignments[:self._size] = self._assignments[:self._size]
+        self._matrix = matrix
+        self._scales = scales
+        if self._centroids is not None:
+            self._assignments = assignments
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _write(self, ids: List[str], embeddings: Any, documents: Optional[List[str]],
+               metadatas: Optional[List[Dict[str, Any]]], overwrite: bool) -> None:
+        if not ids:
+            return
+        vectors = _normalize(embeddings)
+        if len(vectors) != len(ids):
+            raise ValueError("ids and embeddings must have the same length")
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}")
+            self._reserve(len(ids))
+            rows, selected = [], []
+            for i, id_ in enumerate(ids):
+                row = self._rows.get(id_)
+                if row is None:
+                    row = self._size
+                    self._rows[id_] = row
+                    self._ids.append(id_)
+                    self._documents.append(None)
+                    self._metadatas.append(None)
+                    self._size += 1
+                elif not overwrite:
+                    # Like Chroma, adding an existing id leaves it untouched
+                    continue
+                self._documents[row] = documents[i] if documents is not None else None
+                self._metadatas[row] = metadatas[i] if metadatas is not None else None
+                rows.append(row)
+                selected.append(i)
+            if rows:
+                encoded, scales = self._encode(vectors[selected])
+                self._matrix[rows] = encoded
+                if scales is not None:
+                    self._scales[rows] = scales
+                if self._centroids is not None:
+                    self._assignments[rows] = self._nearest_centroids(vectors[selected])
+                self._dirty = True
+
+    def add(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Add records; ids that already exist are left unchanged."""
+        self._write(list(ids), embeddings, documents, metadatas, overwrite=False)
+
+    def upsert(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Add records, replacing the ones whose id already exists."""
+        self._write(list(ids), embeddings, documents, metadatas, overwrite=True)
+
+    def _select(self, ids: Optional[Iterable[str]], where: Optional[Dict[str, Any]]) -> List[int]:
+        if ids is None:
+            rows = range(self._size)
+        else:
+            rows = [self._rows[id_] for id_ in ids if id_ in self._rows]
+        return [row for row in rows if matches(self._metadatas[row], where)]
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete records by id and/or ``where`` filter, keeping the matrix contiguous."""
+        if ids is None and where is None:
+            return
+        with self._lock:
+            rows = self._select(ids, where)
+            if not rows:
+                return
+            self._reserve(0)
+            # Fill each hole with the last row; going from the end keeps rows still to delete in place
+            for row in sorted(rows, reverse=True):
+                last = self._size - 1
+                del self._rows[self._ids[row]]
+                if row != last:
+                    self._matrix[row] = self._matrix[last]
+                    if self._scales is not None:
+                        self._scales[row] = self._scales[last]
+                    if self._assignments is not None:
+                        self._assignments[row] = self._assignments[last]
+                    self._ids[row] = self._ids[last]
+                    self._documents[row] = self._documents[last]
+                    self._metadatas[row] = self._metadatas[last]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._documents.pop()
+                self._metadatas.pop()
+                self._size -= 1
+            self._dirty = True
+
+    # -- reads -----------------------------------------------------------
+
+    def count(self) -> int:
+        """Return the number of records."""
+        return self._size
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: int = 0,
+            include: Iterable[str] = DEFAULT_INCLUDE) -> Dict[str, Any]:
+        """Return records by id and/or ``where`` filter, in Chroma's ``get`` result shape."""
+        with self._lock:
+            rows = self._select(ids, where)
+            rows = rows[offset:offset + limit if limit is not None else None]
+            result = {'ids': [self._ids[row] for row in rows]}
+            if 'documents' in include:
+                result['documents'] = [self._documents[row] for row in rows]
+            if 'metadatas' in include:
+                result['metadatas'] = [self._metadatas[row] for row in rows]
+            if 'embeddings' in include:
+                result['embeddings'] = self._decode(rows) if rows else np.zeros((0, 0))
+            return result
+
+    def _top_k(self, queries: np.ndarray, rows: Optional[np.ndarray], k: int):
+        """Return ``(rows, scores)`` of the ``k`` best rows per query, best first."""
+        total = self._size if rows is None else len(rows)
+        k = min(k, total)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        if k == 0:
+            return best_rows, best_scores
+        for start in range(0, total, self.block_size):
+            end = min(start + self.block_size, total)
+            if rows is None:
+                block_rows = np.arange(start, end)
+                scores = queries @ self._decode(slice(start, end)).T
+            else:
+                block_rows = rows[start:end]
+                scores = queries @ self._decode(block_rows).T
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, scores.shape)], axis=1)
+            candidate_scores = np.concatenate([best_scores, scores], axis=1)
+            if candidate_scores.shape[1] > k:
+                top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+                candidate_rows = np.take_along_axis(candidate_rows, top, axis=1)
+                candidate_scores = np.take_along_axis(candidate_scores, top, axis=1)
+            best_rows, best_scores = candidate_rows, candidate_scores
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def query(self, query_embeddings: Any, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = QUERY_INCLUDE, n_probe: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Return the ``n_results`` most cosine-similar records for every query vector.
+
+        Args:
+            query_embeddings: One vector or a list of vectors.
+            n_results (int): Results per query.
+            where (dict, optional): Metadata filter, see ``matches``.
+            include: Any of ``documents``, ``metadatas``, ``distances``.
+            n_probe (int, optional): Clusters searched per query in IVF mode
+                (defaults to ``self.n_probe``); ignored without ``build_ivf``.
+
+        Returns:
+            Dict[str, Any]: Chroma's query result shape, one inner list per query.
+            ``distances`` are cosine distances (``1 - similarity``).
+        """
+        queries = _normalize(query_embeddings)
+        with self._lock:
+            rows = None
+            if where:
+                rows = np.array(self._select(None, where), dtype=np.int64)
+            if self._centroids is None or self._size == 0:
+                found = [self._top_k(queries, rows, n_results)]
+                per_query = [(found[0][0][i], found[0][1][i]) for i in range(len(queries))]
+            else:
+                per_query = []
+                probes = min(n_probe or self.n_probe, len(self._centroids))
+                nearest = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :probes]
+                assignments = self._assignments[:self._size]
+                for query, clusters in zip(queries, nearest):
+                    candidates = np.flatnonzero(np.isin(assignments, clusters))
+                    if rows is not None:
+                        candidates = np.intersect1d(candidates, rows)
+                    found_rows, found_scores = self._top_k(query[None, :], candidates, n_results)
+                    per_query.append((found_rows[0], found_scores[0]))
+            result = {'ids': [[self._ids[row] for row in found] for found, _ in per_query]}
+            if 'documents' in include:
+                result['documents'] = [[self._documents[row] for row in found] for found, _ in per_query]
+            if 'metadatas' in include:
+                result['metadatas'] = [[self._metadatas[row] for row in found] for found, _ in per_query]
+            if 'distances' in include:
+                result['distances'] = [(1.0 - scores).tolist() for _, scores in per_query]
+            return result
+
+    # -- IVF -------------------------------------------------------------
+
+    def build_ivf(self, n_lists: Optional[int] = None, n_probe: Optional[int] = None,
+                  iterations: int = 10, sample_size: int = 100000, seed: int = 0) -> None:
+        """
+        Partition the vectors into ``n_lists`` clusters with spherical k-means.
+
+        Later queries only score the vectors in the ``n_probe`` clusters nearest to
+        the query, trading a little recall for speed. Vectors added afterwards are
+        assigned to their nearest cluster.
+
+        Args:
+            n_lists (int, optional): Number of clusters; defaults to ``sqrt(count)``.
+            n_probe (int, optional): Clusters searched per query; defaults to ``n_lists / 8``.
+            iterations (int): k-means iterations.
+            sample_size (int): Vectors sampled to train the clusters.
+            seed (int): Random seed.
+        """
+        with self._lock:
+            if self._size == 0:
+                return
+            n_lists = min(n_lists or max(1, int(np.sqrt(self._size))), self._size)
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(self._size, min(sample_size, self._size), replace=False))
+            sample = self._decode(sample_rows)
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for cluster in range(n_lists):
+                    members = sample[labels == cluster]
+                    if len(members):
+                        centroids[cluster] = members.mean(axis=0)
+                centroids = _normalize(centroids)
+            self._centroids = centroids
+            self._assignments = np.zeros(self._matrix.shape[0], dtype=np.int32)
+            for start in range(0, self._size, self.block_size):
+                end = min(start + self.block_size, self._size)
+                self._assignments[start:end] = self._nearest_centroids(self._decode(slice(start, end)))
+            self.n_probe = n_probe or max(1, n_lists // 8)
+            self._dirty = True
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Atomically write the index to ``path`` (default ``self.path``) as a single file."""
+        path = path or self.path
+        with self._lock:
+            header = {
+                'dtype': self.dtype,
+                'dimension': self.dimension,
+                'count': self._size,
+                'ids': self._ids,
+                'documents': self._documents,
+                'metadatas': self._metadatas,
+                'n_lists': 0 if self._centroids is None else len(self._centroids),
+                'n_probe': self.n_probe,
+                'row_scales': self._scales is not None,
+            }
+            encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            start = len(MAGIC) + 8 + len(encoded)
+            padding = -start % ALIGNMENT
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(MAGIC)
+                f.write(struct.pack('<Q', len(encoded)))
+                f.write(encoded)
+                f.write(b'\0' * padding)
+                if self._size:
+                    f.write(np.ascontiguousarray(self._matrix[:self._size]).tobytes())
+                    if self._scales is not None:
+                        f.write(self._scales[:self._size].astype(np.float32).tobytes())
+                if self._centroids is not None:
+                    f.write(self._centroids.astype(np.float32).tobytes())
+                    f.write(self._assignments[:self._size].astype(np.int32).tobytes())
+            os.replace(tmp_path, path)
+            if path == self.path:
+                self._dirty = False
+
+    def flush(self) -> None:
+        """Save to ``self.path`` if it is set and anything changed since the last save."""
+        if self.path and self._dirty:
+            self.save()
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'NumpyIndex':
+        """
+        Load an index written by ``save``.
+
+        Args:
+            path (str): The index file.
+            mmap (bool): Memory-map the vectors (read-only until the first write)
+                instead of reading them into memory.
+
+        Raises:
+            ValueError: If the file is not a saved index.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a NumpyIndex file")
+            (length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length))
+        index = cls(dtype=header['dtype'], path=path)
+        index.dimension = header['dimension']
+        index.n_probe = header['n_probe']
+        index._ids = header['ids']
+        index._documents = header['documents']
+        index._metadatas = header['metadatas']
+        index._rows = {id_: row for row, id_ in enumerate(index._ids)}
+        index._size = count = header['count']
+        offset = len(MAGIC) + 8 + length
+        offset += -offset % ALIGNMENT
+        if count:
+            shape = (count, index.dimension)
+            if mmap:
+                index._matrix = np.memmap(path, dtype=index.dtype, mode='r', offset=offset, shape=shape)
+            else:
+                index._matrix = np.fromfile(path, dtype=index.dtype, count=count * index.dimension,
+                                            offset=offset).reshape(shape)
+            offset += count * index.dimension * np.dtype(index.dtype).itemsize
+            if header.get('row_scales'):
+                index._scales = np.fromfile(path, dtype=np.float32, count=count, offset=offset)
+                offset += index._scales.nbytes
+            elif index.dtype == 'int8':
+                index._scales = np.full(count, LEGACY_INT8_SCALE, dtype=np.float32)
+        if header['n_lists']:
+            n_lists = header['n_lists']
+            index._centroids = np.fromfile(path, dtype=np.float32, count=n_lists * index.dimension,
+                                           offset=offset).reshape(n_lists, index.dimension)
+            offset += index._centroids.nbytes
+            index._assignments = np.fromfile(path, dtype=np.int32, count=count, offset=offset)
+        return index
+
+
+def open_index(name: str, persist_dir: Optional[str] = None, dtype: str = 'float16') -> NumpyIndex:
+    """
+    Open (or create) the index ``name``, with the same signature as ``vector_store.open_collection``.
+
+    Args:
+        name (str): The index name; it is stored as ``<persist_dir>/<name>.npvi``.
+        persist_dir (str, optional): Directory of the index file. When empty or None,
+            the index lives in memory only.
+        dtype (str): Storage type for a new index.
+
+    Returns:
+        NumpyIndex: The loaded (memory-mapped) or new index.
+    """
+    if not persist_dir:
+        return NumpyIndex(dtype=dtype)
+    path = os.path.join(persist_dir, f"{name}.npvi")
+    if os.path.exists(path):
+        return NumpyIndex.load(path)
+    return NumpyIndex(dtype=dtype, path=path)
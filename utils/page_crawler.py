@@ -5,77 +5,693 @@ A simple web page crawler that fetches a URL, parses its content using Beautiful
 and stores the extracted data in a JSON file.
 
 Features:
-- Fetches HTML content from a given URL
-- Parses the page title and all text content
+- Fetches HTML content from a given URL over a pooled HTTP session
+- Connect and read timeouts so a slow site cannot hang a crawl worker
+- Streaming downloads with a byte cap and a content-type check; pages are parsed
+  incrementally as bytes arrive, so peak memory stays bounded regardless of page size
+- Optional on-disk validator cache (ETag, Last-Modified, content hash) so unchanged
+  pages are reported as "not modified" instead of being downloaded and parsed again
+- Concurrent crawling of many URLs with global and per-host concurrency caps
+- Parses the page title and all visible text content, skipping script, style,
+  noscript and template elements
+- Pluggable parser backends: lxml (C-accelerated, used automatically when installed)
+  or BeautifulSoup's pure-Python html.parser
 - Stores the results in a JSON file
 
 Dependencies:
 - requests
 - beautifulsoup4
+- lxml (optional, faster parsing)
 
 Usage:
     from utils.page_crawler import PageCrawler
     crawler = PageCrawler()
     crawler.crawl_and_save('https://example.com', 'output.json')
 
+    # Skip pages that have not changed since the previous crawl
+    crawler = PageCrawler(cache_path='crawl_cache.json')
+    if not crawler.crawl_and_save('https://example.com', 'output.json'):
+        print('not modified')
+
+    # Force a specific parser backend
+    crawler = PageCrawler(parser='html.parser')
+
+    # Crawl many pages concurrently, results arrive as they complete
+    for result in crawler.crawl_many(['https://example.com', 'https://example.org']):
+        print(result['url'], result['error'] or result['data']['title'])
+
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+import codecs
+import hashlib
 import json
-from typing import Dict, Any
+import logging
+import os
+import threading
+import time
+from html.parser import HTMLParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, ContextManager, Iterable, Iterator, List, Optional
+from urllib.parse import urljoin, urlparse
+
+try:
+    import lxml.html
+    import lxml.etree
+except ImportError:  # pragma: no cover - lxml is optional
+    lxml = None
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/122.0.0.0 Safari/537.36'
+    )
+}
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text is never rendered on the page
+NON_VISIBLE_TAGS = ('script', 'style', 'noscript', 'template')
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+class UnsupportedContentType(requests.RequestException):
+    """Raised when a response is not HTML and so is not worth downloading."""
+
+
+class CrawlCancelled(Exception):
+    """Raised inside a crawl that ``crawl_many`` abandoned at its deadline."""
+
+
+def _join_strings(strings: Iterable[str]) -> str:
+    """Join text nodes the way BeautifulSoup's ``stripped_strings`` does."""
+    return ' '.join(s for s in (s.strip() for s in strings) if s)
+
+
+def parse_with_html_parser(html: str) -> Dict[str, Any]:
+    """Parse with BeautifulSoup and the pure-Python ``html.parser``."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(NON_VISIBLE_TAGS):
+        tag.decompose()
+    title = soup.title.string if soup.title and soup.title.string else ''
+    return {
+        'title': str(title).strip(),
+        'text': _join_strings(soup.stripped_strings)
+    }
+
+
+def parse_with_lxml(html: str) -> Dict[str, Any]:
+    """Parse with lxml's C HTML parser, without building a BeautifulSoup tree."""
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except lxml.etree.ParserError:
+        # Raised for empty documents
+        return {'title': '', 'text': ''}
+    for element in list(root.iter(*NON_VISIBLE_TAGS)):
+        # drop_tree keeps the element's tail text, which is visible
+        element.drop_tree()
+    title_element = root.find('.//title')
+    title = title_element.text if title_element is not None and title_element.text else ''
+    return {
+        'title': title.strip(),
+        'text': _join_strings(root.itertext())
+    }
+
+
+# Parser backends by name; each maps HTML to {'title': ..., 'text': ...}
+PARSER_BACKENDS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    'html.parser': parse_with_html_parser,
+}
+if lxml is not None:
+    PARSER_BACKENDS['lxml'] = parse_with_lxml
+
+
+class VisibleTextCollector:
+    """
+    Builds the ``{'title': ..., 'text': ...}`` result from a stream of parser events.
+
+    No document tree is kept: text nodes are stripped and appended as soon as a tag
+    or comment ends them, and text inside ``NON_VISIBLE_TAGS`` is discarded. With
+    ``collect_links`` the raw ``href`` of every anchor is returned under ``links``.
+    """
+
+    def __init__(self, collect_links: bool = False):
+        self._links: Optional[List[str]] = [] if collect_links else None
+        self._parts: List[str] = []
+        self._pending: List[str] = []
+        self._title: Optional[str] = None
+        self._in_title = False
+        self._hidden_depth = 0
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        text = ''.join(self._pending).strip()
+        self._pending = []
+        if text:
+            self._parts.append(text)
+            if self._in_title and self._title is None:
+                self._title = text
+
+    def start(self, tag: str, attrib=None) -> None:
+        self._flush()
+        if tag == 'a' and self._links is not None and attrib and attrib.get('href'):
+            self._links.append(attrib['href'])
+        if tag in NON_VISIBLE_TAGS:
+            self._hidden_depth += 1
+        elif tag == 'title':
+            self._in_title = True
+
+    def end(self, tag: str) -> None:
+        self._flush()
+        if tag in NON_VISIBLE_TAGS:
+            self._hidden_depth = max(self._hidden_depth - 1, 0)
+        elif tag == 'title':
+            self._in_title = False
+
+    def data(self, text: str) -> None:
+        if not self._hidden_depth:
+            self._pending.append(text)
+
+    def comment(self, text: str) -> None:
+        self._flush()
+
+    def close(self) -> Dict[str, Any]:
+        self._flush()
+        result = {'title': self._title or '', 'text': ' '.join(self._parts)}
+        if self._links is not None:
+            result['links'] = self._links
+        return result
+
+
+class _StdlibStreamParser(HTMLParser):
+    """Incremental pure-Python parser feeding a ``VisibleTextCollector``."""
+
+    def __init__(self, collect_links: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.collector = VisibleTextCollector(collect_links)
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def handle_comment(self, data):
+        self.collector.comment(data)
+
+    def close(self) -> Dict[str, Any]:
+        super().close()
+        return self.collector.close()
+
+
+def stream_with_html_parser(collect_links: bool = False) -> Any:
+    """Return an incremental parser built on the standard library ``html.parser``."""
+    return _StdlibStreamParser(collect_links)
+
+
+class _LxmlStreamParser:
+    """Incremental lxml parser feeding a ``VisibleTextCollector``."""
+
+    def __init__(self, collect_links: bool = False):
+        self._collector = VisibleTextCollector(collect_links)
+        self._parser = lxml.etree.HTMLParser(target=self._collector)
+        self._fed = False
+
+    def feed(self, data: str) -> None:
+        self._fed = True
+        self._parser.feed(data)
+
+    def close(self) -> Dict[str, Any]:
+        if not self._fed:
+            # lxml raises on close when nothing was fed
+            return self._collector.close()
+        return self._parser.close()
+
+
+def stream_with_lxml(collect_links: bool = False) -> Any:
+    """Return an incremental parser built on lxml's C HTML parser."""
+    return _LxmlStreamParser(collect_links)
+
+
+# Incremental parser factories by backend name. Each takes ``collect_links`` and
+# returns a parser with ``feed(str)`` and ``close() -> {'title': ..., 'text': ...}``
+# (plus ``links`` when collecting). Backends without one are parsed from a buffered
+# (size capped) document instead.
+STREAM_PARSERS: Dict[str, Callable[..., Any]] = {
+    'html.parser': stream_with_html_parser,
+}
+if lxml is not None:
+    STREAM_PARSERS['lxml'] = stream_with_lxml
+
+
+def register_parser(name: str, parse: Callable[[str], Dict[str, Any]],
+                    stream_factory: Optional[Callable[..., Any]] = None) -> None:
+    """
+    Register a parser backend usable as ``PageCrawler(parser=name)``.
+
+    Args:
+        name (str): The backend name.
+        parse (Callable[[str], Dict[str, Any]]): Function mapping HTML to a dictionary
+            with ``title`` and ``text`` keys.
+        stream_factory (Callable[..., Any], optional): Factory taking ``collect_links``
+            and returning an incremental parser with ``feed(str)`` and ``close()``
+            returning the same dictionary.
+    """
+    PARSER_BACKENDS[name] = parse
+    if stream_factory is not None:
+        STREAM_PARSERS[name] = stream_factory
+
+
+def default_parser() -> str:
+    """Return the fastest parser backend available in this environment."""
+    return 'lxml' if 'lxml' in PARSER_BACKENDS else 'html.parser'
+
+
+class ValidatorCache:
+    """
+    On-disk cache of HTTP validators per URL.
+
+    For every URL it remembers the ``ETag`` and ``Last-Modified`` response headers
+    and a SHA-256 hash of the body, so the next fetch can be made conditional and a
+    page that comes back byte-identical can still be recognised as unchanged.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The JSON file the cache is loaded from and flushed to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, Dict[str, Optional[str]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                # A corrupt cache only costs one full crawl
+                self._entries = {}
+
+    def get(self, url: str) -> Optional[Dict[str, Optional[str]]]:
+        """Return the cached validators for ``url``, or None if it was never fetched."""
+        with self._lock:
+            return self._entries.get(url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build ``If-None-Match``/``If-Modified-Since`` headers for ``url``."""
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url: str, etag: Optional[str], last_modified: Optional[str],
+               content_hash: Optional[str]) -> None:
+        """Record the validators of the latest response for ``url``."""
+        with self._lock:
+            self._entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_hash': content_hash,
+            }
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Atomically write the cache to disk if it changed since the last flush."""
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
 
 class PageCrawler:
     """
     A simple web page crawler that fetches a URL, parses its content using BeautifulSoup,
     and stores the extracted data in a JSON file.
+
+    All requests go through one shared ``requests.Session`` so connections are reused
+    across pages and worker threads.
     """
 
-    def fetch_page(self, url: str) -> str:
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        session: Optional[requests.Session] = None,
+        cache_path: Optional[str] = None,
+        parser: str = 'auto',
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        allowed_content_types: Optional[Iterable[str]] = HTML_CONTENT_TYPES,
+    ):
+        """
+        Args:
+            connect_timeout (float): Seconds to wait for a TCP connection.
+            read_timeout (float): Seconds to wait between bytes of the response.
+            max_workers (int): Default global concurrency for ``crawl_many``.
+            per_host_limit (int): Default number of concurrent requests per host.
+            session (requests.Session, optional): Session to use instead of a new pooled one.
+            cache_path (str, optional): Path of a ``ValidatorCache`` file. When set, fetches
+                are conditional and unchanged pages are reported as not modified.
+            parser (str): Name of a backend in ``PARSER_BACKENDS``, or ``'auto'`` to use
+                lxml when it is installed and ``html.parser`` otherwise.
+            max_bytes (int): Maximum number of body bytes read per page. Longer bodies
+                are truncated and the prefix is parsed.
+            chunk_size (int): Bytes read from the socket per iteration.
+            allowed_content_types (Iterable[str], optional): Accepted response MIME types;
+                None accepts anything. Responses without a Content-Type are accepted.
+
+        Raises:
+            ValueError: If ``parser`` is not a known backend.
+        """
+        if parser == 'auto':
+            parser = default_parser()
+        if parser not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend {parser!r}; available: {sorted(PARSER_BACKENDS)}")
+        self.parser = parser
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.allowed_content_types = (
+            tuple(allowed_content_types) if allowed_content_types is not None else None
+        )
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.session = session or self._build_session(max_workers)
+        self.cache = ValidatorCache(cache_path) if cache_path else None
+        # Orders cancelling a crawl against its validator cache update
+        self._cancel_lock = threading.Lock()
+
+    @staticmethod
+    def _build_session(pool_size: int) -> requests.Session:
+        """Create a session whose connection pool can serve ``pool_size`` threads."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(DEFAULT_HEADERS)
+        return session
+
+    def _open(self, url: str) -> Optional[requests.Response]:
+        """
+        Send a (conditional) streaming GET and validate the response headers.
+
+        Returns:
+            Optional[requests.Response]: The open response, or None on ``304 Not Modified``.
+
+        Raises:
+            requests.RequestException: If the request fails or times out.
+            UnsupportedContentType: If the response is not an accepted content type.
+        """
+        headers = self.cache.conditional_headers(url) if self.cache is not None else None
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        if response.status_code == 304 and self.cache is not None:
+            response.close()
+            return None
+        response.raise_for_status()
+        mime_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if mime_type and self.allowed_content_types and mime_type not in self.allowed_content_types:
+            response.close()
+            raise UnsupportedContentType(f"{url} has unsupported content type {mime_type!r}",
+                                         response=response)
+        return response
+
+    @staticmethod
+    def _encoding(response: requests.Response) -> str:
+        """Return the declared charset of ``response``, defaulting to UTF-8."""
+        if 'charset=' in response.headers.get('Content-Type', '').lower() and response.encoding:
+            try:
+                return codecs.lookup(response.encoding).name
+            except LookupError:
+                pass
+        return 'utf-8'
+
+    def _read(self, url: str, response: requests.Response, sink: Callable[[str], Any],
+              cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Stream the body of ``response`` into ``sink`` as decoded text.
+
+        At most ``max_bytes`` are read; the connection is closed as soon as the cap is
+        reached, so an endpoint that never stops sending cannot exhaust memory.
+
+        Returns:
+            bool: False if a validator cache is configured and the body hash is unchanged.
+
+        Raises:
+            CrawlCancelled: If ``cancel`` is set before the body is fully read and recorded;
+                the validator cache is then left untouched.
+        """
+        digest = hashlib.sha256()
+        decoder = codecs.getincrementaldecoder(self._encoding(response))(errors='replace')
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if cancel is not None and cancel.is_set():
+                    raise CrawlCancelled(url)
+                remaining = self.max_bytes - received
+                if len(chunk) > remaining:
+                    chunk = chunk[:remaining]
+                    logger.warning("Truncating %s at %d bytes", url, self.max_bytes)
+                received += len(chunk)
+                digest.update(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    sink(text)
+                if received >= self.max_bytes:
+                    break
+            text = decoder.decode(b'', final=True)
+            if text:
+                sink(text)
+        finally:
+            response.close()
+
+        if self.cache is None:
+            return True
+        content_hash = digest.hexdigest()
+        with self._cancel_lock:
+            # An abandoned crawl's result is dropped, so it must not mark the page as seen
+            if cancel is not None and cancel.is_set():
+                raise CrawlCancelled(url)
+            previous = self.cache.get(url) or {}
+            self.cache.update(url, response.headers.get('ETag'),
+                              response.headers.get('Last-Modified'), content_hash)
+        return previous.get('content_hash') != content_hash
+
+    def fetch_page(self, url: str, cancel: Optional[threading.Event] = None) -> Optional[str]:
         """
         Fetch the HTML content of the given URL.
 
+        The body is streamed and capped at ``max_bytes``.
+
         Args:
             url (str): The URL to fetch.
+            cancel (threading.Event, optional): Stops the download, without updating the
+                validator cache, once set.
 
         Returns:
-            str: The HTML content of the page.
+            Optional[str]: The HTML content of the page, or None if a validator cache is
+            configured and the page is unchanged since it was last fetched (either a
+            ``304 Not Modified`` response or a body with the same content hash).
 
         Raises:
-            requests.RequestException: If the request fails.
+            requests.RequestException: If the request fails or times out.
+            UnsupportedContentType: If the response is not an accepted content type.
         Note:
             Some websites may block requests with the default user agent. This method sets a common browser User-Agent header to improve compatibility.
         """
-        headers = {
-            'User-Agent': (
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/122.0.0.0 Safari/537.36'
-            )
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.text
+        response = self._open(url)
+        if response is None:
+            return None
+        parts: List[str] = []
+        if not self._read(url, response, parts.append, cancel):
+            return None
+        return ''.join(parts)
 
     def parse_content(self, html: str) -> Dict[str, Any]:
         """
-        Parse the HTML content using BeautifulSoup and extract useful information.
+        Parse the HTML content with the configured backend and extract useful information.
 
         Args:
             html (str): The HTML content to parse.
 
         Returns:
             Dict[str, Any]: A dictionary containing the page title and all visible text.
+            Text inside script, style, noscript and template elements is dropped.
+        """
+        return PARSER_BACKENDS[self.parser](html)
+
+    def crawl(self, url: str, extract_links: bool = False,
+              cancel: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and parse a single web page.
+
+        Args:
+            url (str): The URL to crawl.
+            extract_links (bool): Also return the absolute URLs of all anchors on the
+                page under ``links``.
+            cancel (threading.Event, optional): Passed to ``fetch_page``.
+
+        When the parser backend supports it, the page is parsed incrementally as bytes
+        arrive, so neither the raw HTML nor a document tree is ever held in memory.
+
+        Returns:
+            Optional[Dict[str, Any]]: The parsed page, as returned by ``parse_content``,
+            or None if the page is not modified (parsing is skipped).
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        title = soup.title.string if soup.title else ''
-        # Extract all visible text
-        texts = soup.stripped_strings
-        visible_text = ' '.join(texts)
-        return {
-            'title': title,
-            'text': visible_text
-        }
+        stream_factory = STREAM_PARSERS.get(self.parser)
+        if stream_factory is None:
+            html = self.fetch_page(url, cancel)
+            if html is None:
+                return None
+            data = self.parse_content(html)
+            if extract_links:
+                link_parser = stream_with_html_parser(collect_links=True)
+                link_parser.feed(html)
+                data['links'] = link_parser.close()['links']
+        else:
+            response = self._open(url)
+            if response is None:
+                return None
+            parser = stream_factory(collect_links=extract_links)
+            if not self._read(url, response, parser.feed, cancel):
+                return None
+            data = parser.close()
+        if extract_links:
+            data['links'] = [urljoin(url, href.strip()) for href in data['links']]
+        return data
+
+    def flush_cache(self) -> None:
+        """Persist the validator cache, if one is configured."""
+        if self.cache is not None:
+            self.cache.flush()
+
+    def crawl_many(
+        self,
+        urls: Iterable[str],
+        max_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        guard: Optional[Callable[[str], ContextManager]] = None,
+        extract_links: bool = False,
+        stop_when: Optional[Callable[[], bool]] = None,
+        deadline: Optional[float] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Crawl many URLs concurrently and yield results as they complete.
+
+        At most ``max_workers`` requests are in flight overall and at most
+        ``per_host_limit`` of them target the same host. URLs waiting on a busy
+        host do not occupy a worker thread.
+
+        Once ``stop_when`` returns True no further URLs are started; crawls already
+        in flight still complete and are yielded. At ``deadline`` the crawl stops
+        waiting as well: crawls still in flight (waiting on ``guard`` or fetching) are
+        abandoned to their worker threads and not yielded. They are cancelled, so
+        they stop downloading and leave the validator cache untouched, and a later
+        crawl fetches them in full. URLs that were never started or were abandoned get
+        no result, so callers can tell them apart by the URLs they did see.
+
+        Args:
+            urls (Iterable[str]): The URLs to crawl.
+            max_workers (int, optional): Global concurrency cap. Defaults to ``self.max_workers``.
+            per_host_limit (int, optional): Per-host concurrency cap. Defaults to ``self.per_host_limit``.
+            guard (Callable[[str], ContextManager], optional): Factory returning a context
+                manager held around each crawl, e.g. a distributed per-domain slot.
+            extract_links (bool): Passed through to ``crawl``.
+            stop_when (Callable[[], bool], optional): Checked before starting each URL,
+                e.g. against a deadline.
+            deadline (float, optional): ``time.monotonic()`` value after which no
+                URL is started and in-flight crawls are no longer waited for.
+
+        Yields:
+            Dict[str, Any]: ``{'url': url, 'data': parsed page or None, 'error': message or None,
+            'not_modified': bool}``. ``not_modified`` is True when the validator cache
+            reported the page unchanged; ``data`` is None in that case.
+        """
+        max_workers = max_workers or self.max_workers
+        per_host_limit = per_host_limit or self.per_host_limit
+        pending = deque(urls)
+        in_flight = {}
+        host_counts: Dict[str, int] = {}
+
+        cancel = threading.Event()
+
+        def run(url: str) -> Dict[str, Any]:
+            with guard(url) if guard else nullcontext():
+                return self.crawl(url, extract_links=extract_links, cancel=cancel)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        abandoned = False
+        try:
+            while pending or in_flight:
+                if pending and ((stop_when is not None and stop_when())
+                                or (deadline is not None and time.monotonic() >= deadline)):
+                    pending.clear()
+                    if not in_flight:
+                        break
+                # Submit every pending URL whose host still has capacity
+                deferred = deque()
+                while pending and len(in_flight) < max_workers:
+                    url = pending.popleft()
+                    host = urlparse(url).netloc.lower()
+                    if host_counts.get(host, 0) >= per_host_limit:
+                        deferred.append(url)
+                        continue
+                    host_counts[host] = host_counts.get(host, 0) + 1
+                    in_flight[executor.submit(run, url)] = (url, host)
+                pending.extendleft(reversed(deferred))
+
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Deadline reached: stop waiting and leave the in-flight crawls unreported
+                    abandoned = True
+                    with self._cancel_lock:
+                        cancel.set()
+                    logger.warning("Abandoning %d in-flight crawls at the deadline", len(in_flight))
+                    break
+                for future in done:
+                    url, host = in_flight.pop(future)
+                    host_counts[host] -= 1
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        yield {'url': url, 'data': None, 'error': str(e), 'not_modified': False}
+                        continue
+                    yield {'url': url, 'data': data, 'error': None, 'not_modified': data is None}
+        finally:
+            executor.shutdown(wait=not abandoned, cancel_futures=abandoned)
+        self.flush_cache()
 
     def save_to_json(self, data: Dict[str, Any], filename: str) -> None:
         """
@@ -88,14 +704,21 @@ class PageCrawler:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
 
-    def crawl_and_save(self, url: str, output_file: str) -> None:
+    def crawl_and_save(self, url: str, output_file: str) -> bool:
         """
         Fetch a web page, parse its content, and save the results to a JSON file.
 
         Args:
             url (str): The URL to crawl.
             output_file (str): The path to the output JSON file.
+
+        Returns:
+            bool: True if the page was saved, False if it was not modified and the
+            existing output file was left untouched.
         """
-        html = self.fetch_page(url)
-        data = self.parse_content(html)
-        self.save_to_json(data, output_file) 
\ No newline at end of file
+        data = self.crawl(url)
+        self.flush_cache()
+        if data is None:
+            return False
+        self.save_to_json(data, output_file)
+        return True
@@ -0,0 +1,232 @@
+"""
+pipeline.py
+
+Staged producer/consumer pipeline with bounded queues and per-stage statistics.
+
+Running crawl, embedding and indexing one after another leaves the CPU idle while
+pages download and the network idle while pages embed. A ``Pipeline`` connects
+stages with bounded queues instead: every stage has its own thread pool, consumes
+items from the queue before it as soon as they are produced, and blocks when the
+queue after it is full. Slow stages therefore throttle fast ones, and memory is
+bounded by the queue sizes rather than by the size of the crawl.
+
+Features:
+- One thread pool per stage (``workers``) and one bounded input queue per stage
+- Optional micro-batching (``batch_size``) for stages that are cheaper in bulk,
+  such as embedding
+- Fan-out stages whose function returns many items per input (e.g. chunking)
+- Per-stage counts, errors, busy time, throughput and queue-depth statistics
+- A failing item is counted and logged and does not stop the pipeline
+
+Dependencies:
+- None (standard library only)
+
+Usage:
+    from utils.pipeline import Pipeline
+
+    pipeline = Pipeline()
+    pipeline.add_stage('chunk', chunk_page, workers=2, fan_out=True)
+    pipeline.add_stage('embed', embed_batch, workers=1, batch_size=64)
+    pipeline.add_stage('index', upsert_batch, workers=1)
+    stats = pipeline.run(crawled_pages)
+    print(Pipeline.format_stats(stats))
+
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+# A batching stage processes a partial batch after waiting this long for more items
+DEFAULT_BATCH_TIMEOUT = 0.5
+
+_DONE = object()
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int, queue_size: int,
+                 batch_size: Optional[int], batch_timeout: float, fan_out: bool):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.fan_out = fan_out
+        self.inbox: 'queue.Queue[Any]' = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.calls = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.depth_max = 0
+        self.finished = 0
+
+    def put(self, item: Any) -> None:
+        self.inbox.put(item)
+        depth = self.inbox.qsize()
+        with self.lock:
+            self.depth_sum += depth
+            self.depth_samples += 1
+            self.depth_max = max(self.depth_max, depth)
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'errors': self.errors,
+            'busy_s': self.busy_s,
+            'throughput': self.items_in / elapsed if elapsed else 0.0,
+            'queue_mean': self.depth_sum / self.depth_samples if self.depth_samples else 0.0,
+            'queue_max': self.depth_max,
+        }
+
+
+class Pipeline:
+    """Stages connected by bounded queues, each served by its own worker threads."""
+
+    def __init__(self):
+        self._stages: List[_Stage] = []
+
+    def add_stage(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                  queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: Optional[int] = None,
+                  batch_timeout: float = DEFAULT_BATCH_TIMEOUT, fan_out: bool = False) -> 'Pipeline':
+        """
+        Append a stage.
+
+        Args:
+            name (str): Stage name used in the statistics.
+            func (Callable): Called with one item (or, with ``batch_size``, a list of up to
+                ``batch_size`` items). Its result is passed to the next stage; None drops it.
+            workers (int): Threads running ``func``.
+            queue_size (int): Capacity of the stage's input queue.
+            batch_size (int, optional): Collect items into lists of this size.
+            batch_timeout (float): Seconds to wait for a batch to fill before processing it.
+            fan_out (bool): ``func`` returns an iterable whose items are passed on one by one.
+
+        Returns:
+            Pipeline: ``self``, for chaining.
+        """
+        self._stages.append(_Stage(name, func, workers, queue_size, batch_size, batch_timeout, fan_out))
+        return self
+
+    def _emit(self, index: int, result: Any) -> None:
+        stage = self._stages[index]
+        outputs = (result if stage.fan_out else [result]) if result is not None else []
+        following = self._stages[index + 1] if index + 1 < len(self._stages) else None
+        for output in outputs:
+            with stage.lock:
+                stage.items_out += 1
+            if following is not None:
+                following.put(output)
+
+    def _process(self, index: int, payload: Any, count: int) -> None:
+        stage = self._stages[index]
+        start = time.perf_counter()
+        try:
+            result = stage.func(payload)
+            if stage.fan_out and result is not None:
+                result = list(result)
+        except Exception as e:
+            logger.error(f"Stage {stage.name} failed on {count} item(s): {e}")
+            with stage.lock:
+                stage.errors += count
+            return
+        finally:
+            with stage.lock:
+                stage.busy_s += time.perf_counter() - start
+                stage.items_in += count
+                stage.calls += 1
+        self._emit(index, result)
+
+    def _worker(self, index: int) -> None:
+        stage = self._stages[index]
+        batch: List[Any] = []
+        while True:
+            try:
+                timeout = stage.batch_timeout if batch else None
+                item = stage.inbox.get(timeout=timeout)
+            except queue.Empty:
+                self._process(index, batch, len(batch))
+                batch = []
+                continue
+            if item is _DONE:
+                break
+            if stage.batch_size is None:
+                self._process(index, item, 1)
+                continue
+            batch.append(item)
+            if len(batch) >= stage.batch_size:
+                self._process(index, batch, len(batch))
+                batch = []
+        if batch:
+            self._process(index, batch, len(batch))
+        with stage.lock:
+            stage.finished += 1
+            last = stage.finished == stage.workers
+        if last and index + 1 < len(self._stages):
+            following = self._stages[index + 1]
+            for _ in range(following.workers):
+                following.inbox.put(_DONE)
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Feed every item of ``source`` through all stages and wait until they are drained.
+
+        ``source`` is consumed in the calling thread, so a generator that does its own
+        concurrent work (such as a crawler) overlaps with the stages.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Statistics per stage, with ``source`` first.
+        """
+        if not self._stages:
+            raise ValueError("Pipeline has no stages")
+        threads = [
+            threading.Thread(target=self._worker, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self._stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        produced = 0
+        first = self._stages[0]
+        try:
+            for item in source:
+                produced += 1
+                first.put(item)
+        finally:
+            for _ in range(first.workers):
+                first.inbox.put(_DONE)
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        stats = {'source': {'items_out': produced, 'elapsed_s': elapsed,
+                            'throughput': produced / elapsed if elapsed else 0.0}}
+        for stage in self._stages:
+            stats[stage.name] = stage.stats(elapsed)
+        return stats
+
+    @staticmethod
+    def format_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+        """Render ``run`` statistics as a table."""
+        lines = [f"{'stage':<10} {'workers':>7} {'in':>7} {'out':>7} {'errors':>6} "
+                 f"{'busy s':>8} {'items/s':>8} {'queue avg':>9} {'queue max':>9}"]
+        source = stats.get('source', {})
+        lines.append(f"{'source':<10} {'':>7} {'':>7} {source.get('items_out', 0):>7} {'':>6} "
+                     f"{source.get('elapsed_s', 0.0):>8.2f} {source.get('throughput', 0.0):>8.1f}")
+        for name, stage in stats.items():
+            if name == 'source':
+                continue
+            lines.append(f"{name:<10} {stage['workers']:>7} {stage['items_in']:>7} {stage['items_out']:>7} "
+                         f"{stage['errors']:>6} {stage['busy_s']:>8.2f} {stage['throughput']:>8.1f} "
+                         f"{stage['queue_mean']:>9.1f} {stage['queue_max']:>9}")
+        return "\n".join(lines)
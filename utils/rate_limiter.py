@@ -0,0 +1,226 @@
+"""
+rate_limiter.py
+
+Per-domain request-rate limiting with token buckets.
+
+Capping concurrent crawls per domain does not cap how fast they hit a site. Each
+domain here gets a token bucket that refills at ``rate`` tokens per second up to
+``burst``; every request spends one token and waits when the bucket is empty.
+
+Two backends share that interface:
+
+- ``LocalRateLimiter`` keeps the buckets in memory, for single-node runs and tests.
+- ``EtcdRateLimiter`` keeps one bucket per domain in etcd, shared by all workers.
+  Workers take tokens from it in batches of ``batch_size`` with a compare-and-swap
+  transaction and spend them locally, so etcd sees one round trip per batch rather
+  than one per request. Unspent tokens of a batch expire after ``batch_size / rate``
+  seconds, which keeps idle workers from hoarding them and bursting later.
+
+Features:
+- Token buckets with a sustained rate and a burst size, per domain
+- Batched, race-free token grants from etcd (optimistic concurrency on mod revision)
+- Local counting between grants
+- Blocking ``acquire`` and a ``slot`` context manager matching the crawl lock backends
+
+Dependencies:
+- etcd3 (only for ``EtcdRateLimiter``; the client is passed in)
+
+Usage:
+    from utils.rate_limiter import EtcdRateLimiter, LocalRateLimiter
+
+    limiter = LocalRateLimiter(rate=2.0, burst=5)
+    limiter.acquire('billboard.com')  # returns once a request may be sent
+
+    shared = EtcdRateLimiter(etcd3.client(), rate=2.0, burst=5, batch_size=5)
+    with shared.slot('billboard.com'):
+        ...
+
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+DEFAULT_PREFIX = '/crawler/rate/'
+
+
+def take_tokens(tokens: float, updated: float, now: float, rate: float, burst: float,
+                wanted: int) -> Tuple[float, int, float]:
+    """
+    Refill a bucket up to ``now`` and take up to ``wanted`` whole tokens from it.
+
+    Args:
+        tokens (float): Tokens in the bucket at time ``updated``.
+        updated (float): When ``tokens`` was last computed.
+        now (float): The current time.
+        rate (float): Tokens added per second.
+        burst (float): Bucket capacity.
+        wanted (int): Maximum number of tokens to take.
+
+    Returns:
+        Tuple[float, int, float]: Tokens left, tokens granted, and the seconds until
+        a token will be available if none was granted (0.0 otherwise).
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    granted = min(wanted, int(tokens))
+    if granted:
+        return tokens - granted, granted, 0.0
+    return tokens, 0, (1.0 - tokens) / rate
+
+
+class LocalRateLimiter:
+    """Token buckets per domain, in this process only."""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate (float): Sustained requests per second per domain.
+            burst (int): Requests allowed back to back after an idle period.
+            clock (Callable, optional): Time source.
+            sleep (Callable, optional): Used to wait for tokens.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def try_acquire(self, domain: str) -> float:
+        """Take a token for ``domain`` if one is available; return 0.0, or the seconds to wait."""
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._buckets.get(domain, (self.burst, now))
+            tokens, _, wait = take_tokens(tokens, updated, now, self.rate, self.burst, 1)
+            self._buckets[domain] = (tokens, now)
+            return wait
+
+    def acquire(self, domain: str, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a request to ``domain`` is allowed.
+
+        Args:
+            domain (str): The domain to spend a token of.
+            timeout (float, optional): Seconds to wait at most; None waits as long as needed.
+
+        Returns:
+            bool: True once a token is spent, False if none is due within ``timeout``.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(domain)
+            if not wait:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+
+    @contextmanager
+    def slot(self, domain: str) -> Iterator[None]:
+        """Wait for a token for ``domain``, then run the block."""
+        self.acquire(domain)
+        yield
+
+
+class EtcdRateLimiter:
+    """Token buckets per domain stored in etcd, handed out to workers in batches."""
+
+    def __init__(self, client: Any, rate: float, burst: int = 1, batch_size: int = 5,
+                 prefix: str = DEFAULT_PREFIX, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            client: An ``etcd3`` client.
+            rate (float): Sustained requests per second per domain, across all workers.
+            burst (int): Bucket capacity per domain.
+            batch_size (int): Tokens taken from etcd per round trip (at most ``burst``).
+            prefix (str): Key prefix of the buckets.
+            clock (Callable, optional): Wall-clock time source, shared by all workers.
+            sleep (Callable, optional): Used to wait for tokens.
+        """
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.batch_size = max(1, min(batch_size, burst))
+        self.prefix = prefix
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._domain_locks: Dict[str, threading.Lock] = {}
+        # domain -> (tokens left in the local batch, when the batch expires)
+        self._local: Dict[str, Tuple[int, float]] = {}
+        self.grants = 0
+
+    def _domain_lock(self, domain: str) -> threading.Lock:
+        with self._lock:
+            return self._domain_locks.setdefault(domain, threading.Lock())
+
+    def _grant(self, domain: str) -> Tuple[int, float]:
+        """Take a batch of tokens from the shared bucket; return ``(granted, wait)``."""
+        key = f"{self.prefix}{domain}"
+        transactions = self.client.transactions
+        while True:
+            value, metadata = self.client.get(key)
+            now = self._clock()
+            if value is None:
+                tokens, updated = float(self.burst), now
+                compare = transactions.create(key) == 0
+            else:
+                state = json.loads(value)
+                tokens, updated = state['tokens'], state['updated']
+                compare = transactions.mod(key) == metadata.mod_revision
+            tokens, granted, wait = take_tokens(tokens, updated, now, self.rate, self.burst,
+                                                self.batch_size)
+            if not granted:
+                return 0, wait
+            state = json.dumps({'tokens': tokens, 'updated': now})
+            succeeded, _ = self.client.transaction(
+                compare=[compare], success=[transactions.put(key, state)], failure=[])
+            if succeeded:
+                self.grants += 1
+                return granted, 0.0
+            # Another worker updated the bucket between our read and write; retry
+
+    def try_acquire(self, domain: str) -> float:
+        """Spend a token for ``domain`` if one is available; return 0.0, or the seconds to wait."""
+        with self._domain_lock(domain):
+            now = self._clock()
+            tokens, expires = self._local.get(domain, (0, now))
+            if tokens and now < expires:
+                self._local[domain] = (tokens - 1, expires)
+                return 0.0
+            granted, wait = self._grant(domain)
+            if not granted:
+                self._local.pop(domain, None)
+                return wait
+            self._local[domain] = (granted - 1, now + self.batch_size / self.rate)
+            return 0.0
+
+    def acquire(self, domain: str, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a request to ``domain`` is allowed.
+
+        Args:
+            domain (str): The domain to spend a token of.
+            timeout (float, optional): Seconds to wait at most; None waits as long as needed.
+
+        Returns:
+            bool: True once a token is spent, False if none is due within ``timeout``.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(domain)
+            if not wait:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+
+    @contextmanager
+    def slot(self, domain: str) -> Iterator[None]:
+        """Wait for a token for ``domain``, then run the block."""
+        self.acquire(domain)
+        yield
@@ -0,0 +1,241 @@
+"""
+recrawl_scheduler.py
+
+Adaptive recrawl scheduling driven by how often each page actually changes.
+
+Crawling every page on every run spends the same fetch, parse and embedding work
+on a homepage that changes hourly and on an article that never changes again.
+``RecrawlScheduler`` keeps a next-due priority queue of URLs instead. After each
+crawl the caller reports whether the page's content changed: a change shortens
+the page's interval (``speedup``), no change lengthens it (``backoff``), always
+within ``[min_interval, max_interval]``. Fast-moving pages converge on short
+intervals and static pages on long ones.
+
+Each call to ``pop_due`` hands out at most ``max_per_cycle`` due URLs and at most
+``max_per_domain`` of them per host, so one busy site cannot take the whole crawl
+budget. Due URLs over budget stay queued and, being the most overdue, come first
+in the next cycle.
+
+Features:
+- ``heapq`` next-due queue with lazy invalidation of rescheduled entries
+- Multiplicative, per-URL interval adaptation from observed content changes
+- Global and per-domain budgets per cycle
+- Per-URL check and change counts, JSON persistence across restarts
+
+Dependencies:
+- None (standard library only)
+
+Usage:
+    from utils.recrawl_scheduler import RecrawlScheduler
+
+    scheduler = RecrawlScheduler(min_interval=300, max_interval=86400, max_per_domain=5,
+                                 path='fresh/recrawl_schedule.json')
+    scheduler.add('https://pitchfork.com/')
+    for url in scheduler.pop_due():
+        changed = crawl(url)
+        scheduler.record(url, changed)
+    scheduler.save()
+
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_MIN_INTERVAL = 300.0
+DEFAULT_MAX_INTERVAL = 86400.0
+DEFAULT_INITIAL_INTERVAL = 3600.0
+DEFAULT_SPEEDUP = 0.5
+DEFAULT_BACKOFF = 1.5
+
+
+def host_of(url: str) -> str:
+    """Return the lowercased host of ``url``."""
+    return (urlsplit(url).hostname or '').lower()
+
+
+class RecrawlScheduler:
+    """Next-due queue of URLs whose recrawl intervals follow their observed change rate."""
+
+    def __init__(self, min_interval: float = DEFAULT_MIN_INTERVAL, max_interval: float = DEFAULT_MAX_INTERVAL,
+                 initial_interval: float = DEFAULT_INITIAL_INTERVAL, speedup: float = DEFAULT_SPEEDUP,
+                 backoff: float = DEFAULT_BACKOFF, max_per_cycle: Optional[int] = None,
+                 max_per_domain: Optional[int] = None, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, domain_of: Callable[[str], str] = host_of):
+        """
+        Args:
+            min_interval (float): Shortest recrawl interval in seconds.
+            max_interval (float): Longest recrawl interval in seconds.
+            initial_interval (float): Interval of a newly added URL.
+            speedup (float): Factor applied to the interval when the page changed.
+            backoff (float): Factor applied to the interval when the page did not change.
+            max_per_cycle (int, optional): URLs handed out per ``pop_due`` call.
+            max_per_domain (int, optional): URLs of one domain handed out per ``pop_due`` call.
+            path (str, optional): JSON file the schedule is loaded from and saved to.
+            clock (Callable[[], float]): Source of the current time.
+            domain_of (Callable[[str], str]): Maps a URL to the domain its budget counts against.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = min(max(initial_interval, min_interval), max_interval)
+        self.speedup = speedup
+        self.backoff = backoff
+        self.max_per_cycle = max_per_cycle
+        self.max_per_domain = max_per_domain
+        self.path = path
+        self.clock = clock
+        self.domain_of = domain_of
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return url in self._pages
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pages)
+
+    def add(self, url: str, due: Optional[float] = None) -> bool:
+        """
+        Schedule ``url`` if it is not scheduled yet.
+
+        Args:
+            url (str): The URL.
+            due (float, optional): When it is first due; defaults to now.
+
+        Returns:
+            bool: True if the URL was added.
+        """
+        with self._lock:
+            if url in self._pages:
+                return False
+            due = self.clock() if due is None else due
+            self._pages[url] = {'interval': self.initial_interval, 'due': due,
+                                'checks': 0, 'changes': 0, 'last_checked': None}
+            heapq.heappush(self._heap, (due, url))
+            return True
+
+    def is_due(self, url: str, now: Optional[float] = None) -> bool:
+        """Return True if ``url`` is unknown (never crawled) or due and not already taken."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            page = self._pages.get(url)
+            return page is None or (page['due'] is not None and page['due'] <= now)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """
+        Take the due URLs, most overdue first, within the cycle budgets.
+
+        Taken URLs leave the queue until ``record`` reschedules them.
+
+        Returns:
+            List[str]: URLs to crawl now.
+        """
+        now = self.clock() if now is None else now
+        taken: List[str] = []
+        deferred: List[Tuple[float, str]] = []
+        per_domain: Dict[str, int] = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                if self.max_per_cycle is not None and len(taken) >= self.max_per_cycle:
+                    break
+                due, url = heapq.heappop(self._heap)
+                page = self._pages.get(url)
+                if page is None or page['due'] != due:
+                    # Superseded by a later record() or already taken
+                    continue
+                domain = self.domain_of(url)
+                if self.max_per_domain is not None and per_domain.get(domain, 0) >= self.max_per_domain:
+                    deferred.append((due, url))
+                    continue
+                per_domain[domain] = per_domain.get(domain, 0) + 1
+                page['due'] = None
+                taken.append(url)
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+        return taken
+
+    def record(self, url: str, changed: Optional[bool], now: Optional[float] = None) -> float:
+        """
+        Reschedule ``url`` after a crawl.
+
+        Args:
+            url (str): The crawled URL (added if it is not scheduled yet).
+            changed (Optional[bool]): Whether the content changed since the last crawl;
+                None (e.g. after an error) keeps the current interval.
+            now (float, optional): Time of the crawl; defaults to now.
+
+        Returns:
+            float: When the URL is due next.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            page = self._pages.setdefault(url, {'interval': self.initial_interval, 'due': None,
+                                                'checks': 0, 'changes': 0, 'last_checked': None})
+            if changed is not None:
+                factor = self.speedup if changed else self.backoff
+                page['interval'] = min(max(page['interval'] * factor, self.min_interval), self.max_interval)
+                page['checks'] += 1
+                page['changes'] += int(changed)
+            page['last_checked'] = now
+            page['due'] = now + page['interval']
+            heapq.heappush(self._heap, (page['due'], url))
+            return page['due']
+
+    def next_due(self) -> Optional[float]:
+        """Return when the earliest queued URL is due, or None if nothing is queued."""
+        with self._lock:
+            while self._heap:
+                due, url = self._heap[0]
+                page = self._pages.get(url)
+                if page is not None and page['due'] == due:
+                    return due
+                heapq.heappop(self._heap)
+            return None
+
+    def page(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the schedule entry of ``url`` (``interval``, ``due``, ``checks``, ``changes``)."""
+        with self._lock:
+            page = self._pages.get(url)
+            return dict(page) if page is not None else None
+
+    def save(self) -> None:
+        """Atomically write the schedule to ``path``."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._pages)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> None:
+        """
+        Load a schedule saved by ``save``; a corrupt file leaves the schedule empty.
+
+        URLs that were taken but never recorded (the process stopped mid-cycle) are due immediately.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = self.clock()
+        with self._lock:
+            for url, page in pages.items():
+                if page.get('due') is None:
+                    page['due'] = now
+                self._pages[url] = page
+                heapq.heappush(self._heap, (page['due'], url))
@@ -0,0 +1,262 @@
+"""
+snapshot_store.py
+
+Versioned embedding snapshots in a pluggable object store.
+
+A crawler running in AWS Lambda keeps its index in the container's ``/tmp``, which
+disappears when the container is recycled, and a query-serving process never sees
+it. Instead, the crawler publishes the index after each sync as a single immutable
+file (a saved ``NumpyIndex``: ids, documents, metadata with content hashes, then
+the raw vector matrix) under a new version, and then moves a small ``LATEST``
+pointer to it. Readers follow the pointer, download the file once into a local
+cache and memory-map it. The next crawler run starts from the same snapshot, so
+the content-hash diff in ``ingest.sync_documents`` only re-embeds changed chunks.
+
+The object store interface is four methods (``put_file``, ``get_file``,
+``put_bytes``/``get_bytes``, ``list``/``delete``), implemented for a local
+directory (tests, single host) and S3.
+
+Features:
+- Immutable, millisecond-versioned snapshot objects plus an atomically replaced ``LATEST`` pointer
+- Old versions pruned after publishing, keeping the newest ``keep``
+- Local cache of downloaded versions, so a reader downloads each version once
+- ``LocalObjectStore`` and ``S3ObjectStore`` (boto3 imported on first use), chosen by URL
+
+Dependencies:
+- boto3 (only for ``s3://`` stores)
+
+Usage:
+    from utils.snapshot_store import open_object_store, publish_snapshot, download_latest
+
+    store = open_object_store('s3://my-bucket/snapshots')   # or '/var/lib/cag/snapshots'
+    publish_snapshot(store, 'music_freshness', index.save)  # after a sync
+
+    latest = download_latest(store, 'music_freshness', cache_dir='/tmp/snapshots')
+    if latest:
+        index = NumpyIndex.load(latest['path'])               # memory-mapped
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SNAPSHOT_SUFFIX = '.npvi'
+LATEST_KEY = 'LATEST'
+DEFAULT_KEEP = 3
+
+
+class LocalObjectStore:
+    """Object store backed by a local directory; keys are relative paths."""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Directory holding the objects (created when needed).
+        """
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def _write(self, key: str, write: Callable[[str], None]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def put_file(self, key: str, path: str) -> None:
+        """Store the file at ``path`` under ``key``."""
+        self._write(key, lambda tmp_path: shutil.copyfile(path, tmp_path))
+
+    def get_file(self, key: str, path: str) -> None:
+        """
+        Copy the object ``key`` to ``path``.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+        shutil.copyfile(self._path(key), path)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        """Store ``data`` under ``key``."""
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        self._write(key, write)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Return the object ``key``, or None if there is none."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix: str = '') -> List[str]:
+        """Return the keys starting with ``prefix``, sorted."""
+        keys = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, key: str) -> None:
+        """Delete the object ``key`` if it exists."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ObjectStore:
+    """Object store backed by an S3 bucket, with keys under an optional prefix."""
+
+    def __init__(self, bucket: str, prefix: str = '', client: Any = None):
+        """
+        Args:
+            bucket (str): The bucket name.
+            prefix (str): Key prefix of every object, e.g. ``snapshots``.
+            client: A boto3 S3 client; created on first use by default.
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('s3')
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, key: str, path: str) -> None:
+        self.client.upload_file(path, self.bucket, self._key(key))
+
+    def get_file(self, key: str, path: str) -> None:
+        self.client.download_file(self.bucket, self._key(key), path)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def list(self, prefix: str = '') -> List[str]:
+        keys = []
+        strip = len(self._key(''))
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(item['Key'][strip:] for item in page.get('Contents', ()))
+        return sorted(keys)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def open_object_store(url: str) -> Any:
+    """
+    Open the object store at ``url``: ``s3://bucket/prefix``, ``file:///path`` or a plain directory.
+    """
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3ObjectStore(bucket, prefix)
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return LocalObjectStore(url)
+
+
+def latest_snapshot(store: Any, name: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the ``LATEST`` pointer of snapshot ``name``.
+
+    Returns:
+        Optional[Dict[str, Any]]: ``{'version', 'key', 'created_at', ...}``, or None if
+        nothing was published.
+    """
+    data = store.get_bytes(f"{name}/{LATEST_KEY}")
+    return json.loads(data) if data else None
+
+
+def publish_snapshot(store: Any, name: str, save: Callable[[str], None], keep: int = DEFAULT_KEEP,
+                     **info: Any) -> Dict[str, Any]:
+    """
+    Publish a new version of snapshot ``name``.
+
+    The snapshot object is uploaded before the pointer moves, so readers never see a
+    pointer to a missing or partial object.
+
+    Args:
+        store: The object store.
+        name (str): Snapshot name, e.g. the collection name.
+        save (Callable[[str], None]): Writes the snapshot to a local path, e.g. ``NumpyIndex.save``.
+        keep (int): Versions kept; older ones are deleted after publishing.
+        **info: Extra fields recorded in the pointer, such as the vector count.
+
+    Returns:
+        Dict[str, Any]: The new pointer.
+    """
+    version = int(time.time() * 1000)
+    previous = latest_snapshot(store, name)
+    if previous and previous['version'] >= version:
+        version = previous['version'] + 1
+    key = f"{name}/{version:015d}{SNAPSHOT_SUFFIX}"
+    handle, path = tempfile.mkstemp(suffix=SNAPSHOT_SUFFIX)
+    os.close(handle)
+    try:
+        save(path)
+        store.put_file(key, path)
+    finally:
+        os.remove(path)
+    pointer = dict(info, version=version, key=key, created_at=time.time())
+    store.put_bytes(f"{name}/{LATEST_KEY}", json.dumps(pointer).encode('utf-8'))
+    versions = [k for k in store.list(f"{name}/") if k.endswith(SNAPSHOT_SUFFIX)]
+    for old in versions[:-keep] if keep else ():
+        if old != key:
+            store.delete(old)
+    return pointer
+
+
+def download_latest(store: Any, name: str, cache_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Make the newest version of snapshot ``name`` available as a local file.
+
+    A version already in ``cache_dir`` is not downloaded again; other cached versions
+    of ``name`` are removed.
+
+    Returns:
+        Optional[Dict[str, Any]]: The pointer plus the local ``path``, or None if
+        nothing was published.
+    """
+    pointer = latest_snapshot(store, name)
+    if pointer is None:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = f"{name}-{pointer['version']}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(cache_dir, filename)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        store.get_file(pointer['key'], tmp_path)
+        os.replace(tmp_path, path)
+    for cached in os.listdir(cache_dir):
+        if cached.startswith(f"{name}-") and cached.endswith(SNAPSHOT_SUFFIX) and cached != filename:
+            os.remove(os.path.join(cache_dir, cached))
+    return dict(pointer, path=path)
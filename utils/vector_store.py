@@ -0,0 +1,90 @@
+"""
+vector_store.py
+
+Lazily opened, optionally persistent Chroma collections.
+
+With an in-memory ``chromadb.Client()`` every process start begins with an empty
+index and has to re-embed everything. ``LazyCollection`` opens a
+``chromadb.PersistentClient`` on a directory instead, so a restarted process can
+answer queries from the existing index straight away. The client is only created
+on first use, which keeps imports and query-free code paths cheap.
+
+Dependencies:
+- chromadb (imported on first use)
+
+Usage:
+    from utils.vector_store import LazyCollection
+
+    collection = LazyCollection('music_freshness', persist_dir='fresh/chroma_db')
+    collection.query(query_embeddings=[vector], n_results=4)  # opens the store here
+
+"""
+
+import threading
+from typing import Any, Callable, Optional
+
+
+def open_collection(name: str, persist_dir: Optional[str] = None) -> Any:
+    """
+    Open (or create) a Chroma collection.
+
+    Args:
+        name (str): The collection name.
+        persist_dir (str, optional): Directory of a persistent store. When empty or
+            None, an in-memory client is used and nothing survives the process.
+
+    Returns:
+        chromadb.Collection: The collection.
+    """
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_dir) if persist_dir else chromadb.Client()
+    return client.get_or_create_collection(name)
+
+
+class LazyCollection:
+    """
+    Proxy that opens a collection on first attribute access.
+
+    Every attribute (``query``, ``get``, ``upsert``, ...) is forwarded to the real
+    collection, so it can be used anywhere a Chroma collection is expected.
+    """
+
+    def __init__(self, name: str, persist_dir: Optional[str] = None,
+                 opener: Callable[[str, Optional[str]], Any] = open_collection):
+        """
+        Args:
+            name (str): The collection name.
+            persist_dir (str, optional): Directory of a persistent store, see ``open_collection``.
+            opener (Callable, optional): Function ``(name, persist_dir) -> collection``.
+        """
+        self.name = name
+        self.persist_dir = persist_dir
+        self._opener = opener
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the underlying collection was opened already."""
+        return self._collection is not None
+
+    @property
+    def collection(self) -> Any:
+        """The underlying collection, opened on first access."""
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = self._opener(self.name, self.persist_dir)
+        return self._collection
+
+    def reopen(self) -> None:
+        """Drop the opened collection, so the next access opens it again (e.g. to load a newer snapshot)."""
+        with self._lock:
+            self._collection = None
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for attributes not found on the proxy itself
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.collection, attr)